@@ -27,6 +27,22 @@ config.set_main_option(
     str(current_app.extensions['migrate'].db.engine.url).replace('%', '%%'))
 target_metadata = current_app.extensions['migrate'].db.metadata
 
+# Indexes created by migrations that the models do not declare, as they
+# need the pg_trgm extension or an expression the planner matches exactly
+# (see migration 2d6f0a9b3c41). Autogenerate would propose dropping them
+MIGRATION_ONLY_INDEXES = {
+    'ix_menuitems_search_document',
+    'ix_menuitems_flavour_trgm',
+    'ix_menuitems_description_trgm',
+}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Leaves the indexes only the migrations manage out of autogenerate."""
+    return not (type_ == "index" and reflected
+                and name in MIGRATION_ONLY_INDEXES)
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -47,7 +63,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=target_metadata, literal_binds=True
+        url=url, target_metadata=target_metadata, literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -83,6 +100,7 @@ def run_migrations_online():
             connection=connection,
             target_metadata=target_metadata,
             process_revision_directives=process_revision_directives,
+            include_object=include_object,
             **current_app.extensions['migrate'].configure_args
         )
 
@@ -0,0 +1,45 @@
+"""Index the menu items for full-text and trigram search
+
+Revision ID: 2d6f0a9b3c41
+Revises: 9c3a5e17f2b6
+Create Date: 2026-10-18 16:12:38.904116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2d6f0a9b3c41'
+down_revision = '9c3a5e17f2b6'
+branch_labels = None
+depends_on = None
+
+
+# (index name, indexed expression). The full-text expression must match
+# MenuSearch.DOCUMENT exactly
+INDEXES = (
+    ('ix_menuitems_search_document',
+     "GIN (to_tsvector('english', "
+     "menuitems.flavour || ' ' || coalesce(menuitems.description, '')))"),
+    ('ix_menuitems_flavour_trgm', "GIN (flavour gin_trgm_ops)"),
+    ('ix_menuitems_description_trgm', "GIN (description gin_trgm_ops)"),
+)
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # CONCURRENTLY builds the indexes without blocking writes, but cannot
+    # run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, expression in INDEXES:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} "
+                f"ON menuitems USING {expression}")
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _ in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
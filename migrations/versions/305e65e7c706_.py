@@ -0,0 +1,107 @@
+"""Add the daily ingredient demand rollup
+
+Revision ID: 305e65e7c706
+Revises: 10b9f17adb29
+Create Date: 2026-10-18 10:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '305e65e7c706'
+down_revision = '10b9f17adb29'
+branch_labels = None
+depends_on = None
+
+
+# Adds (sign=+1) or subtracts (sign=-1) the demand of a set of order items
+# read from `items`, counting each ingredient once per item
+APPLY_ITEMS = """
+    INSERT INTO ingredient_demand (day, ingredient_id, qty)
+    SELECT day, ingredient_id, {sign} * SUM(qty)
+    FROM (
+        SELECT DISTINCT i.id, o.created_on::date AS day,
+                        mi.ingredient_id, i.qty
+        FROM {items} i
+        JOIN orders o ON o.id = i.order_id
+        JOIN menuitems_ingredients mi ON mi.menuitem_id = i.menuitem_id
+        WHERE o.created_on IS NOT NULL
+    ) items
+    GROUP BY day, ingredient_id
+    ON CONFLICT (day, ingredient_id)
+    DO UPDATE SET qty = ingredient_demand.qty + EXCLUDED.qty;
+"""
+
+FUNCTIONS = {
+    "ingredient_demand_add_items": APPLY_ITEMS.format(
+        sign=1, items="new_items"),
+    "ingredient_demand_remove_items": APPLY_ITEMS.format(
+        sign=-1, items="old_items"),
+    "ingredient_demand_update_items": APPLY_ITEMS.format(
+        sign=-1, items="old_items") + APPLY_ITEMS.format(
+        sign=1, items="new_items"),
+    # Orders deleted with ON DELETE CASCADE are gone by the time the
+    # orderitems triggers run, so their items are subtracted beforehand
+    "ingredient_demand_remove_order": APPLY_ITEMS.format(
+        sign=-1, items="(SELECT * FROM orderitems WHERE order_id = OLD.id)"),
+}
+
+TRIGGERS = """
+CREATE TRIGGER orderitems_demand_insert AFTER INSERT ON orderitems
+REFERENCING NEW TABLE AS new_items
+FOR EACH STATEMENT EXECUTE PROCEDURE ingredient_demand_add_items();
+
+CREATE TRIGGER orderitems_demand_delete AFTER DELETE ON orderitems
+REFERENCING OLD TABLE AS old_items
+FOR EACH STATEMENT EXECUTE PROCEDURE ingredient_demand_remove_items();
+
+CREATE TRIGGER orderitems_demand_update AFTER UPDATE ON orderitems
+REFERENCING OLD TABLE AS old_items NEW TABLE AS new_items
+FOR EACH STATEMENT EXECUTE PROCEDURE ingredient_demand_update_items();
+
+CREATE TRIGGER orders_demand_delete BEFORE DELETE ON orders
+FOR EACH ROW EXECUTE PROCEDURE ingredient_demand_remove_order();
+"""
+
+
+def upgrade():
+    op.create_table(
+        'ingredient_demand',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('ingredient_id', sa.Integer(), nullable=False),
+        sa.Column('qty', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(
+            ['ingredient_id'], ['ingredients.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('day', 'ingredient_id')
+    )
+
+    for name, body in FUNCTIONS.items():
+        returns = "OLD" if name == "ingredient_demand_remove_order" else "NULL"
+        op.execute(f"""
+        CREATE OR REPLACE FUNCTION {name}()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            {body}
+            RETURN {returns};
+        END;
+        $$ LANGUAGE plpgsql;
+        """)
+
+    # Hold off new orders while the existing ones are rolled up
+    op.execute("LOCK TABLE orders, orderitems IN SHARE MODE")
+    op.execute(TRIGGERS)
+    op.execute(APPLY_ITEMS.format(sign=1, items="orderitems"))
+
+
+def downgrade():
+    op.execute("""
+    DROP TRIGGER IF EXISTS orderitems_demand_insert ON orderitems;
+    DROP TRIGGER IF EXISTS orderitems_demand_delete ON orderitems;
+    DROP TRIGGER IF EXISTS orderitems_demand_update ON orderitems;
+    DROP TRIGGER IF EXISTS orders_demand_delete ON orders;
+    """)
+    for name in FUNCTIONS:
+        op.execute(f"DROP FUNCTION IF EXISTS {name}()")
+    op.drop_table('ingredient_demand')
@@ -0,0 +1,30 @@
+"""Index the orders that are not complete
+
+Revision ID: 4b7e9c21d5a8
+Revises: 8f2d41c07b3e
+Create Date: 2026-10-18 14:26:03.118254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b7e9c21d5a8'
+down_revision = '8f2d41c07b3e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CONCURRENTLY builds the index without blocking writes, but cannot
+    # run inside a transaction
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_orders_open "
+            "ON orders (id) WHERE complete IS false")
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_orders_open")
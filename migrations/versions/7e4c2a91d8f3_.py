@@ -0,0 +1,168 @@
+"""Keep the ingredient demand rollup up to date when recipes or dates change
+
+Revision ID: 7e4c2a91d8f3
+Revises: 2d6f0a9b3c41
+Create Date: 2026-10-18 18:41:07.527310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e4c2a91d8f3'
+down_revision = '2d6f0a9b3c41'
+branch_labels = None
+depends_on = None
+
+
+# Recomputes the demand of some ingredients (all when NULL) over some days
+# from the order items and the current ingredients of their menu items,
+# counting each ingredient once per item as migration 305e65e7c706 does
+REBUILD = """
+CREATE OR REPLACE FUNCTION ingredient_demand_rebuild(
+    days date[], ingredients integer[])
+RETURNS void AS $$
+BEGIN
+    DELETE FROM ingredient_demand
+    WHERE day = ANY (days)
+      AND (ingredients IS NULL OR ingredient_id = ANY (ingredients));
+
+    INSERT INTO ingredient_demand (day, ingredient_id, qty)
+    SELECT day, ingredient_id, SUM(qty)
+    FROM (
+        SELECT DISTINCT i.id, d.day, mi.ingredient_id, i.qty
+        FROM unnest(days) AS d (day)
+        JOIN orders o
+          ON o.created_on >= d.day AND o.created_on < d.day + 1
+        JOIN orderitems i ON i.order_id = o.id
+        JOIN menuitems_ingredients mi ON mi.menuitem_id = i.menuitem_id
+        WHERE ingredients IS NULL OR mi.ingredient_id = ANY (ingredients)
+    ) items
+    GROUP BY day, ingredient_id
+    ON CONFLICT (day, ingredient_id)
+    DO UPDATE SET qty = ingredient_demand.qty + EXCLUDED.qty;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Rebuilds the demand of the ingredients linked or unlinked by a statement
+# over the days their menu items were ordered on
+REBUILD_LINKS = """
+    PERFORM ingredient_demand_rebuild(
+        ARRAY(SELECT DISTINCT o.created_on::date
+              FROM orderitems i
+              JOIN orders o ON o.id = i.order_id
+              WHERE o.created_on IS NOT NULL
+                AND i.menuitem_id IN (SELECT menuitem_id FROM {links})),
+        ARRAY(SELECT DISTINCT ingredient_id FROM {links}));
+"""
+
+# Moves the demand of an order's items from the day it was placed on to
+# the day it is moved to
+MOVE_ORDER = """
+    INSERT INTO ingredient_demand (day, ingredient_id, qty)
+    SELECT d.day, items.ingredient_id, d.sign * SUM(items.qty)
+    FROM (
+        SELECT DISTINCT i.id, mi.ingredient_id, i.qty
+        FROM orderitems i
+        JOIN menuitems_ingredients mi ON mi.menuitem_id = i.menuitem_id
+        WHERE i.order_id = NEW.id
+    ) items
+    CROSS JOIN (VALUES (OLD.created_on::date, -1),
+                       (NEW.created_on::date, 1)) AS d (day, sign)
+    WHERE d.day IS NOT NULL
+    GROUP BY d.day, d.sign, items.ingredient_id
+    ON CONFLICT (day, ingredient_id)
+    DO UPDATE SET qty = ingredient_demand.qty + EXCLUDED.qty;
+"""
+
+# The links and order items of a deleted menu item are both gone by the
+# time the statement triggers of their ON DELETE CASCADE run, so neither
+# could tell what to subtract. Deleting the links beforehand rebuilds the
+# demand without them while the items are still there
+REMOVE_MENUITEM = """
+    DELETE FROM menuitems_ingredients WHERE menuitem_id = OLD.id;
+"""
+
+FUNCTIONS = {
+    "ingredient_demand_add_links": REBUILD_LINKS.format(links="new_links"),
+    "ingredient_demand_remove_links": REBUILD_LINKS.format(
+        links="old_links"),
+    "ingredient_demand_update_links": REBUILD_LINKS.format(
+        links="(SELECT * FROM old_links UNION SELECT * FROM new_links)"),
+    "ingredient_demand_move_order": MOVE_ORDER,
+    "ingredient_demand_remove_menuitem": REMOVE_MENUITEM,
+}
+
+TRIGGERS = """
+CREATE TRIGGER menuitems_ingredients_demand_insert
+AFTER INSERT ON menuitems_ingredients
+REFERENCING NEW TABLE AS new_links
+FOR EACH STATEMENT EXECUTE PROCEDURE ingredient_demand_add_links();
+
+CREATE TRIGGER menuitems_ingredients_demand_delete
+AFTER DELETE ON menuitems_ingredients
+REFERENCING OLD TABLE AS old_links
+FOR EACH STATEMENT EXECUTE PROCEDURE ingredient_demand_remove_links();
+
+CREATE TRIGGER menuitems_ingredients_demand_update
+AFTER UPDATE ON menuitems_ingredients
+REFERENCING OLD TABLE AS old_links NEW TABLE AS new_links
+FOR EACH STATEMENT EXECUTE PROCEDURE ingredient_demand_update_links();
+
+CREATE TRIGGER orders_demand_move AFTER UPDATE OF created_on ON orders
+FOR EACH ROW
+WHEN (OLD.created_on::date IS DISTINCT FROM NEW.created_on::date)
+EXECUTE PROCEDURE ingredient_demand_move_order();
+
+CREATE TRIGGER menuitems_demand_delete BEFORE DELETE ON menuitems
+FOR EACH ROW EXECUTE PROCEDURE ingredient_demand_remove_menuitem();
+"""
+
+
+def upgrade():
+    op.execute(REBUILD)
+    for name, body in FUNCTIONS.items():
+        returns = "OLD" if name == "ingredient_demand_remove_menuitem" \
+            else "NULL"
+        op.execute(f"""
+        CREATE OR REPLACE FUNCTION {name}()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            {body}
+            RETURN {returns};
+        END;
+        $$ LANGUAGE plpgsql;
+        """)
+
+    # Hold off changes while the rollup, which may have drifted from the
+    # recipes and dates changed so far, is rebuilt
+    op.execute(
+        "LOCK TABLE orders, orderitems, menuitems, menuitems_ingredients "
+        "IN SHARE MODE")
+    op.execute(TRIGGERS)
+    op.execute("""
+    SELECT ingredient_demand_rebuild(
+        ARRAY(SELECT DISTINCT created_on::date FROM orders
+              WHERE created_on IS NOT NULL
+              UNION SELECT day FROM ingredient_demand),
+        NULL);
+    """)
+
+
+def downgrade():
+    op.execute("""
+    DROP TRIGGER IF EXISTS menuitems_ingredients_demand_insert
+        ON menuitems_ingredients;
+    DROP TRIGGER IF EXISTS menuitems_ingredients_demand_delete
+        ON menuitems_ingredients;
+    DROP TRIGGER IF EXISTS menuitems_ingredients_demand_update
+        ON menuitems_ingredients;
+    DROP TRIGGER IF EXISTS orders_demand_move ON orders;
+    DROP TRIGGER IF EXISTS menuitems_demand_delete ON menuitems;
+    """)
+    for name in FUNCTIONS:
+        op.execute(f"DROP FUNCTION IF EXISTS {name}()")
+    op.execute(
+        "DROP FUNCTION IF EXISTS ingredient_demand_rebuild(date[], integer[])")
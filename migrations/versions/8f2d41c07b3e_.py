@@ -0,0 +1,46 @@
+"""Index the foreign keys and order timestamps
+
+Revision ID: 8f2d41c07b3e
+Revises: 305e65e7c706
+Create Date: 2026-10-18 11:02:17.540912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f2d41c07b3e'
+down_revision = '305e65e7c706'
+branch_labels = None
+depends_on = None
+
+
+# (index name, table, column)
+INDEXES = (
+    ('ix_orders_user_id', 'orders', 'user_id'),
+    ('ix_orders_created_on', 'orders', 'created_on'),
+    ('ix_orderitems_order_id', 'orderitems', 'order_id'),
+    ('ix_orderitems_menuitem_id', 'orderitems', 'menuitem_id'),
+    ('ix_menuitems_category_id', 'menuitems', 'category_id'),
+    ('ix_menuitems_ingredients_menuitem_id',
+     'menuitems_ingredients', 'menuitem_id'),
+    ('ix_menuitems_ingredients_ingredient_id',
+     'menuitems_ingredients', 'ingredient_id'),
+)
+
+
+def upgrade():
+    # CONCURRENTLY builds the indexes without blocking writes, but cannot
+    # run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, column in INDEXES:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} "
+                f"ON {table} ({column})")
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _, _ in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
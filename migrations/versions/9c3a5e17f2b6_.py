@@ -0,0 +1,90 @@
+"""Cascade deletes in the database and prune empty orders with a trigger
+
+Revision ID: 9c3a5e17f2b6
+Revises: 4b7e9c21d5a8
+Create Date: 2026-10-18 15:04:51.602317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c3a5e17f2b6'
+down_revision = '4b7e9c21d5a8'
+branch_labels = None
+depends_on = None
+
+
+# (table, column, referenced table)
+FOREIGN_KEYS = (
+    ('orders', 'user_id', 'users'),
+    ('orderitems', 'order_id', 'orders'),
+    ('orderitems', 'menuitem_id', 'menuitems'),
+    ('menuitems', 'category_id', 'menuitem_categories'),
+    ('menuitems_ingredients', 'menuitem_id', 'menuitems'),
+    ('menuitems_ingredients', 'ingredient_id', 'ingredients'),
+)
+
+# Deletes the orders left without items by a statement, once per
+# statement. Statement triggers on a table fire in name order, so this
+# runs after orderitems_demand_delete has read the orders of the items
+PRUNE_ORDERS = """
+CREATE OR REPLACE FUNCTION prune_empty_orders()
+RETURNS TRIGGER AS $$
+BEGIN
+    DELETE FROM orders o
+    WHERE o.id IN (SELECT DISTINCT order_id FROM old_items)
+      AND NOT EXISTS (SELECT 1 FROM orderitems i WHERE i.order_id = o.id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER orderitems_prune_orders AFTER DELETE ON orderitems
+REFERENCING OLD TABLE AS old_items
+FOR EACH STATEMENT EXECUTE PROCEDURE prune_empty_orders();
+"""
+
+
+def _replace_foreign_key(table, column, referred, ondelete):
+    # The constraints were named by Postgres, and some columns were given
+    # a second one by an earlier migration, so drop whatever exists
+    names = op.get_bind().execute(sa.text("""
+        SELECT c.conname FROM pg_constraint c
+        JOIN pg_attribute a
+          ON a.attrelid = c.conrelid AND a.attnum = ANY (c.conkey)
+        WHERE c.contype = 'f'
+          AND c.conrelid = CAST(:table AS regclass)
+          AND c.confrelid = CAST(:referred AS regclass)
+          AND a.attname = :column
+    """), table=table, referred=referred, column=column).fetchall()
+    for (name,) in names:
+        op.drop_constraint(name, table, type_='foreignkey')
+
+    # NOT VALID adds the constraint without scanning the table under an
+    # exclusive lock; VALIDATE then checks the rows with a weaker one
+    name = f"{table}_{column}_fkey"
+    op.execute(
+        f"ALTER TABLE {table} ADD CONSTRAINT {name} "
+        f"FOREIGN KEY ({column}) REFERENCES {referred} (id)"
+        f"{' ON DELETE ' + ondelete if ondelete else ''} NOT VALID")
+    op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}")
+
+
+def upgrade():
+    for table, column, referred in FOREIGN_KEYS:
+        _replace_foreign_key(table, column, referred, 'CASCADE')
+
+    # Remove the orders emptied before the trigger existed
+    op.execute("""
+    DELETE FROM orders o
+    WHERE NOT EXISTS (SELECT 1 FROM orderitems i WHERE i.order_id = o.id)
+    """)
+    op.execute(PRUNE_ORDERS)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS orderitems_prune_orders ON orderitems")
+    op.execute("DROP FUNCTION IF EXISTS prune_empty_orders()")
+    for table, column, referred in FOREIGN_KEYS:
+        _replace_foreign_key(table, column, referred, None)
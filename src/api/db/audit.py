@@ -0,0 +1,166 @@
+"""Audits the query plans of the hot read paths against a seeded database."""
+# SQLAlchemy imports
+from sqlalchemy import event, text
+
+# Python imports
+import json
+from typing import Iterator, List, NamedTuple, Tuple
+
+
+class SeqScan(NamedTuple):
+    """A sequential scan found in a query plan."""
+
+    route: str
+    relation: str
+    rows: int
+    statement: str
+
+
+class PlanAudit():
+    """
+    Replays the routes that serve the hot read paths, records every SELECT
+    they run and EXPLAINs each one with (ANALYZE, BUFFERS). A plan fails
+    the audit when it filters or repeatedly scans a table sequentially
+    and reads more rows than the threshold, which usually means an index
+    is missing or is not being used.
+
+    Full dumps (e.g. /orders without a limit) read whole tables by design,
+    so the audit requests a page of each list instead.
+    """
+
+    # Statements run by write paths, explained with %(id)s set to the id
+    # of an existing order
+    WRITE_PATH_STATEMENTS = (
+        ("orderitems_prune_orders",
+         "SELECT 1 FROM orderitems WHERE order_id = %(id)s"),
+    )
+
+    @staticmethod
+    def _routes(client) -> Iterator[str]:
+        """
+        Gets the urls of the routes to audit, following pagination
+        cursors so the keyset filters are exercised too
+
+        Args:
+            client: A Flask test client
+
+        Returns:
+            Iterator[str]: The urls to request
+        """
+
+        yield "/orders?limit=50"
+        yield "/orders?limit=50&sort=created_on"
+        yield "/users?limit=50"
+        yield "/ingredients?limit=50"
+        yield "/menuitems?limit=50"
+        yield "/ingredients/demand"
+        yield "/weeks-ingredients"
+
+        # A second page of orders, and the orders of the busiest customer
+        response = client.get("/orders?limit=50")
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor:
+            yield f"/orders?limit=50&after={cursor}"
+        orders = response.get_json() or []
+        if orders and orders[0].get("user"):
+            yield f"/orders/{orders[0]['user']['id']}?limit=50"
+
+    @staticmethod
+    def _seq_scans(plan: dict) -> Iterator[Tuple[str, int]]:
+        """
+        Finds the sequential scans of a plan that filter rows or run more
+        than once
+
+        Args:
+            plan (dict): A node of an EXPLAIN (FORMAT JSON) plan
+
+        Returns:
+            Iterator[tuple]: The relation and rows read by each scan
+        """
+
+        loops = plan.get("Actual Loops", 1)
+        if plan.get("Node Type") == "Seq Scan" and (
+                "Filter" in plan or loops > 1):
+            rows = plan.get("Actual Rows", 0) + \
+                plan.get("Rows Removed by Filter", 0)
+            yield plan.get("Relation Name"), rows * loops
+        for child in plan.get("Plans", ()):
+            yield from PlanAudit._seq_scans(child)
+
+    @staticmethod
+    def _explain(connection, statement: str, parameters) -> dict:
+        """
+        Runs EXPLAIN (ANALYZE, BUFFERS) on a statement
+
+        Args:
+            connection: A SQLAlchemy connection
+            statement (str): The SQL as sent to the driver
+            parameters: The driver parameters of the statement
+
+        Returns:
+            dict: The root node of the plan
+        """
+
+        cursor = connection.connection.cursor()
+        try:
+            cursor.execute(
+                "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement,
+                parameters)
+            plan = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]["Plan"]
+
+    @staticmethod
+    def run(app, analyze: bool = True) -> List[SeqScan]:
+        """
+        Explains the hot queries of an app. Scans reading more rows than
+        the audit allows should fail it
+
+        Args:
+            app: The Flask app, connected to a seeded database
+            analyze (bool): Refresh the planner statistics first
+
+        Returns:
+            list[SeqScan]: The filtered or repeated sequential scans found
+        """
+
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, many):
+            if statement.lstrip().upper().startswith("SELECT"):
+                statements.append((route, statement, parameters))
+
+        with app.app_context():
+            engine = app.db.engine
+            if analyze:
+                with engine.connect() as connection:
+                    connection.execute(text("ANALYZE"))
+
+            client = app.test_client()
+            routes = list(PlanAudit._routes(client))
+            event.listen(engine, "before_cursor_execute", record)
+            try:
+                for route in routes:
+                    client.get(route)
+            finally:
+                event.remove(engine, "before_cursor_execute", record)
+
+            with engine.connect() as connection:
+                order_id = connection.execute(
+                    text("SELECT max(id) FROM orders")).scalar()
+                for route, statement in PlanAudit.WRITE_PATH_STATEMENTS:
+                    statements.append((route, statement, {"id": order_id}))
+
+                scans, seen = [], set()
+                for route, statement, parameters in statements:
+                    if statement in seen:
+                        continue
+                    seen.add(statement)
+                    plan = PlanAudit._explain(
+                        connection, statement, parameters)
+                    scans += [SeqScan(route, relation, rows, statement)
+                              for relation, rows in PlanAudit._seq_scans(plan)]
+        return scans
@@ -0,0 +1,353 @@
+"""Set-based writes for requests that insert many rows at once."""
+# SQLAlchemy imports
+from sqlalchemy import literal_column, select, text
+from sqlalchemy.dialects.postgresql import insert as upsert
+
+# Python imports
+from datetime import datetime
+from typing import Dict, List, Set, Tuple
+
+# User module imports
+from api.db.models import MenuItemCategoryModel, MenuItemModel
+from api.db.models import OrderItemModel
+
+
+class BulkOrders():
+    """
+    Inserts any number of orders, and all of their items, with a constant
+    number of statements: one INSERT of the orders, whose ids are drawn
+    from the sequence beforehand so each is known to belong to its order,
+    and one multi-row INSERT for the order items.
+    """
+
+    @staticmethod
+    def parse(order: dict) -> dict:
+        """
+        Validates an order submitted by a client
+
+        Args:
+            order (dict):
+                The order as sent to /orders/add, i.e
+                {"complete": bool, "items": [{"menuitem": {"id": int}, "qty": int}]}
+
+        Returns:
+            dict: The order's complete flag and a list of
+            (menuitem_id, qty) tuples
+
+        Raises:
+            ValueError: If the order is malformed
+        """
+
+        if not isinstance(order, dict):
+            raise ValueError("Order must be an object")
+
+        items = order.get("items")
+        if not isinstance(items, list):
+            raise ValueError("Order items must be a list")
+
+        parsed = []
+        for item in items:
+            try:
+                menuitem_id = int(item["menuitem"]["id"])
+                qty = int(item["qty"])
+            except (KeyError, TypeError, ValueError):
+                raise ValueError(
+                    "Order items must have a menuitem id and a qty")
+            if qty < 1:
+                raise ValueError("Order item qty must be at least 1")
+            parsed.append((menuitem_id, qty))
+
+        complete = order.get("complete", False)
+        if not isinstance(complete, bool):
+            raise ValueError("Order complete must be true or false")
+
+        return {"complete": complete, "items": parsed}
+
+    @staticmethod
+    def unknown_menuitems(session, orders: List[dict]) -> Set[int]:
+        """
+        Finds the menu items referenced by orders that do not exist, with a
+        single query
+
+        Args:
+            session: The SQLAlchemy session to query with
+            orders (list[dict]): Orders returned by parse
+
+        Returns:
+            set[int]: The ids of the menu items that do not exist
+        """
+
+        wanted = {menuitem_id for order in orders
+                  for menuitem_id, _ in order["items"]}
+        if not wanted:
+            return set()
+        found = session.execute(select([MenuItemModel.id]).where(
+            MenuItemModel.id.in_(wanted)))
+        return wanted - {row[0] for row in found}
+
+    @staticmethod
+    def insert(session, user_id: int, orders: List[dict]) -> List[int]:
+        """
+        Inserts orders and their items in the session's transaction. The
+        caller is responsible for committing
+
+        Args:
+            session: The SQLAlchemy session to write with
+            user_id (int): The id of the customer placing the orders
+            orders (list[dict]): Orders returned by parse
+
+        Returns:
+            list[int]: The ids of the new orders, in the same order
+        """
+
+        if not orders:
+            return []
+
+        # RETURNING does not promise any order, so each order's id is
+        # drawn next to its position and the orders are inserted with it
+        rows = session.execute(text("""
+            WITH new AS (
+                SELECT nextval(pg_get_serial_sequence('orders', 'id')) AS id,
+                       o.position, o.complete
+                FROM unnest(CAST(:complete AS boolean[]))
+                     WITH ORDINALITY AS o(complete, position)
+            ), inserted AS (
+                INSERT INTO orders (id, complete, user_id, created_on)
+                SELECT id, complete, :user_id, :created_on FROM new
+            )
+            SELECT id FROM new ORDER BY position
+        """), {"complete": [order["complete"] for order in orders],
+               "user_id": user_id, "created_on": datetime.now()})
+        ids = [row[0] for row in rows]
+
+        items = [
+            {"order_id": order_id, "menuitem_id": menuitem_id, "qty": qty}
+            for order_id, order in zip(ids, orders)
+            for menuitem_id, qty in order["items"]
+        ]
+        if items:
+            session.execute(OrderItemModel.__table__.insert().values(items))
+        return ids
+
+
+class BulkCatalog():
+    """
+    Writes any number of menu items, ingredient stock levels and
+    categories with a constant number of statements, for admin tooling
+    reloading the catalog. Each write is a multi-row statement whose
+    RETURNING clause gives back the ids of the rows it wrote, so nothing
+    is looked up afterwards. The caller commits once.
+    """
+
+    @staticmethod
+    def parse_menuitem(menuitem: dict) -> dict:
+        """
+        Validates a menu item submitted by an admin
+
+        Args:
+            menuitem (dict):
+                The menu item as sent to /menuitems/add, i.e
+                {"flavour": str, "categoryID": int, "price": float,
+                 "description": str, "imgURL": str, "ids": [int]}.
+                Without "ids" the item's ingredients are left unchanged
+
+        Returns:
+            dict: The menu item's columns, and its ingredient ids or None
+
+        Raises:
+            ValueError: If the menu item is malformed
+        """
+
+        if not isinstance(menuitem, dict):
+            raise ValueError("Menu item must be an object")
+
+        flavour = menuitem.get("flavour")
+        if not isinstance(flavour, str) or not flavour.strip():
+            raise ValueError("Menu item must have a flavour")
+        if len(flavour.strip()) > 50:
+            raise ValueError("Menu item flavour can be at most 50 characters")
+        try:
+            category_id = int(menuitem["categoryID"])
+            price = float(menuitem["price"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Menu item must have a categoryID and a price")
+        if price < 0:
+            raise ValueError("Menu item price cannot be negative")
+
+        ingredients = menuitem.get("ids")
+        if ingredients is not None:
+            try:
+                ingredients = sorted({int(ingredient_id)
+                                      for ingredient_id in ingredients})
+            except (TypeError, ValueError):
+                raise ValueError("Menu item ids must be ingredient ids")
+
+        return {"flavour": flavour.strip(),
+                "category_id": category_id,
+                "price": price,
+                "description": menuitem.get("description"),
+                "image_url": menuitem.get("imgURL"),
+                "ingredients": ingredients}
+
+    @staticmethod
+    def unknown(session, model, ids) -> Set[int]:
+        """
+        Finds the ids that do not exist in a table, with a single query
+
+        Args:
+            session: The SQLAlchemy session to query with
+            model: The SQLAlchemy model of the table
+            ids (iterable[int]): The ids to look for
+
+        Returns:
+            set[int]: The ids that do not exist
+        """
+
+        wanted = set(ids)
+        if not wanted:
+            return set()
+        found = session.execute(select([model.id]).where(
+            model.id.in_(wanted)))
+        return wanted - {row[0] for row in found}
+
+    @staticmethod
+    def upsert_menuitems(session, menuitems: List[dict]) \
+            -> List[Tuple[int, bool]]:
+        """
+        Inserts menu items, or updates the ones whose flavour already
+        exists in their category, with one INSERT ... ON CONFLICT
+
+        Args:
+            session: The SQLAlchemy session to write with
+            menuitems (list[dict]): Menu items returned by parse_menuitem,
+                with no two sharing a flavour and category
+
+        Returns:
+            list[tuple]: The id of each menu item and whether it was
+            created, in the same order
+        """
+
+        if not menuitems:
+            return []
+
+        table = MenuItemModel.__table__
+        columns = ("flavour", "category_id", "price", "description",
+                   "image_url")
+        statement = upsert(table).values([
+            {column: menuitem[column] for column in columns}
+            for menuitem in menuitems])
+        statement = statement.on_conflict_do_update(
+            index_elements=["flavour", "category_id"],
+            set_={column: statement.excluded[column]
+                  for column in ("price", "description", "image_url")})
+        # xmax is only set on rows the statement updated
+        rows = session.execute(statement.returning(
+            table.c.id, table.c.flavour, table.c.category_id,
+            literal_column("xmax = 0")))
+
+        written = {(flavour, category_id): (menuitem_id, created)
+                   for menuitem_id, flavour, category_id, created in rows}
+        return [written[menuitem["flavour"], menuitem["category_id"]]
+                for menuitem in menuitems]
+
+    @staticmethod
+    def set_ingredients(session, ingredients: Dict[int, List[int]]):
+        """
+        Makes the ingredients of menu items exactly the given sets, with
+        one DELETE of the links no longer wanted and one INSERT of the
+        missing ones, so unchanged links are left alone
+
+        Args:
+            session: The SQLAlchemy session to write with
+            ingredients (dict): The ingredient ids of each menu item id
+
+        Returns:
+            None
+        """
+
+        if not ingredients:
+            return
+
+        links = {"menuitems": list(ingredients),
+                 "link_menuitems": [menuitem_id
+                                    for menuitem_id, ids in ingredients.items()
+                                    for _ in ids],
+                 "link_ingredients": [ingredient_id
+                                      for ids in ingredients.values()
+                                      for ingredient_id in ids]}
+        session.execute(text("""
+            DELETE FROM menuitems_ingredients
+            WHERE menuitem_id = ANY(CAST(:menuitems AS integer[]))
+              AND (menuitem_id, ingredient_id) NOT IN (
+                  SELECT * FROM unnest(CAST(:link_menuitems AS integer[]),
+                                       CAST(:link_ingredients AS integer[])))
+        """), links)
+        session.execute(text("""
+            INSERT INTO menuitems_ingredients (menuitem_id, ingredient_id)
+            SELECT link.menuitem_id, link.ingredient_id
+            FROM unnest(CAST(:link_menuitems AS integer[]),
+                        CAST(:link_ingredients AS integer[]))
+                 AS link(menuitem_id, ingredient_id)
+            WHERE NOT EXISTS (
+                SELECT 1 FROM menuitems_ingredients existing
+                WHERE existing.menuitem_id = link.menuitem_id
+                  AND existing.ingredient_id = link.ingredient_id)
+        """), links)
+
+    @staticmethod
+    def set_stock(session, stock: Dict[int, bool]) -> Set[int]:
+        """
+        Sets whether ingredients are in stock with one UPDATE ... FROM
+
+        Args:
+            session: The SQLAlchemy session to write with
+            stock (dict): Whether each ingredient id is in stock
+
+        Returns:
+            set[int]: The ids of the ingredients updated, missing the ids
+            that do not exist
+        """
+
+        if not stock:
+            return set()
+
+        rows = session.execute(text("""
+            UPDATE ingredients SET in_stock = stock.in_stock
+            FROM unnest(CAST(:ids AS integer[]), CAST(:flags AS boolean[]))
+                 AS stock(id, in_stock)
+            WHERE ingredients.id = stock.id
+            RETURNING ingredients.id
+        """), {"ids": list(stock), "flags": list(stock.values())})
+        return {row[0] for row in rows}
+
+    @staticmethod
+    def add_categories(session, names: List[str]) -> List[Tuple[int, bool]]:
+        """
+        Inserts the categories that do not exist yet with one INSERT ...
+        ON CONFLICT DO NOTHING, and looks up the ids of the others
+
+        Args:
+            session: The SQLAlchemy session to write with
+            names (list[str]): The distinct names of the categories
+
+        Returns:
+            list[tuple]: The id of each category and whether it was
+            created, in the same order
+        """
+
+        if not names:
+            return []
+
+        table = MenuItemCategoryModel.__table__
+        rows = session.execute(upsert(table).values(
+            [{"name": name} for name in names]).on_conflict_do_nothing(
+                index_elements=["name"]).returning(table.c.id, table.c.name))
+        ids = {name: (category_id, True) for category_id, name in rows}
+
+        existing = [name for name in names if name not in ids]
+        if existing:
+            rows = session.execute(select([table.c.id, table.c.name]).where(
+                table.c.name.in_(existing)))
+            ids.update({name: (category_id, False)
+                        for category_id, name in rows})
+        return [ids[name] for name in names]
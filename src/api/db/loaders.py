@@ -0,0 +1,93 @@
+"""Builds eager loading options from the marshmallow schemas."""
+# SQLAlchemy imports
+from sqlalchemy import inspect, orm
+
+# Marshmallow imports
+from marshmallow.fields import Nested
+
+# Python imports
+from functools import lru_cache
+
+
+def _strategy(prop):
+    """Pick the loader strategy for a relationship.
+
+    Collections are fetched with a single SELECT ... IN per level while
+    scalar relationships are joined onto the parent query.
+
+    Args:
+        prop: The SQLAlchemy RelationshipProperty being loaded
+
+    Returns:
+        str: The name of the sqlalchemy.orm loader option to use
+    """
+    return "selectinload" if prop.uselist else "joinedload"
+
+
+def _relationship_paths(schema, mapper, parent=None, path=()):
+    """Walk the Nested fields of a schema and collect relationship paths.
+
+    Args:
+        schema: The marshmallow schema instance being walked
+        mapper: The SQLAlchemy mapper of the model the schema dumps
+        parent: The relationship used to reach this mapper, if any
+        path: The (strategy, attribute) pairs leading to this schema
+
+    Returns:
+        list: A list of paths, each a tuple of (strategy, attribute) pairs
+    """
+    paths = []
+    hints = getattr(getattr(schema, "Meta", None), "eager_load", ())
+
+    nested = {
+        field.attribute or name: field
+        for name, field in schema.dump_fields.items()
+        if isinstance(field, Nested)}
+
+    for key in list(nested) + [key for key in hints if key not in nested]:
+        prop = mapper.relationships.get(key)
+        if prop is None:
+            continue
+
+        # The many-to-one side of a collection that was just loaded is
+        # resolved from the identity map, so it needs no extra query
+        if (parent is not None and not prop.uselist
+                and prop in parent._reverse_property):
+            continue
+
+        step = path + ((_strategy(prop), getattr(mapper.class_, key)),)
+        if key in nested:
+            paths.extend(_relationship_paths(
+                nested[key].schema, prop.mapper, prop, step) or [step])
+        else:
+            paths.append(step)
+
+    return paths
+
+
+@lru_cache(maxsize=None)
+def eager_options(schema_cls):
+    """Build the loader options needed to dump a schema without lazy loads.
+
+    The Nested fields of the schema are followed recursively and every
+    relationship they touch is loaded up front, so dumping any number of
+    rows runs a fixed number of queries. Schemas may also list
+    relationships read by non-Nested fields in ``Meta.eager_load``.
+
+    Args:
+        schema_cls: The marshmallow SQLAlchemyAutoSchema class to be dumped
+
+    Returns:
+        tuple: Loader options to pass to Query.options()
+    """
+    schema = schema_cls()
+    mapper = inspect(schema.opts.model)
+
+    options = []
+    for path in _relationship_paths(schema, mapper):
+        option = None
+        for strategy, attr in path:
+            loader = getattr(orm if option is None else option, strategy)
+            option = loader(attr)
+        options.append(option)
+    return tuple(options)
@@ -2,17 +2,20 @@
 """Defines the database classes."""
 # SQLAlchemy Imports
 from sqlalchemy.ext.hybrid import hybrid_property, hybrid_method
-from sqlalchemy import event, text
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import column_property
 
 # Python imports
 from datetime import datetime
 import uuid
 
 # User module imports
-from app import FlaskApp
+from app import create_app
+from api.db.passwords import Passwords
 
 # Initialize the App object
-app = FlaskApp()
+app = create_app()
+Passwords.init_app(app)
 
 
 class UserModel(app.db.Model):
@@ -83,7 +86,8 @@ class UserModel(app.db.Model):
 
     # Relationships with other tables
     _orders_placed = app.db.relationship(
-        "OrderModel", cascade="all, delete, delete-orphan", backref="user")
+        "OrderModel", cascade="all, delete, delete-orphan", backref="user",
+        passive_deletes=True)
 
     # Class methods
     def __repr__(self):
@@ -97,14 +101,15 @@ class UserModel(app.db.Model):
     def password(self, password):
         """Set the user's password to a hashed password.
 
+        The hash is computed in a worker thread, see Passwords.
+
         Args:
             password: The password to be hashed
 
         Returns:
             None
         """
-        self._password = app.bcrypt.generate_password_hash(
-            password).decode('utf8')
+        self._password = Passwords.hash(password)
 
     @hybrid_method
     def check_password(self, password):
@@ -117,12 +122,15 @@ class UserModel(app.db.Model):
             A boolean value representing if the password entered is valid
             or not
         """
-        return app.bcrypt.check_password_hash(self._password, password)
+        return Passwords.check(self._password, password)
 
     @hybrid_property
     def orders_placed(self):
-        """Retrieve the amount of orders placed."""
-        return len(self._orders_placed)
+        """Retrieve the amount of orders placed.
+
+        Counted by the database when the user is loaded, see _orders_count.
+        """
+        return self._orders_count
 
 
 class IngredientModel(app.db.Model):
@@ -153,9 +161,11 @@ class IngredientModel(app.db.Model):
 menuitems_ingredients = app.db.Table(
     'menuitems_ingredients', app.db.Model.metadata,
     app.db.Column(
-        'menuitem_id', app.db.Integer, app.db.ForeignKey('menuitems.id')),
+        'menuitem_id', app.db.Integer,
+        app.db.ForeignKey('menuitems.id', ondelete='CASCADE'), index=True),
     app.db.Column(
-        'ingredient_id', app.db.Integer, app.db.ForeignKey('ingredients.id')))
+        'ingredient_id', app.db.Integer,
+        app.db.ForeignKey('ingredients.id', ondelete='CASCADE'), index=True))
 
 
 class MenuItemCategoryModel(app.db.Model):
@@ -174,7 +184,9 @@ class MenuItemCategoryModel(app.db.Model):
         nullable=False
     )
 
-    menuitems = app.db.relationship("MenuItemModel", cascade="all, delete", backref="category")
+    menuitems = app.db.relationship(
+        "MenuItemModel", cascade="all, delete", backref="category",
+        passive_deletes=True)
     
     def __repr__(self) -> str:
         return f"{self.name}"
@@ -201,8 +213,9 @@ class MenuItemModel(app.db.Model):
 
     category_id = app.db.Column(
         app.db.Integer,
-        app.db.ForeignKey("menuitem_categories.id"),
-        nullable=False
+        app.db.ForeignKey("menuitem_categories.id", ondelete='CASCADE'),
+        nullable=False,
+        index=True
     )
 
     price = app.db.Column(
@@ -224,7 +237,8 @@ class MenuItemModel(app.db.Model):
         secondary=menuitems_ingredients, backref="related_menuitems")
 
     orderitems = app.db.relationship(
-        "OrderItemModel", cascade="all, delete", backref="menuitem")
+        "OrderItemModel", cascade="all, delete", backref="menuitem",
+        passive_deletes=True)
 
     def __repr__(self):
         return f"{self.flavour} {self.category}"
@@ -246,19 +260,65 @@ class OrderItemModel(app.db.Model):
 
     # Relationships with other tables
     order_id = app.db.Column(
-        app.db.Integer, app.db.ForeignKey("orders.id"), nullable=False)
+        app.db.Integer, app.db.ForeignKey("orders.id", ondelete='CASCADE'),
+        nullable=False, index=True)
 
     menuitem_id = app.db.Column(
-        app.db.Integer, app.db.ForeignKey("menuitems.id"), nullable=False)
+        app.db.Integer, app.db.ForeignKey("menuitems.id", ondelete='CASCADE'),
+        nullable=False, index=True)
 
     def __repr__(self):
         return f"{self.menuitem} x{self.qty}"
 
 
+class IngredientDemandModel(app.db.Model):
+    """SQLAlchemy Database model for the daily demand of an Ingredient.
+
+    Holds the quantity of an ingredient needed by the order items placed
+    on a day, counting each ingredient of a menu item once per unit
+    ordered. Rows are maintained by triggers on orders and orderitems,
+    created in migration 305e65e7c706, and on menuitems and
+    menuitems_ingredients, created in migration 7e4c2a91d8f3, so they
+    always reflect the order history and the current recipes without
+    scanning them.
+    """
+
+    __tablename__ = 'ingredient_demand'
+
+    day = app.db.Column(
+        app.db.Date,
+        primary_key=True
+    )
+
+    ingredient_id = app.db.Column(
+        app.db.Integer,
+        app.db.ForeignKey('ingredients.id', ondelete='CASCADE'),
+        primary_key=True
+    )
+
+    qty = app.db.Column(
+        app.db.Integer,
+        nullable=False,
+        default=0,
+        server_default='0'
+    )
+
+    ingredient = app.db.relationship("IngredientModel")
+
+    def __repr__(self):
+        return f"{self.ingredient} x{self.qty} ({self.day})"
+
+
 class OrderModel(app.db.Model):
 
     __tablename__ = 'orders'
 
+    __table_args__ = (
+        # The open orders sent to the kitchen feed
+        app.db.Index('ix_orders_open', 'id',
+                     postgresql_where=text('complete IS false')),
+    )
+
     id = app.db.Column(
         app.db.Integer,
         primary_key=True
@@ -266,7 +326,7 @@ class OrderModel(app.db.Model):
 
     created_on = app.db.Column(
         app.db.DateTime,
-        index=False,
+        index=True,
         unique=False,
         nullable=True,
         default=datetime.now
@@ -279,18 +339,26 @@ class OrderModel(app.db.Model):
 
     # Relationships with other tables
     items = app.db.relationship(
-        "OrderItemModel", cascade="all, delete", backref="order")
+        "OrderItemModel", cascade="all, delete", backref="order",
+        passive_deletes=True)
 
     user_id = app.db.Column(
-        app.db.Integer, app.db.ForeignKey('users.id'), nullable=False)
+        app.db.Integer, app.db.ForeignKey('users.id', ondelete='CASCADE'),
+        nullable=False, index=True)
 
     def __repr__(self):
         return f"Order #{self.id}"
 
-    # Ensure that empty orders are deleted
-    @staticmethod
-    @event.listens_for(OrderItemModel, 'after_delete')
-    def delete_empty_order(mapper, connection, target):
-        if not target.order.items:
-            del_query = f"delete from orders where orders.id={target.order.id}"
-            connection.execute(text(del_query))
+    # Orders left without items are deleted by the orderitems_prune_orders
+    # trigger, created in migration 9c3a5e17f2b6, once per statement. The
+    # items of deleted orders, users and menu items are deleted by the
+    # ON DELETE CASCADE foreign keys, so passive_deletes keeps the ORM from
+    # loading them first
+
+
+# Count the orders of each user with a correlated subquery, so they are
+# fetched in the same query as the users instead of loading every order
+UserModel._orders_count = column_property(
+    select([func.count(OrderModel.id)]).where(
+        OrderModel.user_id == UserModel.id
+    ).correlate_except(OrderModel).as_scalar())
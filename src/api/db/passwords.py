@@ -0,0 +1,179 @@
+"""Hashes and verifies passwords off the eventlet hub."""
+# Python imports
+from math import log2
+from time import perf_counter
+import bcrypt
+
+# Eventlet imports
+from eventlet import tpool
+from eventlet.semaphore import Semaphore
+
+
+class Passwords():
+    """
+    Runs bcrypt in eventlet's native thread pool so hashing a password
+    does not freeze every other greenthread of the process. At most
+    BCRYPT_POOL_SIZE hashes run at once, the rest wait without blocking
+    the hub.
+
+    The cost of new hashes is BCRYPT_LOG_ROUNDS unless BCRYPT_TARGET_MS
+    is set, in which case it is calibrated once on this machine to take
+    about that long, bounded by BCRYPT_MIN_LOG_ROUNDS and
+    BCRYPT_MAX_LOG_ROUNDS. Workers on different hardware may calibrate
+    different costs, so stored hashes are only upgraded, never
+    downgraded, see needs_rehash.
+    """
+
+    # The cost used to time bcrypt when calibrating
+    CALIBRATION_ROUNDS = 10
+
+    _config = {}
+    _pool = None
+    _rounds = None
+
+    @staticmethod
+    def init_app(app):
+        """
+        Reads the hashing settings from an app's config
+
+        Args:
+            app: The Flask app
+
+        Returns:
+            None
+        """
+
+        Passwords._config = app.config
+        Passwords._pool = Semaphore(app.config.get('BCRYPT_POOL_SIZE'))
+        Passwords._rounds = None
+
+    @staticmethod
+    def _run(func, *args):
+        """
+        Runs a bcrypt function in the thread pool
+
+        Args:
+            func: The function to run
+            *args: The arguments to call it with
+
+        Returns:
+            The result of the function
+        """
+
+        if not Passwords._config.get('BCRYPT_USE_POOL', True):
+            return func(*args)
+        with Passwords._pool:
+            return tpool.execute(func, *args)
+
+    @staticmethod
+    def _calibrate(target_ms: float) -> int:
+        """
+        Finds the cost at which hashing takes about target_ms on this
+        machine. Each extra round doubles the time taken
+
+        Args:
+            target_ms (float): The time a hash should take in milliseconds
+
+        Returns:
+            int: The log rounds to hash with
+        """
+
+        rounds = Passwords.CALIBRATION_ROUNDS
+
+        def time_hash():
+            start = perf_counter()
+            bcrypt.hashpw(b"calibration", bcrypt.gensalt(rounds))
+            return (perf_counter() - start) * 1000
+
+        elapsed = Passwords._run(time_hash)
+        return rounds + round(log2(target_ms / max(elapsed, 0.001)))
+
+    @staticmethod
+    def rounds() -> int:
+        """
+        Returns the cost new hashes are created with
+
+        Args:
+            None
+
+        Returns:
+            int: The bcrypt log rounds
+        """
+
+        if Passwords._rounds is None:
+            config = Passwords._config
+            target_ms = config.get('BCRYPT_TARGET_MS')
+            if target_ms:
+                rounds = Passwords._calibrate(float(target_ms))
+            else:
+                rounds = config.get('BCRYPT_LOG_ROUNDS')
+            Passwords._rounds = min(
+                max(rounds, config.get('BCRYPT_MIN_LOG_ROUNDS')),
+                config.get('BCRYPT_MAX_LOG_ROUNDS'))
+        return Passwords._rounds
+
+    @staticmethod
+    def hash(password: str) -> str:
+        """
+        Hashes a password at the current cost
+
+        Args:
+            password (str): The password to be hashed
+
+        Returns:
+            str: The bcrypt hash
+        """
+
+        salt = bcrypt.gensalt(Passwords.rounds())
+        return Passwords._run(
+            bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+
+    @staticmethod
+    def check(pw_hash: str, password: str) -> bool:
+        """
+        Checks a password against a bcrypt hash
+
+        Args:
+            pw_hash (str): The stored hash
+            password (str): The password to be checked
+
+        Returns:
+            bool: True if the password matches the hash
+        """
+
+        try:
+            return Passwords._run(
+                bcrypt.checkpw, password.encode('utf-8'),
+                pw_hash.encode('utf-8'))
+        except ValueError:
+            # Not a bcrypt hash
+            return False
+
+    @staticmethod
+    def needs_rehash(pw_hash: str) -> bool:
+        """
+        Checks if a hash was created at too low a cost, so it can be
+        replaced the next time the password is known. That is below
+        BCRYPT_MIN_LOG_ROUNDS or below the current cost, less
+        BCRYPT_REHASH_MARGIN rounds when the cost is calibrated, so
+        processes that calibrated slightly different costs do not keep
+        rehashing the same password back and forth. Hashes above the
+        current cost are kept
+
+        Args:
+            pw_hash (str): The stored hash, e.g. "$2b$12$..."
+
+        Returns:
+            bool: True if the hash should be recreated
+        """
+
+        try:
+            cost = int(pw_hash.split('$')[2])
+        except (IndexError, ValueError):
+            return True
+
+        config = Passwords._config
+        floor = Passwords.rounds()
+        if config.get('BCRYPT_TARGET_MS'):
+            floor -= config.get('BCRYPT_REHASH_MARGIN')
+        return cost < max(floor, config.get('BCRYPT_MIN_LOG_ROUNDS'))
@@ -0,0 +1,59 @@
+"""Times how long requests wait for a pooled database connection."""
+# SQLAlchemy imports
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+# Python imports
+from time import perf_counter
+
+
+class TimedQueuePool(QueuePool):
+    """
+    A QueuePool that counts its checkouts and how long they waited for a
+    connection to be returned or opened. Checkouts that wait longer than
+    pool_timeout fail with "QueuePool limit ... reached" and are counted
+    as timeouts.
+    """
+
+    checkouts = 0
+    timeouts = 0
+    wait_seconds = 0.0
+    max_wait_seconds = 0.0
+
+    def _do_get(self):
+        start = perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            TimedQueuePool.timeouts += 1
+            raise
+        finally:
+            waited = perf_counter() - start
+            TimedQueuePool.checkouts += 1
+            TimedQueuePool.wait_seconds += waited
+            TimedQueuePool.max_wait_seconds = max(
+                TimedQueuePool.max_wait_seconds, waited)
+
+    def stats(self) -> dict:
+        """
+        Returns the state of the pool and the counters of every pool
+
+        Args:
+            None
+
+        Returns:
+            dict: The size, checked in, checked out and overflow
+            connections, and the checkout counters
+        """
+
+        return {
+            "size": self.size(),
+            "checked_in": self.checkedin(),
+            "checked_out": self.checkedout(),
+            "overflow": max(self.overflow(), 0),
+            "max_overflow": self._max_overflow,
+            "checkouts": TimedQueuePool.checkouts,
+            "timeouts": TimedQueuePool.timeouts,
+            "wait_seconds": TimedQueuePool.wait_seconds,
+            "max_wait_seconds": TimedQueuePool.max_wait_seconds,
+        }
@@ -3,7 +3,7 @@
 from marshmallow import fields
 
 # User model imports
-from app import FlaskApp
+from app import create_app
 from api.db.models import (
     IngredientModel,
     MenuItemModel,
@@ -14,7 +14,7 @@ from api.db.models import (
 )
 
 # Initialzie the flask app
-app = FlaskApp()
+app = create_app()
 
 
 class IngredientSchema(app.ma.SQLAlchemyAutoSchema):
@@ -47,7 +47,7 @@ class OrderItemSchema(app.ma.SQLAlchemyAutoSchema):
 class UserSchema(app.ma.SQLAlchemyAutoSchema):
     class Meta:
         model = UserModel
-        exclude = ("_password",)
+        exclude = ("_password", "_orders_count")
 
     password = fields.String(attribute='_password')
     orders_placed = fields.Integer(attribute='orders_placed')
@@ -0,0 +1,231 @@
+"""Compiles the marshmallow schemas into specialised dump functions."""
+# Flask imports
+from flask import Response, current_app, has_app_context, json
+from flask import jsonify as flask_jsonify
+
+# Marshmallow imports
+from marshmallow import Schema, fields, missing
+from marshmallow.decorators import POST_DUMP, PRE_DUMP
+
+# Python imports
+import re
+from functools import lru_cache
+from typing import Any, Callable, List
+import orjson
+
+# Fields whose _serialize returns values of this exact type unchanged
+_PASSTHROUGH = {
+    fields.Integer: int,
+    fields.Float: float,
+    fields.String: str,
+    fields.Boolean: bool,
+}
+
+# Nesting deeper than this is dumped by marshmallow, e.g. Nested("self")
+_MAX_DEPTH = 8
+
+# A number in exponent notation, which orjson writes as 1e-7 where the
+# json module writes 1e-07, or a number below 1e-4, which orjson writes
+# as 0.00001 where the json module writes 1e-05
+_EXPONENT = re.compile(
+    rb'(?:^|[:,\[])-?(?:[0-9]+(?:\.[0-9]+)?[eE]|0\.0000)')
+
+# Types flask's encoder writes differently from orjson, e.g. datetimes as
+# HTTP dates, so they raise and the json module is used
+_PASSTHROUGH_OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME
+                        | orjson.OPT_PASSTHROUGH_DATACLASS
+                        | orjson.OPT_PASSTHROUGH_SUBCLASS)
+
+
+def _value(index: int, field, name: str, nested=None) -> str:
+    """Build the expression serialising the attribute value `v` of a field.
+
+    Args:
+        index (int): The position of the field, naming its globals
+        field: The marshmallow field
+        name (str): The name of the field in the schema
+        nested: The compiled dump function of a Nested field's schema
+
+    Returns:
+        str: A Python expression
+    """
+    if nested is not None:
+        if field.schema.many or field.many:
+            return f"None if v is None else [_n{index}(x) for x in v]"
+        return f"None if v is None else _n{index}(v)"
+
+    passthrough = _PASSTHROUGH.get(type(field))
+    if passthrough is not None and not getattr(field, "as_string", False):
+        return (f"v if v is None or v.__class__ is {passthrough.__name__} "
+                f"else _f{index}._serialize(v, {name!r}, obj)")
+    return f"_f{index}._serialize(v, {name!r}, obj)"
+
+
+def _compile(schema, depth: int = 0) -> Callable[[Any], dict]:
+    """Generate the dump function of a schema instance.
+
+    The function reads each attribute directly and inlines the
+    serialisation of plain values, instead of going through
+    Field.serialize and the schema's accessor for every field of every
+    object. Anything it cannot specialise is handed to marshmallow.
+
+    Args:
+        schema: The marshmallow schema instance, with many=False
+        depth (int): How deeply this schema is nested
+
+    Returns:
+        Callable: Dumps one object exactly like schema.dump(obj)
+    """
+    def generic(obj):
+        return schema.dump(obj, many=False)
+
+    if (depth > _MAX_DEPTH
+            or schema._has_processors(PRE_DUMP)
+            or schema._has_processors(POST_DUMP)
+            or type(schema).get_attribute is not Schema.get_attribute):
+        return generic
+
+    env = {"_missing": missing, "_generic": generic,
+           "_accessor": schema.get_attribute, "_dict": schema.dict_class}
+    lines = ["def dump(obj):",
+             # Mappings are read by key, which only marshmallow handles
+             "    if hasattr(obj, '__getitem__'):",
+             "        return _generic(obj)",
+             "    ret = _dict()"]
+
+    for index, (name, field) in enumerate(schema.dump_fields.items()):
+        env[f"_f{index}"] = field
+        key = field.data_key if field.data_key is not None else name
+        attr = field.attribute if field.attribute is not None else name
+        serialize = [f"    v = _f{index}.serialize({name!r}, obj, _accessor)",
+                     "    if v is not _missing:",
+                     f"        ret[{key!r}] = v"]
+
+        # Dotted attributes and fields that ignore the attribute
+        if "." in attr or not field._CHECK_ATTRIBUTE:
+            lines += serialize
+            continue
+
+        nested = None
+        if type(field) is fields.Nested:
+            nested = env[f"_n{index}"] = _compile(field.schema, depth + 1)
+
+        # A missing attribute falls back to the field's default
+        lines += [f"    v = getattr(obj, {attr!r}, _missing)",
+                  "    if v is _missing:"]
+        lines += ["    " + line for line in serialize]
+        lines += ["    else:",
+                  f"        ret[{key!r}] = {_value(index, field, name, nested)}"]
+
+    lines.append("    return ret")
+    exec(compile("\n".join(lines), f"<dump {type(schema).__name__}>",
+                 "exec"), env)
+    return env["dump"]
+
+
+@lru_cache(maxsize=None)
+def compile_dump(schema_cls) -> Callable[[Any], dict]:
+    """Get the compiled dump function of a schema class.
+
+    Args:
+        schema_cls: The marshmallow schema class
+
+    Returns:
+        Callable: Dumps one object exactly like schema_cls().dump(obj)
+    """
+    return _compile(schema_cls())
+
+
+def dump(schema_cls, obj, many: bool = True):
+    """Dump objects with the compiled function of a schema class.
+
+    Args:
+        schema_cls: The marshmallow schema class
+        obj: An iterable of objects, or a single object if many is False
+        many (bool): Whether obj is an iterable of objects
+
+    Returns:
+        The same data as schema_cls(many=many).dump(obj)
+    """
+    function = compile_dump(schema_cls)
+    if many:
+        return [function(item) for item in obj]
+    return function(obj)
+
+
+def dumps(data) -> bytes:
+    """Encode data as compact JSON with orjson.
+
+    The output is byte-identical to
+    flask.json.dumps(data, separators=(",", ":")): whenever orjson would
+    write something differently (escapes, exponents, types it does not
+    know) the json module is used instead. The exception is NaN and
+    infinite floats, which are not valid JSON and orjson writes as null.
+
+    Args:
+        data: The data to encode
+
+    Returns:
+        bytes: The UTF-8 encoded JSON
+    """
+    sort_keys, ascii_only = True, True
+    if has_app_context():
+        sort_keys = current_app.config["JSON_SORT_KEYS"]
+        ascii_only = current_app.config["JSON_AS_ASCII"]
+
+    try:
+        body = orjson.dumps(data, option=_PASSTHROUGH_OPTIONS | (
+            orjson.OPT_SORT_KEYS if sort_keys else 0))
+    except TypeError:
+        body = None
+
+    if (body is None or b"\\u" in body or _EXPONENT.search(body)
+            or ascii_only and (not body.isascii() or b"\x7f" in body)):
+        body = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    return body
+
+
+def jsonify(data) -> Response:
+    """Serve data as JSON, like flask.jsonify but encoded with dumps.
+
+    Args:
+        data: The data to send
+
+    Returns:
+        Response
+    """
+    config = current_app.config
+    if config["JSONIFY_PRETTYPRINT_REGULAR"] or current_app.debug:
+        return flask_jsonify(data)
+    return Response(dumps(data) + b"\n", mimetype=config["JSONIFY_MIMETYPE"])
+
+
+def mismatches(schema_cls, rows) -> List[str]:
+    """Compare the compiled dump and encoding of rows against marshmallow.
+
+    Args:
+        schema_cls: The marshmallow schema class
+        rows (list): The objects to dump
+
+    Returns:
+        list[str]: A description of each difference, empty if none
+    """
+    expected = schema_cls(many=True).dump(rows)
+    actual = dump(schema_cls, rows)
+    problems = []
+    for index, (want, got) in enumerate(zip(expected, actual)):
+        # Comparing unsorted encodings also checks the key order
+        if json.dumps(want, sort_keys=False) != \
+                json.dumps(got, sort_keys=False):
+            problems.append(f"{schema_cls.__name__} row {index}: "
+                            f"expected {want!r}, dumped {got!r}")
+    if len(expected) != len(actual):
+        problems.append(f"{schema_cls.__name__}: expected {len(expected)} "
+                        f"rows, dumped {len(actual)}")
+
+    wanted = flask_jsonify(expected).get_data()
+    body = jsonify(expected).get_data()
+    if body != wanted:
+        problems.append(f"{schema_cls.__name__}: encoding differs from "
+                        f"jsonify, {body[:200]!r} != {wanted[:200]!r}")
+    return problems
@@ -0,0 +1,98 @@
+"""Collapses bursts of change notifications into a single refresh."""
+# Python imports
+from time import monotonic
+from typing import Any, Callable, List
+from eventlet import spawn_after
+
+
+class Coalescer():
+    """
+    Buffers the notifications received on a channel and hands them to a
+    flush callback in one batch.
+
+    The batch is flushed once no notification has arrived for `window`
+    seconds, but never later than `max_delay` seconds after the first
+    notification of the batch, so a steady stream of writes still reaches
+    clients.
+    """
+
+    def __init__(self, flush: Callable[[List[Any]], None],
+                 window: float, max_delay: float):
+        """
+        Args:
+            flush (Callable):
+                Called with the list of buffered notifications, in the order
+                they were received
+
+            window (float):
+                Seconds of quiet after which the batch is flushed
+
+            max_delay (float):
+                Upper bound in seconds on how long a notification is held
+        """
+
+        self.flush = flush
+        self.window = window
+        self.max_delay = max(window, max_delay)
+        self.received = 0
+        self.broadcasts = 0
+        self._pending = []
+        self._first_at = None
+        self._timer = None
+
+    def add(self, notification: Any):
+        """
+        Buffers a notification and (re)schedules the flush
+
+        Args:
+            notification: The notification, passed on to the flush callback
+
+        Returns:
+            None
+        """
+
+        now = monotonic()
+        self.received += 1
+        self._pending.append(notification)
+        if self._first_at is None:
+            self._first_at = now
+
+        if self._timer is not None:
+            self._timer.cancel()
+        deadline = min(now + self.window, self._first_at + self.max_delay)
+        self._timer = spawn_after(max(0, deadline - now), self._flush)
+
+    def _flush(self):
+        """
+        Hands the buffered notifications to the flush callback
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+
+        pending, self._pending = self._pending, []
+        self._first_at = None
+        self._timer = None
+        if pending:
+            self.broadcasts += 1
+            self.flush(pending)
+
+    def stats(self) -> dict:
+        """
+        Returns the counters of the coalescer
+
+        Args:
+            None
+
+        Returns:
+            dict: The notifications received and the broadcasts sent
+        """
+
+        return {
+            "received": self.received,
+            "broadcasts": self.broadcasts,
+            "pending": len(self._pending),
+        }
@@ -0,0 +1,234 @@
+"""Exports the order history as CSV or NDJSON, one batch at a time."""
+# Flask imports
+from flask import Response, abort, make_response, request
+from flask import stream_with_context
+
+# Python imports
+import csv
+import io
+from datetime import date, datetime, time, timedelta
+from itertools import islice
+from typing import Iterator, Optional
+from eventlet import sleep
+
+# User module imports
+from api.db.models import MenuItemModel, OrderItemModel, OrderModel
+from api.db.models import UserModel, app
+from api.db.serializers import dumps
+
+
+class OrderExport():
+    """
+    Streams orders with their items, unit prices and customer for
+    reporting. Rows are read through a server-side cursor and written one
+    batch at a time, so memory is bounded by the batch size however many
+    orders are exported. The server waits on psycopg2 through the hub
+    (see server.py), so other greenthreads keep running while a batch is
+    fetched.
+
+    Two formats are supported:
+
+        csv
+            One line per order item, repeating the order and customer
+            columns, with a header line
+
+        ndjson
+            One JSON object per order, with its customer and a list of
+            its items
+
+    Unit prices are the current prices of the menu items, as orders do
+    not record the price they were placed at.
+    """
+
+    # The mimetype of each format
+    FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+    # The columns of a CSV export
+    COLUMNS = ("order_id", "created_on", "complete", "customer_id",
+               "username", "firstname", "lastname", "email", "item_id",
+               "menuitem_id", "flavour", "qty", "unit_price", "total")
+
+    @staticmethod
+    def query(start: Optional[date] = None, end: Optional[date] = None):
+        """
+        Selects a row per order item of the orders placed over a range of
+        days, in order
+
+        Args:
+            start (date): The first day, both inclusive, if any
+            end (date): The last day, if any
+
+        Returns:
+            Query: Rows of the values of COLUMNS, bar the total
+        """
+
+        query = app.db.session.query(
+            OrderModel.id, OrderModel.created_on, OrderModel.complete,
+            UserModel.id, UserModel.username, UserModel.firstname,
+            UserModel.lastname, UserModel.email, OrderItemModel.id,
+            MenuItemModel.id, MenuItemModel.flavour, OrderItemModel.qty,
+            MenuItemModel.price
+        ).join(UserModel, OrderModel.user_id == UserModel.id).join(
+            OrderItemModel, OrderItemModel.order_id == OrderModel.id).join(
+            MenuItemModel, OrderItemModel.menuitem_id == MenuItemModel.id)
+
+        if start is not None:
+            query = query.filter(
+                OrderModel.created_on >= datetime.combine(start, time.min))
+        if end is not None:
+            query = query.filter(OrderModel.created_on < datetime.combine(
+                end + timedelta(days=1), time.min))
+        return query.order_by(OrderModel.id, OrderItemModel.id)
+
+    @staticmethod
+    def _batches(query, batch_size: int) -> Iterator[list]:
+        """
+        Reads the rows of a query from a server-side cursor
+
+        Args:
+            query: The query selecting the rows
+            batch_size (int): The rows fetched at a time
+
+        Returns:
+            Iterator[list]: Lists of at most batch_size rows
+        """
+
+        rows = iter(query.execution_options(
+            stream_results=True).yield_per(batch_size))
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            yield batch
+            # Let other greenthreads run between batches
+            sleep(0)
+
+    @staticmethod
+    def _created_on(row) -> Optional[str]:
+        return row[1].isoformat() if row[1] is not None else None
+
+    @staticmethod
+    def csv_chunks(query, batch_size: int) -> Iterator[bytes]:
+        """
+        Writes the rows of a query as CSV
+
+        Args:
+            query: A query returned by OrderExport.query
+            batch_size (int): The rows written at a time
+
+        Returns:
+            Iterator[bytes]: The header, then the lines of each batch
+        """
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(OrderExport.COLUMNS)
+        for batch in OrderExport._batches(query, batch_size):
+            writer.writerows(
+                (row[0], OrderExport._created_on(row)) + tuple(row[2:]) +
+                (round(row[11] * row[12], 2),)
+                for row in batch)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            # No rows, only the header was written
+            yield buffer.getvalue().encode()
+
+    @staticmethod
+    def ndjson_chunks(query, batch_size: int) -> Iterator[bytes]:
+        """
+        Writes the rows of a query as one JSON object per order
+
+        Args:
+            query: A query returned by OrderExport.query
+            batch_size (int): The rows read at a time
+
+        Returns:
+            Iterator[bytes]: The lines of the orders completed by each
+            batch. An order whose items straddle two batches is written
+            with the second
+        """
+
+        order = None
+        for batch in OrderExport._batches(query, batch_size):
+            lines = []
+            for row in batch:
+                if order is None or order["id"] != row[0]:
+                    if order is not None:
+                        lines.append(dumps(order))
+                    order = {
+                        "id": row[0],
+                        "created_on": OrderExport._created_on(row),
+                        "complete": row[2],
+                        "customer": {
+                            "id": row[3], "username": row[4],
+                            "firstname": row[5], "lastname": row[6],
+                            "email": row[7]},
+                        "items": [],
+                        "total": 0,
+                    }
+                order["items"].append({
+                    "id": row[8], "menuitem_id": row[9], "flavour": row[10],
+                    "qty": row[11], "unit_price": row[12]})
+                order["total"] = round(order["total"] + row[11] * row[12], 2)
+            if lines:
+                yield b"\n".join(lines) + b"\n"
+        if order is not None:
+            yield dumps(order) + b"\n"
+
+    @staticmethod
+    def chunks(fmt: str, start: Optional[date] = None,
+               end: Optional[date] = None,
+               batch_size: Optional[int] = None) -> Iterator[bytes]:
+        """
+        Exports the orders placed over a range of days
+
+        Args:
+            fmt (str): 'csv' or 'ndjson'
+            start (date): The first day, both inclusive, if any
+            end (date): The last day, if any
+            batch_size (int): The rows read at a time, by default
+                LIST_STREAM_BATCH_SIZE
+
+        Returns:
+            Iterator[bytes]: The export, one batch at a time
+        """
+
+        batch_size = batch_size or app.config.get("LIST_STREAM_BATCH_SIZE")
+        query = OrderExport.query(start, end)
+        if fmt == "csv":
+            return OrderExport.csv_chunks(query, batch_size)
+        return OrderExport.ndjson_chunks(query, batch_size)
+
+    @staticmethod
+    def respond():
+        """
+        Streams the export requested by the query parameters: `format`,
+        'csv' (the default) or 'ndjson', and optionally `start` and `end`
+        as YYYY-MM-DD dates, both inclusive
+
+        Args:
+            None
+
+        Returns:
+            Response
+        """
+
+        fmt = request.args.get("format", "csv")
+        if fmt not in OrderExport.FORMATS:
+            abort(make_response(
+                {"message": "format must be 'csv' or 'ndjson'"}, 400))
+        try:
+            start, end = (date.fromisoformat(request.args[key])
+                          if request.args.get(key) else None
+                          for key in ("start", "end"))
+        except ValueError:
+            abort(make_response(
+                {"message": "start and end must be YYYY-MM-DD dates"}, 400))
+
+        return Response(
+            stream_with_context(OrderExport.chunks(fmt, start, end)),
+            mimetype=OrderExport.FORMATS[fmt],
+            headers={"Content-Disposition":
+                     f"attachment; filename=orders.{fmt}"})
@@ -0,0 +1,81 @@
+"""Elects the process that turns change notifications into socket events."""
+# Python imports
+from typing import Callable
+import logging
+import psycopg2
+
+# Eventlet imports
+from eventlet import sleep, tpool
+
+
+class Leader():
+    """
+    Elects one process among those sharing a database by holding a
+    session-level advisory lock on a dedicated connection. Postgres
+    releases the lock when that connection closes, so if the leader dies
+    another process takes over within `retry` seconds. Connecting and
+    querying run in a native thread, so a slow or unreachable database
+    does not block the hub.
+    """
+
+    def __init__(self, conn_det: dict, key: int, retry: float, logger=None):
+        """
+        Args:
+            conn_det (dict): The psycopg2 connection parameters
+            key (int): The advisory lock id the processes compete for
+            retry (float): Seconds between attempts to take the lock, and
+                between checks that it is still held
+            logger: Where connection failures are reported, by default
+                the module's logger
+        """
+
+        self.conn_det = conn_det
+        self.key = key
+        self.retry = retry
+        self.logger = logger or logging.getLogger(__name__)
+        self.is_leader = False
+
+    def run(self, on_elected: Callable[[], None] = None):
+        """
+        Competes for the lock for as long as the process runs
+
+        Args:
+            on_elected (Callable): Called each time this process becomes
+                the leader
+
+        Returns:
+            NoReturn
+        """
+
+        while True:
+            conn = None
+            try:
+                conn = tpool.execute(psycopg2.connect, **self.conn_det)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    while True:
+                        if self.is_leader:
+                            # The lock lives as long as the connection does
+                            tpool.execute(cursor.execute, "SELECT 1")
+                        else:
+                            tpool.execute(
+                                cursor.execute,
+                                "SELECT pg_try_advisory_lock(%s)", (self.key,))
+                            if cursor.fetchone()[0]:
+                                self.is_leader = True
+                                if on_elected is not None:
+                                    on_elected()
+                        sleep(self.retry)
+            except psycopg2.Error as error:
+                if self.is_leader:
+                    self.logger.warning(
+                        "Lost the socket leader lock: %s", error)
+                else:
+                    self.logger.warning(
+                        "Could not compete for the socket leader lock: %s",
+                        error)
+            finally:
+                self.is_leader = False
+                if conn is not None:
+                    conn.close()
+            sleep(self.retry)
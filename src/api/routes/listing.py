@@ -0,0 +1,213 @@
+"""Serves the list endpoints in full, in keyset pages or as a stream."""
+# Flask imports
+from flask import Response, abort, json, make_response, request
+from flask import stream_with_context
+
+# SQLAlchemy imports
+from sqlalchemy import func, tuple_
+
+# Python imports
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as DecodeError
+from datetime import datetime
+from urllib.parse import urlencode
+from eventlet import sleep
+
+# User module imports
+from api.db.loaders import eager_options
+from api.db.models import app
+from api.db.serializers import dump, dumps, jsonify
+
+
+class Listing():
+    """
+    Helpers for the GET endpoints that dump a whole table.
+
+    Without query parameters a list endpoint behaves as before and returns
+    every row. Clients can opt into either of the following:
+
+        ?limit=<n>[&after=<cursor>][&sort=id|created_on]
+            Returns one page of at most n rows ordered by the sort key. The
+            cursor for the next page is sent in the X-Next-Cursor header
+            and a Link header, and is absent on the last page.
+
+        ?stream=1[&sort=id|created_on]
+            Streams every row as a JSON array, serialising one batch at a
+            time from a server-side cursor so memory stays flat.
+    """
+
+    # Rows created before created_on was tracked sort before all others
+    EPOCH = datetime(1970, 1, 1)
+
+    @staticmethod
+    def _sort_columns(model, sort: str):
+        """
+        Gets the columns making up the keyset for a sort key
+
+        Args:
+            model: The SQLAlchemy model being listed
+            sort (str): Either 'id' or 'created_on'
+
+        Returns:
+            tuple: The column expressions to order and filter on
+        """
+
+        if sort == "id":
+            return (model.id,)
+        if sort == "created_on" and hasattr(model, "created_on"):
+            return (func.coalesce(model.created_on, Listing.EPOCH), model.id)
+        abort(make_response({"message": f"Cannot sort by '{sort}'"}, 400))
+
+    @staticmethod
+    def encode_cursor(row, sort: str) -> str:
+        """
+        Builds the opaque cursor pointing just past a row
+
+        Args:
+            row: The last model instance of a page
+            sort (str): The sort key the page was ordered by
+
+        Returns:
+            str: A url safe cursor string
+        """
+
+        if sort == "id":
+            key = [row.id]
+        else:
+            created_on = row.created_on or Listing.EPOCH
+            key = [created_on.isoformat(), row.id]
+        return urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str, sort: str) -> tuple:
+        """
+        Reads the keyset values back out of a cursor
+
+        Args:
+            cursor (str): A cursor created by encode_cursor
+            sort (str): The sort key the cursor was created for
+
+        Returns:
+            tuple: The keyset values to continue after
+
+        Raises:
+            HTTPException: A 400 response if the cursor is malformed
+        """
+
+        try:
+            key = json.loads(urlsafe_b64decode(cursor.encode()))
+            if sort == "id":
+                (row_id,) = key
+                return (int(row_id),)
+            created_on, row_id = key
+            return (datetime.fromisoformat(created_on), int(row_id))
+        except (DecodeError, TypeError, ValueError):
+            abort(make_response({"message": "Invalid cursor"}, 400))
+
+    @staticmethod
+    def page(query, schema_cls, sort: str, limit: int, after: str = None):
+        """
+        Returns a single keyset page of a query
+
+        Args:
+            query: The query selecting the rows to list
+            schema_cls: The schema class used to dump each row
+            sort (str): The sort key, 'id' or 'created_on'
+            limit (int): The maximum amount of rows in the page
+            after (str): The cursor of the previous page, if any
+
+        Returns:
+            Response
+        """
+
+        columns = Listing._sort_columns(schema_cls.opts.model, sort)
+        if after:
+            query = query.filter(
+                tuple_(*columns) > tuple_(*Listing.decode_cursor(after, sort)))
+
+        # Fetch one extra row to know whether another page exists
+        rows = query.order_by(*columns).limit(limit + 1).all()
+        response = jsonify(dump(schema_cls, rows[:limit]))
+
+        if len(rows) > limit:
+            cursor = Listing.encode_cursor(rows[limit - 1], sort)
+            args = request.args.to_dict()
+            args.update(after=cursor)
+            response.headers["X-Next-Cursor"] = cursor
+            response.headers["Link"] = \
+                f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+        return response
+
+    @staticmethod
+    def stream(query, schema_cls, sort: str):
+        """
+        Streams every row of a query as one JSON array
+
+        Rows are read through a server-side cursor and serialised one batch
+        at a time, so only a single batch is held in memory. Fetching a
+        batch waits on the database through the hub (see server.py), so
+        other greenthreads run meanwhile.
+
+        Args:
+            query: The query selecting the rows to list
+            schema_cls: The schema class used to dump each row
+            sort (str): The sort key, 'id' or 'created_on'
+
+        Returns:
+            Response
+        """
+
+        batch_size = app.config.get("LIST_STREAM_BATCH_SIZE")
+        columns = Listing._sort_columns(schema_cls.opts.model, sort)
+        rows = query.order_by(*columns).execution_options(
+            stream_results=True).yield_per(batch_size)
+
+        def chunks():
+            separator = b"["
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) == batch_size:
+                    yield separator + dumps(dump(schema_cls, batch))[1:-1]
+                    separator = b","
+                    batch = []
+                    # Let other greenthreads run between batches
+                    sleep(0)
+            if batch:
+                yield separator + dumps(dump(schema_cls, batch))[1:-1]
+                separator = b","
+            yield b"[]" if separator == b"[" else b"]"
+
+        return Response(
+            stream_with_context(chunks()), mimetype="application/json")
+
+    @staticmethod
+    def respond(query, schema_cls):
+        """
+        Serves a list endpoint according to the request's query parameters
+
+        Args:
+            query: The query selecting the rows to list
+            schema_cls: The schema class used to dump each row
+
+        Returns:
+            Response
+        """
+
+        query = query.options(*eager_options(schema_cls))
+        sort = request.args.get("sort", "id")
+
+        if request.args.get("stream"):
+            return Listing.stream(query, schema_cls, sort)
+
+        if "limit" in request.args or "after" in request.args:
+            try:
+                limit = int(request.args.get(
+                    "limit", app.config.get("LIST_PAGE_MAX_LIMIT")))
+            except ValueError:
+                abort(make_response({"message": "Invalid limit"}, 400))
+            limit = max(1, min(limit, app.config.get("LIST_PAGE_MAX_LIMIT")))
+            return Listing.page(
+                query, schema_cls, sort, limit, request.args.get("after"))
+
+        return jsonify(dump(schema_cls, query.all()))
@@ -0,0 +1,312 @@
+"""Collects request, database and event loop metrics for Prometheus."""
+# Flask imports
+from flask import Response, current_app, g, has_request_context, request
+
+# SQLAlchemy imports
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Eventlet imports
+from eventlet import hubs
+
+# Python imports
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from time import perf_counter
+from typing import Iterator, Sequence, Tuple
+
+
+class Metric(ABC):
+    """A metric with a value per set of label values."""
+
+    type = None
+
+    def __init__(self, name: str, help: str, labels: Sequence[str]):
+        """
+        Args:
+            name (str): The metric name
+            help (str): The description of the metric
+            labels (Sequence[str]): The names of the labels
+        """
+
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+
+    def _labels(self, values: Tuple[str, ...], **extra) -> str:
+        """Formats label values, e.g. {endpoint="/orders",le="0.5"}."""
+        pairs = list(zip(self.labels, values)) + list(extra.items())
+        if not pairs:
+            return ""
+        return "{" + ",".join('{}="{}"'.format(
+            name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+            for name, value in pairs) + "}"
+
+    @abstractmethod
+    def _samples(self) -> Iterator[str]:
+        """Yields the sample lines of the metric, one per value."""
+
+    def render(self) -> str:
+        """Returns the metric in the Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.help}",
+                 f"# TYPE {self.name} {self.type}"]
+        return "\n".join(lines + list(self._samples()))
+
+
+class Counter(Metric):
+    """A counter per set of label values."""
+
+    type = "counter"
+
+    def inc(self, values: Tuple[str, ...], amount: float = 1):
+        """Adds amount to the counter of a set of label values."""
+        self.values[values] = self.values.get(values, 0) + amount
+
+    def _samples(self):
+        for values, value in sorted(self.values.items()):
+            yield f"{self.name}{self._labels(values)} {value}"
+
+
+class Gauge(Counter):
+    """A value that can go up and down, per set of label values."""
+
+    type = "gauge"
+
+    def set(self, values: Tuple[str, ...], value: float):
+        """Sets the value of a set of label values."""
+        self.values[values] = value
+
+
+class Histogram(Metric):
+    """A histogram with fixed buckets per set of label values."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str],
+                 buckets: Sequence[float]):
+        """
+        Args:
+            name (str): The metric name
+            help (str): The description of the metric
+            labels (Sequence[str]): The names of the labels
+            buckets (Sequence[float]): The ascending upper bounds of the
+                buckets, without +Inf
+        """
+
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, values: Tuple[str, ...], amount: float):
+        """Records an observation for a set of label values."""
+        # The count of each bucket, +Inf last, and the sum
+        entry = self.values.setdefault(
+            values, [[0] * (len(self.buckets) + 1), 0.0])
+        entry[0][bisect_left(self.buckets, amount)] += 1
+        entry[1] += amount
+
+    def _samples(self):
+        for values, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                yield (f"{self.name}_bucket"
+                       f"{self._labels(values, le=bound)} {cumulative}")
+            yield f"{self.name}_sum{self._labels(values)} {total}"
+            yield f"{self.name}_count{self._labels(values)} {cumulative}"
+
+
+class Metrics():
+    """
+    Records the latency, response size, status, SQL statement count and
+    database time of every request, labelled by route, and how busy the
+    eventlet hub is. Served in the Prometheus text format on /metrics.
+
+    Hub utilisation is derived from the time the hub spends waiting for
+    I/O: rate(idle) / rate(running) is the fraction of time it was idle.
+    """
+
+    requests = Counter(
+        "http_requests_total", "Requests handled",
+        ("endpoint", "method", "status"))
+    latency = Histogram(
+        "http_request_duration_seconds", "Time to produce a response",
+        ("endpoint", "method"),
+        (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10))
+    response_size = Histogram(
+        "http_response_size_bytes", "Size of response bodies",
+        ("endpoint",), (256, 1024, 4096, 16384, 65536, 262144, 1048576,
+                        4194304, 16777216))
+    statements = Histogram(
+        "http_request_sql_statements", "SQL statements run per request",
+        ("endpoint",), (0, 1, 2, 3, 5, 10, 20, 50, 100, 500))
+    db_time = Histogram(
+        "http_request_db_seconds", "Time spent in SQL per request",
+        ("endpoint",), (.001, .005, .01, .025, .05, .1, .25, .5, 1, 5))
+    background_statements = Counter(
+        "db_background_statements_total",
+        "SQL statements run outside of requests, e.g. by socket listeners",
+        ())
+    hub_idle = Counter(
+        "eventlet_hub_idle_seconds_total",
+        "Time the eventlet hub spent waiting for I/O or timers", ())
+    hub_running = Counter(
+        "eventlet_hub_running_seconds_total",
+        "Time since the eventlet hub was instrumented", ())
+
+    pool_connections = Gauge(
+        "db_pool_connections", "Connections of the pool by state",
+        ("state",))
+    pool_checkouts = Counter(
+        "db_pool_checkouts_total", "Connections checked out of the pool", ())
+    pool_timeouts = Counter(
+        "db_pool_checkout_timeouts_total",
+        "Checkouts that gave up waiting for a connection", ())
+    pool_wait = Counter(
+        "db_pool_checkout_wait_seconds_total",
+        "Time spent waiting for a connection to be checked out", ())
+
+    _hub_started = None
+
+    @staticmethod
+    def init_app(app):
+        """
+        Installs the request hooks, the SQL hooks and the /metrics route
+
+        Args:
+            app: The Flask app
+
+        Returns:
+            None
+        """
+
+        app.before_request(Metrics._before_request)
+        app.after_request(Metrics._after_request)
+        app.add_url_rule("/metrics", "metrics", Metrics.respond)
+
+        if not event.contains(Engine, "before_cursor_execute",
+                              Metrics._before_cursor_execute):
+            event.listen(Engine, "before_cursor_execute",
+                         Metrics._before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute",
+                         Metrics._after_cursor_execute)
+
+    @staticmethod
+    def _instrument_hub():
+        """
+        Times the hub's waits for I/O. Done on the first request so the
+        hub already exists and eventlet has been monkey patched
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+
+        hub = hubs.get_hub()
+        wait = hub.wait
+
+        def timed_wait(seconds=None):
+            start = perf_counter()
+            try:
+                return wait(seconds)
+            finally:
+                Metrics.hub_idle.inc((), perf_counter() - start)
+
+        hub.wait = timed_wait
+        Metrics._hub_started = perf_counter()
+
+    @staticmethod
+    def _before_request():
+        if Metrics._hub_started is None:
+            Metrics._instrument_hub()
+        g.metrics_start = perf_counter()
+        g.sql_statements = 0
+        g.sql_seconds = 0.0
+
+    @staticmethod
+    def _after_request(response):
+        if "metrics_start" not in g:
+            # Another before_request hook failed before ours ran
+            return response
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        method = request.method
+        # The request context may be gone by the time a stream is closed
+        context = g._get_current_object()
+
+        def record(size):
+            Metrics.requests.inc(
+                (endpoint, method, str(response.status_code)))
+            Metrics.latency.observe(
+                (endpoint, method), perf_counter() - context.metrics_start)
+            Metrics.response_size.observe((endpoint,), size)
+            Metrics.statements.observe((endpoint,), context.sql_statements)
+            Metrics.db_time.observe((endpoint,), context.sql_seconds)
+
+        if not response.is_streamed:
+            record(response.calculate_content_length() or 0)
+            return response
+
+        # Streamed responses are measured once the whole body has been
+        # sent, including the SQL run while generating it
+        chunks = response.response
+        sent = [0]
+
+        def counted():
+            for chunk in chunks:
+                sent[0] += len(chunk)
+                yield chunk
+
+        response.response = counted()
+        response.call_on_close(lambda: record(sent[0]))
+        return response
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                               executemany):
+        conn.info.setdefault("metrics_start", []).append(perf_counter())
+
+    @staticmethod
+    def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                              executemany):
+        elapsed = perf_counter() - conn.info["metrics_start"].pop()
+        if has_request_context() and "sql_statements" in g:
+            g.sql_statements += 1
+            g.sql_seconds += elapsed
+        else:
+            Metrics.background_statements.inc(())
+
+    @staticmethod
+    def respond():
+        """
+        Serves every metric in the Prometheus text format
+
+        Args:
+            None
+
+        Returns:
+            Response
+        """
+
+        if Metrics._hub_started is not None:
+            Metrics.hub_running.values[()] = \
+                perf_counter() - Metrics._hub_started
+
+        pool = current_app.db.engine.pool
+        if hasattr(pool, "stats"):
+            stats = pool.stats()
+            for state in ("checked_in", "checked_out", "overflow"):
+                Metrics.pool_connections.set((state,), stats[state])
+            Metrics.pool_checkouts.values[()] = stats["checkouts"]
+            Metrics.pool_timeouts.values[()] = stats["timeouts"]
+            Metrics.pool_wait.values[()] = stats["wait_seconds"]
+
+        metrics = (Metrics.requests, Metrics.latency, Metrics.response_size,
+                   Metrics.statements, Metrics.db_time,
+                   Metrics.background_statements, Metrics.hub_idle,
+                   Metrics.hub_running, Metrics.pool_connections,
+                   Metrics.pool_checkouts, Metrics.pool_timeouts,
+                   Metrics.pool_wait)
+        body = "\n".join(metric.render() for metric in metrics) + "\n"
+        return Response(body, mimetype="text/plain; version=0.0.4")
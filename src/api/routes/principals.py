@@ -0,0 +1,150 @@
+"""Caches the users behind verified JWTs between requests."""
+# Python imports
+from collections import OrderedDict
+from time import monotonic
+from typing import Callable, NamedTuple, Optional
+
+
+class Principal(NamedTuple):
+    """The identity of the user making an authenticated request."""
+
+    id: int
+    public_id: str
+    username: str
+    is_admin: bool
+
+    @staticmethod
+    def from_user(user) -> "Principal":
+        """
+        Builds the principal of a user
+
+        Args:
+            user (UserModel): The user
+
+        Returns:
+            Principal
+        """
+
+        return Principal(user.id, user.public_id, user.username,
+                         bool(user.is_admin))
+
+
+class PrincipalCache():
+    """
+    A bounded LRU cache of principals by public id, whose entries expire
+    after a TTL.
+
+    Entries are dropped as soon as the users table notifies the socket
+    listener that a user changed. While the listener is not running
+    nothing would drop them, so every lookup goes to the database.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        """
+        Args:
+            maxsize (int): The most principals kept at once
+            ttl (float): Seconds a principal is kept for
+        """
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.listening = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._public_ids = {}
+        self._generation = 0
+
+    def get(self, public_id: str,
+            load: Callable[[str], Optional[Principal]]) -> Optional[Principal]:
+        """
+        Returns the principal for a public id, loading it on a miss
+
+        Args:
+            public_id (str): The public id from the JWT
+            load (Callable): Fetches the principal from the database, or
+                returns None if there is no such user
+
+        Returns:
+            Principal: The principal, or None if there is no such user
+        """
+
+        if self.listening:
+            entry = self._entries.get(public_id)
+            if entry is not None and entry[0] > monotonic():
+                self._entries.move_to_end(public_id)
+                self.hits += 1
+                return entry[1]
+
+        self.misses += 1
+        generation = self._generation
+        principal = load(public_id)
+
+        # Skip caching if the user may have changed while it was loading
+        if principal is not None and self.listening \
+                and generation == self._generation:
+            self._put(principal)
+        return principal
+
+    def _put(self, principal: Principal):
+        """
+        Stores a principal, evicting the least recently used if full
+
+        Args:
+            principal (Principal): The principal to store
+
+        Returns:
+            None
+        """
+
+        self._entries[principal.public_id] = (
+            monotonic() + self.ttl, principal)
+        self._entries.move_to_end(principal.public_id)
+        self._public_ids[principal.id] = principal.public_id
+        while len(self._entries) > self.maxsize:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._public_ids.pop(evicted.id, None)
+            self.evictions += 1
+
+    def invalidate(self, change: dict = None):
+        """
+        Drops the principal of a changed user, or every principal if the
+        change is unknown
+
+        Args:
+            change (dict): A row change of the users table, as sent by
+                the change notifier
+
+        Returns:
+            None
+        """
+
+        self._generation += 1
+        if change is None:
+            self._entries.clear()
+            self._public_ids.clear()
+            return
+
+        public_id = self._public_ids.pop(change["keys"]["id"], None)
+        if public_id is not None:
+            self._entries.pop(public_id, None)
+
+    def stats(self) -> dict:
+        """
+        Returns the counters of the cache
+
+        Args:
+            None
+
+        Returns:
+            dict: The hits, misses, evictions and size of the cache
+        """
+
+        return {
+            "listening": self.listening,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+        }
@@ -0,0 +1,215 @@
+"""Relays Socket.IO messages between processes over Postgres LISTEN/NOTIFY."""
+# Python imports
+import json
+import uuid
+from collections import OrderedDict
+import psycopg2
+import socketio
+
+# Eventlet imports
+from eventlet import sleep, tpool
+from eventlet.green import select
+from eventlet.semaphore import Semaphore
+
+
+class PostgresManager(socketio.PubSubManager):
+    """
+    A python-socketio client manager that publishes every emit with
+    NOTIFY, so it reaches the clients connected to any process using the
+    same database and channel, like the Redis and Kafka managers but with
+    no extra service.
+
+    Messages are encoded as JSON, never pickled: any role that can
+    connect to the database can NOTIFY the channel, so a payload must not
+    be able to run code in the workers. Payloads that do not decode to a
+    known message are dropped.
+
+    NOTIFY payloads must be shorter than 8000 bytes, so messages are split
+    into chunks sent in one transaction. Postgres delivers the
+    notifications of a transaction together and in order, and each chunk
+    is tagged with its message id, index and count so it is reassembled
+    before being handed to python-socketio.
+    """
+
+    name = 'postgres'
+
+    # Characters of JSON per notification, leaving room for the message
+    # id, index and count. The JSON is ASCII, so characters are bytes
+    CHUNK_SIZE = 7800
+
+    # The messages python-socketio publishes, and the keys each one needs
+    METHODS = {
+        "emit": ("event", "namespace"),
+        "callback": ("sid", "namespace", "id", "args"),
+        "disconnect": ("sid", "namespace"),
+        "close_room": ("room", "namespace"),
+    }
+
+    # Incomplete messages kept while waiting for their remaining chunks
+    MAX_PENDING = 1000
+
+    # Seconds between reconnection attempts
+    RETRY_DELAY = 1.0
+
+    def __init__(self, conn_det: dict, channel: str = 'socketio',
+                 write_only: bool = False, logger=None):
+        """
+        Args:
+            conn_det (dict): The psycopg2 connection parameters
+            channel (str): The NOTIFY channel shared by the processes
+            write_only (bool): Only publish, e.g. from a script
+            logger: The logger of the Socket.IO server
+        """
+
+        self.conn_det = conn_det
+        self._publisher = None
+        self._publish_lock = Semaphore()
+        super().__init__(channel=channel, write_only=write_only,
+                         logger=logger)
+
+    def _chunks(self, data) -> list:
+        """
+        Encodes a message as NOTIFY payloads
+
+        Args:
+            data (dict): The message to send
+
+        Returns:
+            list[str]: Payloads of the form "<id>:<index>:<count>:<json>"
+        """
+
+        body = json.dumps(data, ensure_ascii=True, separators=(",", ":"))
+        parts = [body[start:start + self.CHUNK_SIZE]
+                 for start in range(0, len(body), self.CHUNK_SIZE)]
+        message_id = uuid.uuid4().hex
+        return [f"{message_id}:{index}:{len(parts)}:{part}"
+                for index, part in enumerate(parts)]
+
+    def _notify(self, payloads: list):
+        """
+        Sends payloads on the channel in one transaction, so the chunks
+        of a message arrive together. Blocks, so it is run in a thread
+
+        Args:
+            payloads (list[str]): The payloads returned by _chunks
+
+        Returns:
+            None
+        """
+
+        for retry in (True, False):
+            try:
+                if self._publisher is None or self._publisher.closed:
+                    self._publisher = psycopg2.connect(**self.conn_det)
+                with self._publisher:
+                    with self._publisher.cursor() as cursor:
+                        for payload in payloads:
+                            cursor.execute(
+                                "SELECT pg_notify(%s, %s)",
+                                (self.channel, payload))
+                return
+            except psycopg2.OperationalError:
+                # The connection was lost, reconnect once
+                self._publisher = None
+                if not retry:
+                    raise
+
+    def _publish(self, data):
+        payloads = self._chunks(data)
+        with self._publish_lock:
+            # psycopg2 is not green, keep its calls off the eventlet hub
+            tpool.execute(self._notify, payloads)
+
+    @staticmethod
+    def _decode(body: str):
+        """
+        Decodes a reassembled message
+
+        Args:
+            body (str): The JSON of the message
+
+        Returns:
+            dict: The message, or None if it is not one python-socketio
+            publishes
+        """
+
+        try:
+            message = json.loads(body)
+        except ValueError:
+            return None
+        if not isinstance(message, dict):
+            return None
+        required = PostgresManager.METHODS.get(message.get("method"))
+        if required is None or any(key not in message for key in required):
+            return None
+        return message
+
+    @staticmethod
+    def _assemble(pending: OrderedDict, payload: str):
+        """
+        Adds a chunk to the message it belongs to
+
+        Args:
+            pending (OrderedDict): The chunks received so far, by message id
+            payload (str): The payload of a notification
+
+        Returns:
+            str: The JSON of the message if the chunk completed it, else
+            None
+        """
+
+        try:
+            message_id, index, count, part = payload.split(":", 3)
+            index, count = int(index), int(count)
+        except ValueError:
+            return None
+
+        if count == 1:
+            return part
+        if not 0 <= index < count:
+            return None
+
+        parts = pending.setdefault(message_id, {})
+        parts[index] = part
+        if len(parts) < count:
+            while len(pending) > PostgresManager.MAX_PENDING:
+                pending.popitem(last=False)
+            return None
+        del pending[message_id]
+        return "".join(parts.get(i, "") for i in range(count))
+
+    def _listen(self):
+        pending = OrderedDict()
+        while True:
+            conn = None
+            try:
+                conn = tpool.execute(psycopg2.connect, **self.conn_det)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        'LISTEN "{}"'.format(self.channel.replace('"', '""')))
+                while True:
+                    # Wait without blocking the eventlet hub
+                    if select.select([conn], [], [], 5) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        body = self._assemble(
+                            pending, conn.notifies.pop(0).payload)
+                        if body is None:
+                            continue
+                        message = self._decode(body)
+                        if message is None:
+                            self._get_logger().warning(
+                                'Dropped a malformed message on %s',
+                                self.channel)
+                            continue
+                        # python-socketio handles dicts as they are
+                        yield message
+            except psycopg2.Error as error:
+                self._get_logger().error(
+                    'Postgres message queue connection lost: %s', error)
+            finally:
+                if conn is not None:
+                    conn.close()
+            sleep(self.RETRY_DELAY)
@@ -6,10 +6,10 @@ from werkzeug.exceptions import HTTPException
 
 # Database importsfrom marshmallow.fields import Integer
 from api.db.models import (
+    IngredientDemandModel,
     IngredientModel,
     MenuItemCategoryModel,
     MenuItemModel,
-    OrderItemModel,
     OrderModel,
     UserModel,
     app)
@@ -21,18 +21,55 @@ from api.db.schemas import (
     OrderSchema,
     UserSchema,
 )
+from api.db.bulk import BulkCatalog, BulkOrders
+from api.db.loaders import eager_options
+from api.db.passwords import Passwords
+from api.db.serializers import dump
+from api.routes.export import OrderExport
+from api.routes.listing import Listing
+from api.routes.metrics import Metrics
+from api.routes.principals import Principal, PrincipalCache
+from api.routes.search import MenuSearch
+from api.routes.snapshots import Snapshot
 
 
 # JWT Authentication Imports
 import jwt
-from jwt.exceptions import ExpiredSignatureError, InvalidSignatureError
-from datetime import datetime, timedelta
+from jwt.exceptions import ExpiredSignatureError, InvalidTokenError
+from datetime import date, datetime, timedelta
 from method_decorator import method_decorator
-from sqlalchemy import text
-import time
+from sqlalchemy import func, text
+
+
+Metrics.init_app(app)
 
 
 class Routes():
+    @staticmethod
+    def _dump_menuitems():
+        menuitems = MenuItemModel.query.join(
+            MenuItemCategoryModel,
+            MenuItemModel.category_id == MenuItemCategoryModel.id).options(
+                *eager_options(MenuItemSchema))
+        return dump(MenuItemSchema, menuitems)
+
+    @staticmethod
+    def _dump_categories():
+        categories = MenuItemCategoryModel.query.options(
+            *eager_options(MenuItemCategorySchema))
+        return dump(MenuItemCategorySchema, categories)
+
+    # The catalog rarely changes, so it is served from memory until the
+    # menu listener in ServerSockets is notified of a change
+    menuitems_snapshot = Snapshot(lambda: Routes._dump_menuitems())
+    categories_snapshot = Snapshot(lambda: Routes._dump_categories())
+
+    # The users behind verified tokens, kept until the users listener in
+    # ServerSockets is notified that they changed
+    principals = PrincipalCache(
+        app.config.get('PRINCIPAL_CACHE_SIZE'),
+        app.config.get('PRINCIPAL_CACHE_TTL'))
+
     @staticmethod
     @app.after_request
     def add_response_headers(response=None):
@@ -42,36 +79,111 @@ class Routes():
         response.headers.add("Access-Control-Allow-Headers", "*")
         return response
 
-    class token_required(method_decorator):
-        """Decorator to verify the JWT.
+    @staticmethod
+    def _require_admin(user: Principal):
+        """
+        Refuses the request unless it is made by an admin
 
-        Inherits the method_decorator as a wrapper class to provide the
-        __name__ attribute
+        Args:
+            user (Principal): The user making the request
+
+        Returns:
+            None
+
+        Raises:
+            HTTPException: A 403 response if the user is not an admin
         """
 
-        def __call__(self, *args, **kwargs):
-            token = None
+        if not user.is_admin:
+            abort(make_response({"message": "Admin access required"}, 403))
 
-            # Retrieve the JWT from the request header
-            if 'X-Access-Token' in request.headers:
-                token = request.headers['X-Access-Token']
+    @staticmethod
+    def _catalog_batch(user: Principal, key: str):
+        """
+        Reads the list sent to a catalog batch endpoint
 
-            # Returns a 401 if there is no token
-            if not token:
-                abort(make_response({"message": 'The Token is missing'}, 401))
+        Args:
+            user (Principal): The user making the request
+            key (str): The key of the list in the body
 
-            # Decode the token to retrieve the user requesting the data
-            try:
-                data = jwt.decode(token, app.config.get(
-                    'SECRET_KEY'), algorithms="HS256")
-                current_user = UserModel.query.filter_by(
-                    public_id=data.get('public_id')).first()
+        Returns:
+            list: The entries of the list
 
-            except InvalidSignatureError:
-                abort(make_response({"message": 'Token is invalid'}, 401))
+        Raises:
+            HTTPException: A 403 response if the user is not an admin, or
+            a 400 response if the list is missing, empty or too long
+        """
+
+        Routes._require_admin(user)
 
-            except ExpiredSignatureError:
-                abort(make_response({"message": 'Token is expired'}, 401))
+        req = request.get_json(force=True)
+        entries = req.get(key) if isinstance(req, dict) else None
+        if not isinstance(entries, list) or not entries:
+            abort(make_response(
+                {"message": f"{key} must be a non-empty list"}, 400))
+        if len(entries) > app.config.get('CATALOG_BATCH_MAX_SIZE'):
+            abort(make_response({
+                "message": "A batch can have at most {} {}".format(
+                    app.config.get('CATALOG_BATCH_MAX_SIZE'), key)}, 400))
+        return entries
+
+    @staticmethod
+    def _load_principal(public_id):
+        user = UserModel.query.filter_by(public_id=public_id).first()
+        return Principal.from_user(user) if user is not None else None
+
+    @staticmethod
+    def _principal(token: str) -> Principal:
+        """
+        Verifies a JWT and finds the user it was issued to
+
+        Args:
+            token (str): The JWT sent by the client
+
+        Returns:
+            Principal: The user the token was issued to
+
+        Raises:
+            ValueError: If the token is missing, invalid or expired, or
+            its user was deleted, with the message to send back
+        """
+
+        if not token:
+            raise ValueError('The Token is missing')
+
+        try:
+            data = jwt.decode(token, app.config.get(
+                'SECRET_KEY'), algorithms="HS256")
+        except ExpiredSignatureError:
+            raise ValueError('Token is expired')
+        except InvalidTokenError:
+            raise ValueError('Token is invalid')
+
+        current_user = Routes.principals.get(
+            data.get('public_id'), Routes._load_principal)
+
+        # The user was deleted after the token was issued
+        if current_user is None:
+            raise ValueError('Token is invalid')
+        return current_user
+
+    class token_required(method_decorator):
+        """Decorator to verify the JWT.
+
+        Inherits the method_decorator as a wrapper class to provide the
+        __name__ attribute. The decorated route receives the Principal of
+        the user the token was issued to, served from Routes.principals
+        when possible
+        """
+
+        def __call__(self, *args, **kwargs):
+            # Retrieve the JWT from the request header, returning a 401 if
+            # it does not identify a user
+            try:
+                current_user = Routes._principal(
+                    request.headers.get('X-Access-Token'))
+            except ValueError as error:
+                abort(make_response({"message": str(error)}, 401))
 
             return method_decorator.__call__(
                 self, current_user, *args, **kwargs)
@@ -117,6 +229,12 @@ class Routes():
 
         # Verify user password
         if user.check_password(password) is True:
+            # Upgrade (or downgrade) the hash to the current cost while
+            # the password is known
+            if Passwords.needs_rehash(user.password):
+                user.password = password
+                app.db.session.commit()
+
             expiry_time = app.config.get('JWT_ACCESS_LIFESPAN').get('hours')
 
             # Generate the JWT Token
@@ -193,22 +311,15 @@ class Routes():
     def get_all_users():
         """Queries the User table for all users
 
+        Supports the keyset pagination and streaming parameters of Listing.
+
         Args:
             current_user: The user currently authenticated
 
         Returns:
             A json object containing all users
         """
-        users = UserModel.query.all()
-        user_schema = UserSchema(many=True)
-        if users is None:
-            response = {
-                "message": "no users found",
-            }
-            return jsonify(response)
-        else:
-            response = user_schema.dump(users)
-            return (jsonify(response))
+        return Listing.respond(UserModel.query, UserSchema)
 
     @ staticmethod
     @ app.route("/users/remove", methods=['POST'])
@@ -229,6 +340,8 @@ class Routes():
     def get_all_orders():
         """Queries the Orders table for all orders.
 
+        Supports the keyset pagination and streaming parameters of Listing.
+
         Args:
             current_user: The user currently authenticated
 
@@ -236,58 +349,135 @@ class Routes():
             A json object containing all orders
         """
 
-        orders = OrderModel.query.all()
-        order_schema = OrderSchema(many=True)
-        if orders is None:
-            response = {
-                "message": "no orders found",
-            }
-            return jsonify(response)
-        else:
-            response = order_schema.dump(orders)
-            return jsonify(response)
+        return Listing.respond(OrderModel.query, OrderSchema)
+
+    @ staticmethod
+    @ app.route("/orders/export", methods=['GET'])
+    @ token_required
+    def export_orders(user: Principal):
+        """Streams the orders, with their items, unit prices and customer,
+        as CSV or NDJSON for reporting
+
+        Accepts `format=csv|ndjson` and a range of days with the `start`
+        and `end` query parameters as YYYY-MM-DD dates, both inclusive.
+
+        Args:
+            user (Principal): the admin making the request
+
+        Returns:
+            A CSV or NDJSON attachment, streamed one batch at a time, or
+            403 if the user is not an admin
+        """
+        Routes._require_admin(user)
+        return OrderExport.respond()
 
     @ staticmethod
     @ app.route("/orders/add", methods=['POST'])
     @ token_required
-    def add_new_order(customer: UserModel):
+    def add_new_order(customer: Principal):
         """
         Adds a new order to the database
 
         Args:
-            customer (UserModel): the customer who made the order
+            customer (Principal): the customer who made the order
 
         Returns:
             Response
         """
 
         orderjson = request.json
-        complete = orderjson["complete"]
-        user = customer.id
-        items = orderjson["items"]
-        # create order
-        order = OrderModel(complete=complete, user_id=user)
-        app.db.session.add(order)
-        app.db.session.flush()
-        # get the id of the order
-        newid = order.id
-        # register all the items on the order
-        for item in items:
-            oitem = OrderItemModel(
-                menuitem_id=item["menuitem"]["id"],
-                order_id=newid,
-                qty=item["qty"]
-            )
-            app.db.session.add(oitem)
-        # complete add order
+        try:
+            order = BulkOrders.parse(orderjson)
+        except ValueError as error:
+            return make_response({"message": str(error)}, 400)
+
+        unknown = BulkOrders.unknown_menuitems(app.db.session, [order])
+        if unknown:
+            return make_response(
+                {"message": f"Unknown menu items {sorted(unknown)}"}, 400)
+
+        # create the order and all of its items in one round trip each
+        BulkOrders.insert(app.db.session, customer.id, [order])
         app.db.session.commit()
         return make_response("Order added succesfully", 201)
 
+    @ staticmethod
+    @ app.route("/orders/batch", methods=['POST'])
+    @ token_required
+    def add_order_batch(customer: Principal):
+        """
+        Adds many orders to the database in a single transaction
+
+        The body is {"orders": [...]} where each order has the same format
+        as for /orders/add. Valid orders are inserted even if others in the
+        batch are rejected.
+
+        Args:
+            customer (Principal): the customer who made the orders
+
+        Returns:
+            A json object with a result per order, in the order they were
+            sent, and a 201 response code if every order was added, 207
+            if only some were or 400 if none were
+        """
+
+        req = request.get_json(force=True)
+        orders = req.get('orders') if isinstance(req, dict) else None
+        if not isinstance(orders, list) or not orders:
+            return make_response(
+                {"message": "orders must be a non-empty list"}, 400)
+        if len(orders) > app.config.get('ORDER_BATCH_MAX_SIZE'):
+            return make_response({
+                "message": "A batch can have at most {} orders".format(
+                    app.config.get('ORDER_BATCH_MAX_SIZE'))}, 400)
+
+        results, valid = [], []
+        for index, order in enumerate(orders):
+            try:
+                valid.append((index, BulkOrders.parse(order)))
+            except ValueError as error:
+                results.append(
+                    {"index": index, "status": 400, "message": str(error)})
+
+        # a single query checks the menu items of every order
+        unknown = BulkOrders.unknown_menuitems(
+            app.db.session, [order for _, order in valid])
+        accepted = []
+        for index, order in valid:
+            missing = unknown.intersection(
+                menuitem_id for menuitem_id, _ in order["items"])
+            if missing:
+                results.append({
+                    "index": index,
+                    "status": 400,
+                    "message": f"Unknown menu items {sorted(missing)}"})
+            else:
+                accepted.append((index, order))
+
+        ids = BulkOrders.insert(
+            app.db.session, customer.id, [order for _, order in accepted])
+        app.db.session.commit()
+
+        results += [{"index": index, "status": 201, "id": order_id}
+                    for (index, _), order_id in zip(accepted, ids)]
+        results.sort(key=lambda result: result["index"])
+
+        if len(accepted) == len(orders):
+            status = 201
+        elif accepted:
+            status = 207
+        else:
+            status = 400
+        return make_response(jsonify({"results": results}), status)
+
     @ staticmethod
     @ app.route("/menuitems", methods=['GET'])
     def get_all_menuitems():
         """Queries the MenuItem table for all menuitems
 
+        Supports the keyset pagination and streaming parameters of Listing.
+        Without them the cached catalog snapshot is served, with an ETag.
+
         Args:
             None
 
@@ -295,33 +485,43 @@ class Routes():
             A json object containing all menuitems
         """
 
+        if not request.args:
+            return Routes.menuitems_snapshot.respond()
+
         menuitems = MenuItemModel.query.join(
             MenuItemCategoryModel,
             MenuItemModel.category_id == MenuItemCategoryModel.id)
+        return Listing.respond(menuitems, MenuItemSchema)
 
-        menuitem_schema = MenuItemSchema(many=True)
-        if menuitems is None:
-            response = {
-                "message": "no menuitems found",
-            }
-            return jsonify(response)
-        else:
-            response = menuitem_schema.dump(menuitems)
-            return jsonify(response)
+    @staticmethod
+    @app.route("/menuitems/search", methods=['GET'])
+    def search_menuitems():
+        """Searches the menuitems by text, category and ingredients
+
+        Results are ranked by relevance and paginated, see MenuSearch.
+
+        Args:
+            None
+
+        Returns:
+            A json object containing a page of matching menuitems
+        """
+        return MenuSearch.respond()
 
     @staticmethod
     @app.route("/categories")
     def get_categories():
-        categories = MenuItemCategoryModel.query.all()
-        menuitem_category_schema = MenuItemCategorySchema(many=True)
+        """Retrieves all categories along with their menuitems
 
-        if categories is None:
-            response = {
-                "message": "no categories found",
-            }
-        else:
-            response = menuitem_category_schema.dump(categories)
-        return jsonify(response)
+        Served from the cached catalog snapshot, with an ETag.
+
+        Args:
+            None
+
+        Returns:
+            A json object containing all categories
+        """
+        return Routes.categories_snapshot.respond()
 
     @staticmethod
     @app.route("/categories/add", methods=['POST'])
@@ -340,16 +540,19 @@ class Routes():
     @staticmethod
     @app.route("/orders/<uid>")
     def get_user_orders(uid):
+        """Queries the Orders table for the orders placed by a user
+
+        Supports the keyset pagination and streaming parameters of Listing.
+
+        Args:
+            uid: The id of the user
+
+        Returns:
+            A json object containing the user's orders
+        """
         user_id = int(uid)
-        order_schema = OrderSchema(many=True)
         orders = OrderModel.query.filter_by(user_id=user_id)
-
-        if orders is not None:
-            res = order_schema.dump(orders)
-            return jsonify(res)
-        else:
-            res = {"message": "No orders found for user."}
-            return jsonify(res)
+        return Listing.respond(orders, OrderSchema)
 
     @staticmethod
     @app.route("/menuitems/add", methods=['POST'])
@@ -362,19 +565,88 @@ class Routes():
             description = req.get('description')
             img_url = req.get('imgURL')
             ids = req.get('ids')
-            app.db.session.execute(text("INSERT INTO menuitems (flavour,category_id,price,description,image_url) values(:flavour, :categoryID, :price, :description, :imgURL)"), {
-                                   "flavour": flavour, "categoryID": category_id, "price": price, "description": description, "imgURL": img_url})
+            res = app.db.session.execute(text("INSERT INTO menuitems (flavour,category_id,price,description,image_url) values(:flavour, :categoryID, :price, :description, :imgURL) RETURNING id"), {
+                                   "flavour": flavour, "categoryID": category_id, "price": price, "description": description, "imgURL": img_url}).scalar()
+            BulkCatalog.set_ingredients(
+                app.db.session, {res: [int(id) for id in ids]})
             app.db.session.commit()
-            res = app.db.session.query(MenuItemModel).order_by(
-                MenuItemModel.id.desc()).first().id
-            for id in ids:
-                app.db.session.execute(text("INSERT into menuitems_ingredients (menuitem_id,ingredient_id) values(:menu_id, :ing_id)"), {
-                                       "menu_id": res, "ing_id": id})
-                app.db.session.commit()
             return (jsonify({'message': 'success'}))
         except:
             return (jsonify({'message': 'Menuitem could not be added'}))
 
+    @staticmethod
+    @app.route("/menuitems/batch", methods=['POST'])
+    @token_required
+    def add_menuitem_batch(user: Principal):
+        """
+        Creates or updates many menuitems, and their ingredients, in a
+        single transaction
+
+        The body is {"menuitems": [...]} where each menuitem has the same
+        format as for /menuitems/add. A menuitem whose flavour already
+        exists in its category is updated, and its ingredients are
+        replaced when "ids" is given. Nothing is written unless every
+        menuitem is valid.
+
+        Args:
+            user (Principal): the admin making the request
+
+        Returns:
+            A json object with a result per menuitem, in the order they
+            were sent, and a 200 response code, or 400 with the invalid
+            menuitems if any
+        """
+
+        menuitems = Routes._catalog_batch(user, "menuitems")
+
+        errors, parsed, seen = [], [], set()
+        for index, menuitem in enumerate(menuitems):
+            try:
+                menuitem = BulkCatalog.parse_menuitem(menuitem)
+            except ValueError as error:
+                errors.append(
+                    {"index": index, "status": 400, "message": str(error)})
+                continue
+            key = (menuitem["flavour"], menuitem["category_id"])
+            if key in seen:
+                errors.append({"index": index, "status": 400, "message":
+                               "Duplicate flavour in the same category"})
+            seen.add(key)
+            parsed.append((index, menuitem))
+
+        # a single query checks the categories and ingredients of each
+        categories = BulkCatalog.unknown(
+            app.db.session, MenuItemCategoryModel,
+            {menuitem["category_id"] for _, menuitem in parsed})
+        ingredients = BulkCatalog.unknown(
+            app.db.session, IngredientModel,
+            {ingredient_id for _, menuitem in parsed
+             for ingredient_id in menuitem["ingredients"] or ()})
+        for index, menuitem in parsed:
+            missing = ingredients.intersection(menuitem["ingredients"] or ())
+            if menuitem["category_id"] in categories:
+                errors.append({"index": index, "status": 400, "message":
+                               f"Unknown category {menuitem['category_id']}"})
+            elif missing:
+                errors.append({"index": index, "status": 400, "message":
+                               f"Unknown ingredients {sorted(missing)}"})
+        if errors:
+            errors.sort(key=lambda result: result["index"])
+            return make_response(jsonify({"results": errors}), 400)
+
+        written = BulkCatalog.upsert_menuitems(
+            app.db.session, [menuitem for _, menuitem in parsed])
+        BulkCatalog.set_ingredients(app.db.session, {
+            menuitem_id: menuitem["ingredients"]
+            for (_, menuitem), (menuitem_id, _) in zip(parsed, written)
+            if menuitem["ingredients"] is not None})
+        app.db.session.commit()
+
+        return jsonify({"results": [
+            {"index": index, "status": 201 if created else 200,
+             "id": menuitem_id}
+            for (index, _), (menuitem_id, created) in zip(parsed, written)]})
+
     @staticmethod
     @app.route("/update-menuitem", methods=['POST'])
     def update_menuitem():
@@ -402,10 +674,8 @@ class Routes():
         req = request.get_json(force=True)
         try:
             menu_id = int(req.get('id'))
-            app.db.session.execute(
-                text("DELETE FROM orderitems where menuitem_id= :mid"), {"mid": menu_id})
-            app.db.session.execute(text(
-                "DELETE FROM menuitems_ingredients where menuitem_id= :mid"), {"mid": menu_id})
+            # Its order items and ingredient links are deleted by the
+            # ON DELETE CASCADE foreign keys
             app.db.session.execute(
                 text("DELETE FROM menuitems where id= :mid"), {"mid": menu_id})
             app.db.session.commit()
@@ -418,6 +688,8 @@ class Routes():
     def get_all_ingredients():
         """Queries the Ingredients table for all ingredients
 
+        Supports the keyset pagination and streaming parameters of Listing.
+
         Args:
             current_user: The user currently authenticated
 
@@ -425,38 +697,90 @@ class Routes():
             A json object containing all ingredients
         """
 
-        ingredients = IngredientModel.query.all()
-        ingredient_schema = IngredientSchema(many=True)
-        if ingredients is None:
-            response = {
-                "message": "no ingredients found",
-            }
-            return jsonify(response)
-        else:
-            response = ingredient_schema.dump(ingredients)
-            return jsonify(response)
+        return Listing.respond(IngredientModel.query, IngredientSchema)
+
+    @staticmethod
+    def _current_week():
+        """Gets the first and last day of the current week
+
+        Weeks start on Sunday.
+
+        Args:
+            None
+
+        Returns:
+            tuple: The dates of the Sunday and Saturday of the week
+        """
+        today = date.today()
+        startdate = today - timedelta(days=(today.weekday() + 1) % 7)
+        return startdate, startdate + timedelta(days=6)
+
+    @staticmethod
+    def _ingredient_demand(startdate: date, enddate: date):
+        """Sums the demand rollup of each ingredient over a range of days
+
+        Args:
+            startdate (date): The first day of the range
+            enddate (date): The last day of the range, inclusive
+
+        Returns:
+            A query of (id, name, qty) rows ordered by name
+        """
+        qty = func.sum(IngredientDemandModel.qty)
+        return app.db.session.query(
+            IngredientModel.id, IngredientModel.name, qty).join(
+                IngredientDemandModel,
+                IngredientDemandModel.ingredient_id == IngredientModel.id
+        ).filter(
+            IngredientDemandModel.day >= startdate,
+            IngredientDemandModel.day <= enddate
+        ).group_by(
+            IngredientModel.id, IngredientModel.name
+        ).having(qty > 0).order_by(IngredientModel.name)
 
     @staticmethod
     @app.route("/weeks-ingredients", methods=['GET'])
     def get_ingredients_for_week():
-        week_num = datetime.now().isocalendar()[1]
-        WEEK = week_num - 1  # as it starts with 0 and you want week to start from sunday
-        startdate = time.asctime(time.strptime(
-            '%s %d 0' % (datetime.now().year, WEEK), '%Y %W %w'))
-        startdate = datetime.strptime(startdate, '%a %b %d %H:%M:%S %Y')
-        dates = [startdate.strftime('%Y-%m-%d')]
+        """Retrieves the ingredients needed by this week's orders
+
+        Args:
+            None
+
+        Returns:
+            A json list of ingredient names
+        """
+        startdate, enddate = Routes._current_week()
+        rows = Routes._ingredient_demand(startdate, enddate)
+        return jsonify([name for _, name, _ in rows])
 
-        for i in range(1, 7):
-            day = startdate + timedelta(days=i)
-            dates.append(day.strftime('%Y-%m-%d'))
+    @staticmethod
+    @app.route("/ingredients/demand", methods=['GET'])
+    def get_ingredient_demand():
+        """Retrieves the quantity of each ingredient needed by the orders
+        placed over a range of days
 
-        ingredients = []
-        rows = app.db.session.execute(text("SELECT i.name FROM orders o JOIN orderitems oi ON o.id = oi.order_id JOIN menuitems m ON m.id = oi.menuitem_id JOIN menuitems_ingredients mi ON m.id = mi.menuitem_id JOIN ingredients i ON i.id = mi.ingredient_id WHERE o.created_on >= :bdate AND o.created_on <= :edate GROUP BY i.name"), {
-                                      "bdate": dates[0], "edate": dates[-1]}).fetchall()
-        for row in rows:
-            ingredients.append(list(row)[0])
+        The range is given by the `start` and `end` query parameters as
+        YYYY-MM-DD dates, both inclusive, and defaults to the current week.
 
-        return jsonify(ingredients)
+        Args:
+            None
+
+        Returns:
+            A json list of {"id", "name", "qty"} objects
+        """
+        startdate, enddate = Routes._current_week()
+        try:
+            startdate = date.fromisoformat(
+                request.args.get('start', startdate.isoformat()))
+            enddate = date.fromisoformat(
+                request.args.get('end', enddate.isoformat()))
+        except ValueError:
+            abort(make_response(
+                {"message": "start and end must be YYYY-MM-DD dates"}, 400))
+
+        rows = Routes._ingredient_demand(startdate, enddate)
+        return jsonify([{"id": ingredient_id, "name": name, "qty": int(qty)}
+                        for ingredient_id, name, qty in rows])
 
     @staticmethod
     @app.route('/ingredients/add', methods=['POST'])
@@ -497,6 +821,121 @@ class Routes():
 
         return (jsonify({'res': res}))
 
+    @staticmethod
+    @app.route('/ingredients/setstock/batch', methods=['POST'])
+    @token_required
+    def set_stock_batch(user: Principal):
+        """
+        Sets whether many ingredients are in stock in a single transaction
+
+        The body is {"stock": [{"id": int, "stock": "yes"|"no"}, ...]}.
+        Nothing is written unless every ingredient exists.
+
+        Args:
+            user (Principal): the admin making the request
+
+        Returns:
+            A json object with the ids of the ingredients updated, or a
+            400 response code with the invalid entries
+        """
+
+        entries = Routes._catalog_batch(user, "stock")
+
+        errors, stock = [], {}
+        for index, entry in enumerate(entries):
+            try:
+                ingredient_id = int(entry["id"])
+                in_stock = {"yes": True, "no": False}[entry["stock"]]
+            except (KeyError, TypeError, ValueError):
+                errors.append({"index": index, "status": 400, "message":
+                               "Entries must have an id and a stock of "
+                               "'yes' or 'no'"})
+                continue
+            stock[ingredient_id] = in_stock
+        if errors:
+            return make_response(jsonify({"results": errors}), 400)
+
+        updated = BulkCatalog.set_stock(app.db.session, stock)
+        missing = set(stock) - updated
+        if missing:
+            app.db.session.rollback()
+            return make_response(
+                {"message": f"Unknown ingredients {sorted(missing)}"}, 400)
+        app.db.session.commit()
+        return jsonify({"updated": sorted(updated)})
+
+    @staticmethod
+    @app.route("/categories/batch", methods=['POST'])
+    @token_required
+    def add_category_batch(user: Principal):
+        """
+        Adds many categories in a single transaction
+
+        The body is {"categories": ["name", ...]}. Categories that already
+        exist are left as they are.
+
+        Args:
+            user (Principal): the admin making the request
+
+        Returns:
+            A json object with a result per category, in the order they
+            were sent, with a 201 status for the categories created and
+            200 for those that already existed
+        """
+
+        names = Routes._catalog_batch(user, "categories")
+        if not all(isinstance(name, str) and name.strip() for name in names):
+            return make_response(
+                {"message": "Categories must be non-empty names"}, 400)
+        names = [name.strip() for name in names]
+        if any(len(name) > 40 for name in names):
+            return make_response(
+                {"message": "Category names can be at most 40 characters"},
+                400)
+
+        distinct = list(dict.fromkeys(names))
+        written = dict(zip(distinct, BulkCatalog.add_categories(
+            app.db.session, distinct)))
+        app.db.session.commit()
+
+        return jsonify({"results": [
+            {"index": index, "status": 201 if written[name][1] else 200,
+             "id": written[name][0]}
+            for index, name in enumerate(names)]})
+
+    @staticmethod
+    @app.route("/auth/cache", methods=['GET'])
+    @token_required
+    def get_principal_cache_stats(user: Principal):
+        """Reports the hit and miss counters of the token principal cache
+
+        Args:
+            user (Principal): the admin making the request
+
+        Returns:
+            A json object of the cache's counters, or 403 if the user is
+            not an admin
+        """
+        Routes._require_admin(user)
+        return jsonify(Routes.principals.stats())
+
+    @staticmethod
+    @app.route("/db/pool", methods=['GET'])
+    @token_required
+    def get_pool_stats(user: Principal):
+        """Reports the state of the database connection pool and how long
+        checkouts have waited for a connection
+
+        Args:
+            user (Principal): the admin making the request
+
+        Returns:
+            A json object of the pool's counters, or 403 if the user is
+            not an admin
+        """
+        Routes._require_admin(user)
+        return jsonify(app.db.engine.pool.stats())
+
     @ staticmethod
     @ app.errorhandler(HTTPException)
     def http_errors_to_json(error: HTTPException):
@@ -0,0 +1,194 @@
+"""Searches and filters the menu items with the indexes of migration 2d6f0a9b3c41."""
+# Flask imports
+from flask import abort, json, make_response, request
+
+# SQLAlchemy imports
+from sqlalchemy import and_, distinct, exists, func, literal_column, or_
+from sqlalchemy import select
+
+# Python imports
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as DecodeError
+from typing import List
+from urllib.parse import urlencode
+
+# User module imports
+from api.db.loaders import eager_options
+from api.db.models import MenuItemModel, app, menuitems_ingredients
+from api.db.schemas import MenuItemSchema
+from api.db.serializers import dump, jsonify
+
+
+class MenuSearch():
+    """
+    Serves /menuitems/search, which accepts any of the following:
+
+        ?q=<text>
+            Menu items whose flavour or description match the words of
+            the text, or contain it (e.g. 'choc' finds 'Chocolate'),
+            ranked by relevance. Without it items are ordered by id.
+
+        ?category=<id>[,<id>...]
+            Menu items in one of the categories
+
+        ?with=<id>[,<id>...] / ?without=<id>[,<id>...]
+            Menu items containing every one / none of the ingredients
+
+        ?limit=<n>[&after=<cursor>]
+            Pages through the results, with the cursor of the next page
+            in the X-Next-Cursor header and a Link header
+    """
+
+    # The text search configuration of the full-text index
+    CONFIG = "english"
+
+    # The document of the full-text index. It must match the indexed
+    # expression exactly for the planner to use the index
+    DOCUMENT = literal_column(
+        "to_tsvector('english', "
+        "menuitems.flavour || ' ' || coalesce(menuitems.description, ''))")
+
+    # Results per page when no limit is given
+    DEFAULT_LIMIT = 20
+
+    @staticmethod
+    def _bad_request(message: str):
+        abort(make_response({"message": message}, 400))
+
+    @staticmethod
+    def _ids(name: str) -> List[int]:
+        """
+        Reads a list of ids from a query parameter, given either comma
+        separated or repeated
+
+        Args:
+            name (str): The name of the query parameter
+
+        Returns:
+            list[int]: The ids, empty if the parameter is absent
+
+        Raises:
+            HTTPException: A 400 response if an id is not an integer
+        """
+
+        try:
+            return sorted({int(value) for values in request.args.getlist(name)
+                           for value in values.split(",") if value.strip()})
+        except ValueError:
+            MenuSearch._bad_request(f"Invalid '{name}' ids")
+
+    @staticmethod
+    def _offset(cursor: str) -> int:
+        """
+        Reads the offset of the next page out of a cursor
+
+        Args:
+            cursor (str): A cursor sent in X-Next-Cursor
+
+        Returns:
+            int: The amount of results already sent
+
+        Raises:
+            HTTPException: A 400 response if the cursor is malformed
+        """
+
+        try:
+            (offset,) = json.loads(urlsafe_b64decode(cursor.encode()))
+            return max(int(offset), 0)
+        except (DecodeError, TypeError, ValueError):
+            MenuSearch._bad_request("Invalid cursor")
+
+    @staticmethod
+    def query(text: str = "", categories: List[int] = (),
+              included: List[int] = (), excluded: List[int] = ()):
+        """
+        Builds the query selecting the matching menu items, best first
+
+        Args:
+            text (str): The text to search for, if any
+            categories (list[int]): The categories to search in, if any
+            included (list[int]): Ingredients the items must contain
+            excluded (list[int]): Ingredients the items must not contain
+
+        Returns:
+            Query
+        """
+
+        links = menuitems_ingredients.c
+        query = MenuItemModel.query
+
+        if categories:
+            query = query.filter(MenuItemModel.category_id.in_(categories))
+        if included:
+            # Items linked to as many of the ingredients as were asked for
+            query = query.filter(MenuItemModel.id.in_(
+                select([links.menuitem_id])
+                .where(links.ingredient_id.in_(included))
+                .group_by(links.menuitem_id)
+                .having(func.count(distinct(links.ingredient_id))
+                        == len(included))))
+        if excluded:
+            query = query.filter(~exists().where(and_(
+                links.menuitem_id == MenuItemModel.id,
+                links.ingredient_id.in_(excluded))))
+
+        if not text:
+            return query.order_by(MenuItemModel.id)
+
+        # Escape the LIKE wildcards so the text is matched literally
+        pattern = "%{}%".format(text.replace("\\", "\\\\")
+                                .replace("%", "\\%").replace("_", "\\_"))
+        words = func.plainto_tsquery(MenuSearch.CONFIG, text)
+
+        # Each condition is served by its own index, the planner ORs the
+        # bitmaps of the full-text and trigram indexes
+        query = query.filter(or_(
+            MenuSearch.DOCUMENT.op("@@")(words),
+            MenuItemModel.flavour.ilike(pattern),
+            MenuItemModel.description.ilike(pattern)))
+
+        rank = func.ts_rank(MenuSearch.DOCUMENT, words) + \
+            func.similarity(MenuItemModel.flavour, text)
+        return query.order_by(rank.desc(), MenuItemModel.id)
+
+    @staticmethod
+    def respond():
+        """
+        Serves a page of search results according to the request's
+        query parameters
+
+        Args:
+            None
+
+        Returns:
+            Response
+        """
+
+        try:
+            limit = int(request.args.get("limit", MenuSearch.DEFAULT_LIMIT))
+        except ValueError:
+            MenuSearch._bad_request("Invalid limit")
+        limit = max(1, min(limit, app.config.get("LIST_PAGE_MAX_LIMIT")))
+        after = request.args.get("after")
+        offset = MenuSearch._offset(after) if after else 0
+
+        query = MenuSearch.query(
+            request.args.get("q", "").strip(),
+            MenuSearch._ids("category"),
+            MenuSearch._ids("with"),
+            MenuSearch._ids("without"))
+
+        # Fetch one extra row to know whether another page exists
+        rows = query.options(*eager_options(MenuItemSchema)).offset(
+            offset).limit(limit + 1).all()
+        response = jsonify(dump(MenuItemSchema, rows[:limit]))
+
+        if len(rows) > limit:
+            cursor = urlsafe_b64encode(
+                json.dumps([offset + limit]).encode()).decode()
+            args = request.args.to_dict()
+            args.update(after=cursor)
+            response.headers["X-Next-Cursor"] = cursor
+            response.headers["Link"] = \
+                f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+        return response
@@ -0,0 +1,127 @@
+"""Caches pre-encoded JSON dumps that are rebuilt on change notifications."""
+# Flask imports
+from flask import Response, request
+
+# Python imports
+from hashlib import sha1
+from typing import Any, Callable
+from eventlet.semaphore import Semaphore
+
+# User module imports
+from api.db.serializers import dumps
+
+
+class Snapshot():
+    """
+    A versioned, pre-encoded JSON dump of data that rarely changes.
+
+    The dump is built on first use and then served as bytes with a strong
+    ETag until invalidate() is called, which the socket listeners do when
+    Postgres notifies them of a change. While no listener is running
+    nothing would ever invalidate the dump, so it is rebuilt on every read.
+    """
+
+    def __init__(self, build: Callable[[], Any]):
+        """
+        Args:
+            build (Callable):
+                Returns the data to be dumped, e.g. a schema dump of a query.
+                Called inside an app context
+        """
+
+        self.build = build
+        self.version = 0
+        self.listening = False
+        self._built_version = None
+        self._state = None
+        self._lock = Semaphore()
+
+    def invalidate(self, change: dict = None):
+        """
+        Marks the current dump as stale so the next read rebuilds it
+
+        Args:
+            change (dict): The row change that made it stale, if known
+
+        Returns:
+            None
+        """
+
+        self.version += 1
+
+    def _current(self):
+        """
+        Returns the current dump, rebuilding it if it is stale
+
+        Args:
+            None
+
+        Returns:
+            tuple: The dumped data, its JSON encoding as bytes and its ETag
+        """
+
+        if self.listening and self._built_version == self.version:
+            return self._state
+
+        with self._lock:
+            # Another greenthread may have rebuilt it while we waited
+            if self.listening and self._built_version == self.version:
+                return self._state
+
+            # Read the version first so a change during the build marks
+            # the result stale straight away
+            version = self.version
+            data = self.build()
+            body = dumps(data)
+            self._state = (data, body, sha1(body).hexdigest())
+            self._built_version = version
+            return self._state
+
+    def get(self):
+        """
+        Returns the encoded dump, rebuilding it if it is stale
+
+        Args:
+            None
+
+        Returns:
+            tuple: The JSON body as bytes and its ETag
+        """
+
+        _, body, etag = self._current()
+        return body, etag
+
+    def data(self):
+        """
+        Returns the dumped data, rebuilding it if it is stale. The data is
+        shared between callers and must not be modified
+
+        Args:
+            None
+
+        Returns:
+            The data returned by build
+        """
+
+        data, _, _ = self._current()
+        return data
+
+    def respond(self):
+        """
+        Serves the dump, answering a matching If-None-Match with a 304
+
+        Args:
+            None
+
+        Returns:
+            Response
+        """
+
+        body, etag = self.get()
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype="application/json")
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
@@ -1,18 +1,30 @@
+import json
 import sys
-from typing import Set
+from functools import partial, wraps
+from typing import List, Optional, Sequence, Set
 from api.db.models import MenuItemCategoryModel
 from api.db.schemas import MenuItemCategorySchema
-from api.db.models import MenuItemModel
+from api.db.models import MenuItemModel, menuitems_ingredients
+from api.db.models import OrderModel
 from api.db.schemas import MenuItemSchema
-from api.db.models import IngredientModel
 from api.db.schemas import IngredientSchema
-from api.db.models import UserModel
+from api.db.schemas import OrderSchema
 from api.db.schemas import UserSchema
+from api.db.loaders import eager_options
+from api.db.serializers import dump
+from api.routes.coalesce import Coalescer
+from api.routes.leader import Leader
+from api.routes.principals import Principal
 from api.routes.routes import Routes, app
+from api.routes.snapshots import Snapshot
+from api.routes.watches import Watch
 from signal import *
-from eventlet import spawn
+from eventlet import sleep, spawn, tpool
+from flask import jsonify, request
+from flask_socketio import ConnectionRefusedError
 import atexit
 import pgpubsub
+import psycopg2
 
 
 class ServerSockets():
@@ -24,12 +36,116 @@ class ServerSockets():
     # A list of possible changes made to a table
     DbActions = ("INSERT", "DELETE", "UPDATE")
 
+    # pg_trigger.tgtype of an AFTER ... FOR EACH ROW trigger on each action
+    TriggerTypes = {"INSERT": 1 | 4, "DELETE": 1 | 8, "UPDATE": 1 | 16}
+
+    # The primary key columns sent with each notification, "id" by default
+    TableKeys = {"menuitems_ingredients": ("menuitem_id", "ingredient_id")}
+
+    # The registered watches, by namespace
+    watches = {}
+
+    # The coalescers of each watch, by event name, for reporting counters
+    coalescers = {}
+
+    # The caches invalidated by changes to each table, by table name
+    caches = {}
+
+    # Elects the process sending change events when SOCKET_MESSAGE_QUEUE
+    # relays them to the clients of every process, None otherwise
+    leader: Optional[Leader] = None
+
+    @staticmethod
+    def is_leader() -> bool:
+        """
+        Checks if this process sends the change events of the watches
+
+        Args:
+            None
+
+        Returns:
+            bool: True unless another process was elected to send them
+        """
+
+        leader = ServerSockets.leader
+        return leader is None or leader.is_leader
+
+    @staticmethod
+    def _channel(table: str) -> str:
+        """The channel the change triggers of a table notify."""
+        return f"{table}_table_change"
+
     @staticmethod
-    def _set_up_change_notifier(conn, table: str, actions: Set[str]):
+    def _provision(conn, table: str) -> bool:
+        """
+        Sets up the change triggers of a table, logging any failure rather
+        than raising it, e.g. when the table stayed locked past the lock
+        timeout
+
+        Args:
+            conn: A psycopg database connection object
+            table (str): The name of the table
+
+        Returns:
+            bool: Whether the triggers are up to date
+        """
+
+        try:
+            ServerSockets._set_up_change_notifier(
+                conn, table, set(ServerSockets.DbActions))
+            return True
+        except psycopg2.Error as error:
+            app.logger.warning(
+                "Could not set up the change triggers of %s: %s",
+                table, error)
+            return False
+
+    @staticmethod
+    def _retry_provisioning(pending: Set[str], on_provisioned):
+        """
+        Keeps setting up the change triggers of tables that failed, with
+        exponential backoff, on a connection of its own. The statements run
+        in a native thread so waiting on table locks does not block the hub
+
+        Args:
+            pending (set[str]): The tables left to set up, emptied as they
+                succeed
+            on_provisioned (Callable): Called with each table set up
+
+        Returns:
+            None
+        """
+
+        delay = app.config.get('SOCKET_PROVISION_RETRY')
+        while pending:
+            sleep(delay)
+            delay = min(delay * 2, app.config.get('SOCKET_PROVISION_MAX_RETRY'))
+            conn = None
+            try:
+                conn = tpool.execute(psycopg2.connect, **app.pubsub_conn_det)
+                conn.autocommit = True
+                for table in sorted(pending):
+                    if tpool.execute(ServerSockets._provision, conn, table):
+                        pending.discard(table)
+                        on_provisioned(table)
+            except psycopg2.Error as error:
+                app.logger.warning(
+                    "Could not connect to set up change triggers: %s", error)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    @staticmethod
+    def _set_up_change_notifier(conn, table: str, actions: Set[str],
+                                keys: Sequence[str] = None):
         """
         Sets up triggers in the Postgres database to notify the app
         when a new menu item is inserted into the databse, a menu item 
-        is deleted from the database or a menu item is updated
+        is deleted from the database or a menu item is updated.
+
+        Each notification carries a JSON payload naming the action, the
+        table and the primary key of the affected row, e.g.
+        {"op": "UPDATE", "table": "users", "keys": {"id": 4}}
 
         Args:
             conn:                   
@@ -43,6 +159,10 @@ class ServerSockets():
                 The list of Database actions that should trigger a notification.
                 Must be one of the strings in DbActions
 
+            keys (Sequence[str]):
+                The primary key columns of the table. Defaults to the
+                columns in TableKeys or ("id",)
+
         Returns:
             str: the name of the channel that pgpubsub should listen on
 
@@ -52,95 +172,369 @@ class ServerSockets():
         """
 
         # build function to create in the database
-        channel = f"{table}_table_change"
-        func_name = f"notify_{table}_change()"
-        func = f"""
-        CREATE OR REPLACE FUNCTION {func_name}
-        RETURNS TRIGGER AS $$
+        channel = ServerSockets._channel(table)
+        func_name = f"notify_{table}_change"
+        keys = keys or ServerSockets.TableKeys.get(table, ("id",))
+        key_pairs = ", ".join(f"'{key}', rec.{key}" for key in keys)
+        body = f"""
+        DECLARE
+            rec RECORD;
         BEGIN
-            PERFORM pg_notify('{channel}','changed');
+            IF TG_OP = 'DELETE' THEN
+                rec := OLD;
+            ELSE
+                rec := NEW;
+            END IF;
+            PERFORM pg_notify('{channel}', json_build_object(
+                'op', TG_OP,
+                'table', TG_TABLE_NAME,
+                'keys', json_build_object({key_pairs}))::text);
             RETURN NULL;
         END;
-        $$ LANGUAGE plpgsql;
         """
 
-        # build triggers that will run func on each action
-        triggers = ""
         for action in actions:
-            if action.upper() in ServerSockets.DbActions:
-                trigger_name = f"{table}_notify_{action.lower()}"
+            if action.upper() not in ServerSockets.DbActions:
+                raise TypeError(
+                    "All actions must be either INSERT, UPDATE or DELETE")
 
-                triggers += f"""
+        # Only statements that change something are run, as CREATE TRIGGER
+        # and DROP TRIGGER lock the table against writes. Reading the
+        # catalogs takes no table locks, so restarts do not stall traffic
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT prosrc FROM pg_proc WHERE proname = %s AND pronargs = 0",
+            (func_name,))
+        current = cur.fetchone()
+        statements = []
+        if current is None or current[0] != body:
+            statements.append(f"""
+            CREATE OR REPLACE FUNCTION {func_name}()
+            RETURNS TRIGGER AS $${body}$$ LANGUAGE plpgsql;
+            """)
+
+        for action in sorted(action.upper() for action in actions):
+            trigger_name = f"{table}_notify_{action.lower()}"
+            # An enabled AFTER ... FOR EACH ROW trigger on the action alone,
+            # without a column list or WHEN condition
+            cur.execute("""
+            SELECT 1 FROM pg_trigger t JOIN pg_proc p ON p.oid = t.tgfoid
+            WHERE t.tgrelid = %s::regclass AND t.tgname = %s
+              AND p.proname = %s AND p.pronargs = 0
+              AND t.tgtype = %s AND t.tgenabled <> 'D'
+              AND t.tgqual IS NULL AND cardinality(t.tgattr::int2[]) = 0
+            """, (table, trigger_name, func_name,
+                  ServerSockets.TriggerTypes[action]))
+            if cur.fetchone() is None:
+                statements.append(f"""
                 DROP TRIGGER IF EXISTS {trigger_name} ON {table};
                 CREATE TRIGGER {trigger_name}
                 AFTER {action} ON {table}
-                FOR EACH ROW EXECUTE PROCEDURE {func_name};
-                """
+                FOR EACH ROW EXECUTE PROCEDURE {func_name}();
+                """)
+
+        if statements:
+            # Processes starting together take turns, and give up rather
+            # than queue behind long transactions on the table
+            cur.execute("BEGIN")
+            try:
+                cur.execute(
+                    "SELECT pg_advisory_xact_lock(hashtext('notify_triggers'))")
+                cur.execute("SET LOCAL lock_timeout = '5s'")
+                for statement in statements:
+                    cur.execute(statement)
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+        return channel
+
+    @staticmethod
+    def _read_change(event) -> Optional[dict]:
+        """
+        Parses the payload of a change notification
+
+        Args:
+            event: The psycopg Notify object received from pgpubsub
+
+        Returns:
+            dict: The change, or None if the payload is not a row change
+            (e.g. sent by an older version of the trigger function)
+        """
+
+        try:
+            change = json.loads(event.payload)
+        except ValueError:
+            return None
+        if not isinstance(change, dict) or \
+                change.get("op") not in ServerSockets.DbActions:
+            return None
+        return change
+
+    @staticmethod
+    def _scoped(handler):
+        """
+        Wraps a socket handler or listener callback so it runs in an app
+        context and its database session is removed as soon as it returns,
+        handing the connection back to the pool even if it failed
+
+        Args:
+            handler: The function to wrap
+
+        Returns:
+            The wrapped function
+        """
+
+        @wraps(handler)
+        def scoped(*args, **kwargs):
+            with app.app_context():
+                try:
+                    return handler(*args, **kwargs)
+                finally:
+                    app.db.session.remove()
+        return scoped
+
+    @staticmethod
+    def _coalescer(name: str, get_all, get_changes) -> Coalescer:
+        """
+        Creates the coalescer the listener hands a watch's notifications
+        to, so a burst of row changes results in a single refresh
+
+        Args:
+            name (str): The name the coalescer's counters are reported under
+            get_all: Sends the whole table to the namespace
+            get_changes: Sends the rows affected by a list of changes
+
+        Returns:
+            Coalescer
+        """
+
+        @ServerSockets._scoped
+        def refresh(changes):
+            # Fall back to the whole table if any payload was unreadable
+            if None in changes:
+                get_all()
             else:
-                raise TypeError(
-                    "All actions must be either INSERT, UPDATE or DELETE")
+                get_changes(changes)
 
-        # insert function and respective triggers into the database
-        cur = conn.cursor()
-        cur.execute(func)
-        if triggers:
-            cur.execute(triggers)
-        return channel
+        coalescer = Coalescer(
+            refresh,
+            app.config.get('SOCKET_COALESCE_WINDOW'),
+            app.config.get('SOCKET_COALESCE_MAX_DELAY'))
+        ServerSockets.coalescers[name] = coalescer
+        return coalescer
 
     @staticmethod
-    def get_menuitems_by_category():
+    @app.route("/sockets/stats", methods=['GET'])
+    @Routes.token_required
+    def get_socket_stats(user: Principal):
         """
-        Fetches all menuitems, grouped by category, from the database
-        and sends them to all clients connected to the menu namespace
+        Reports how many change notifications each watch received and
+        how many broadcasts they were coalesced into
 
         Args:
-            None
+            user (Principal): the admin making the request
+
+        Returns:
+            A json object of counters per watch, or 403 if the user is
+            not an admin
+        """
+
+        Routes._require_admin(user)
+        return jsonify({
+            name: coalescer.stats()
+            for name, coalescer in ServerSockets.coalescers.items()})
+
+    @staticmethod
+    def _merge_changes(changes: List[dict]):
+        """
+        Collapses a list of row changes into the net change per row
+
+        Args:
+            changes (list[dict]): Row changes in the order they happened
+
+        Returns:
+            tuple: The ids of the added, updated and removed rows
+        """
+
+        ops = {}
+        for change in changes:
+            key = change["keys"]["id"]
+            first, _ = ops.get(key, (change["op"], None))
+            ops[key] = (first, change["op"])
+
+        added, updated, removed = [], [], []
+        for key, (first, last) in ops.items():
+            if last == "DELETE":
+                # Rows created and deleted in one go were never seen
+                if first != "INSERT":
+                    removed.append(key)
+            elif first == "INSERT":
+                added.append(key)
+            else:
+                updated.append(key)
+        return added, updated, removed
+
+    @staticmethod
+    def emit_changes(model, schema_cls, entity: str, namespace: str,
+                     changes: List[dict]):
+        """
+        Sends only the rows affected by a list of changes to all clients
+        connected to a namespace, as 'added:<entity>', 'updated:<entity>'
+        and 'removed:<entity>' events. Added and updated events carry a
+        list of dumped rows, removed events a list of {"id": ...} objects.
+
+        Args:
+            model: The SQLAlchemy model of the changed table
+            schema_cls: The schema class used to dump each row
+            entity (str): The name used in the event names
+            namespace (str): The socket namespace to send the events to
+            changes (list[dict]): The row changes read from notifications
 
         Returns:
             None
         """
 
-        menuitems = MenuItemCategoryModel.query.all()
-        category_schema = MenuItemCategorySchema(many=True)
-        if menuitems is None:
+        added, updated, removed = ServerSockets._merge_changes(changes)
+        ids = added + updated
+        rows = model.query.filter(model.id.in_(ids)).options(
+            *eager_options(schema_cls)).all() if ids else []
+        found = {row.id: row for row in rows}
+
+        # Rows deleted since the notification was sent
+        removed += [key for key in ids if key not in found]
+
+        for event, keys in (("added", added), ("updated", updated)):
+            entities = [found[key] for key in keys if key in found]
+            if entities:
+                app.socketio.emit(
+                    f'{event}:{entity}', dump(schema_cls, entities), namespace=namespace)
+        if removed:
             app.socketio.emit(
-                'error', {"message": "Failed to get menu items", "code": 404}, namespace='/menu/watch')
-        else:
-            response = category_schema.dump(menuitems)
-            app.socketio.emit(
-                'changed:menuitems', response, namespace='/menu/watch')
+                f'removed:{entity}', [{"id": key} for key in removed], namespace=namespace)
+
+    @staticmethod
+    def get_menu_changes(changes: List[dict]):
+        """
+        Sends the menu items and categories affected by changes to any of
+        the catalog tables to all clients connected to the menu namespace
+
+        Args:
+            changes (list[dict]): The row changes read from notifications
+
+        Returns:
+            None
+        """
+
+        menuitem_changes, category_changes, ingredient_ids = [], [], []
+        for change in changes:
+            table, keys = change["table"], change["keys"]
+            if table == "menuitems":
+                menuitem_changes.append(change)
+            elif table == "menuitem_categories":
+                category_changes.append(change)
+            elif table == "menuitems_ingredients":
+                # Linking or unlinking an ingredient updates the menu item
+                menuitem_changes.append(
+                    {"op": "UPDATE", "keys": {"id": keys["menuitem_id"]}})
+            elif table == "ingredients" and change["op"] == "UPDATE":
+                ingredient_ids.append(keys["id"])
+
+        # Renaming or restocking an ingredient updates the items using it
+        if ingredient_ids:
+            rows = app.db.session.query(
+                menuitems_ingredients.c.menuitem_id).filter(
+                    menuitems_ingredients.c.ingredient_id.in_(ingredient_ids)
+            ).distinct()
+            menuitem_changes += [
+                {"op": "UPDATE", "keys": {"id": menuitem_id}}
+                for (menuitem_id,) in rows]
+
+        if category_changes:
+            ServerSockets.emit_changes(
+                MenuItemCategoryModel, MenuItemCategorySchema, 'categories',
+                '/menu/watch', category_changes)
+        if menuitem_changes:
+            ServerSockets.emit_changes(
+                MenuItemModel, MenuItemSchema, 'menuitems',
+                '/menu/watch', menuitem_changes)
 
     @staticmethod
-    def listen_for_menu():
+    def _open_orders():
         """
-        Listen for changes to the menuitems table and send an updated
-        list of menu items to all clients connected to the menu namespace
+        Selects the orders that are not complete, from the partial index
+        on orders that are not complete
 
         Args:
             None
 
         Returns:
-            NoReturn
+            Query
         """
 
-        pubsub=pgpubsub.connect(**app.pubsub_conn_det)
-        channel = ServerSockets._set_up_change_notifier(
-            pubsub.conn, "menuitems", set(ServerSockets.DbActions))
-        pubsub.listen(channel)
-        while True:
-            for event in pubsub.events(yield_timeouts=True):
-                if event is None:
-                    pass
-                else:
-                    with app.app_context():
-                        ServerSockets.get_menuitems_by_category()
+        return OrderModel.query.filter(
+            OrderModel.complete.is_(False)).order_by(OrderModel.id)
 
     @staticmethod
-    @app.socketio.on('connect', namespace='/menu/watch')
-    def on_menu_connect():
+    def send_orders(sid: str, auth=None):
         """
-        Sends the list of menu items when a client connects to the 
-        '/menu/watch' namespace, i.e they connect from the web app's menu.
+        Sends a client connecting to the orders namespace its initial
+        state. A new client is sent the open orders as 'open:orders'. A
+        client resuming with {"after": <last order id seen>} is sent each
+        order placed since as 'added:order', then the ids of the earlier
+        orders that are still open as 'synced:orders', so it can drop the
+        ones completed while it was away. A client whose after is not an
+        integer is treated as a new one, rather than replaying every order.
+
+        Orders carry their customer's details, so only admins may connect,
+        sending their JWT as {"token": ...} along with after
+
+        Args:
+            sid (str): The session id of the client
+            auth (dict): The auth data the client connected with
+
+        Returns:
+            None
+
+        Raises:
+            ConnectionRefusedError: If the client is not an admin
+        """
+
+        auth = auth if isinstance(auth, dict) else {}
+        try:
+            user = Routes._principal(auth.get("token"))
+        except ValueError as error:
+            raise ConnectionRefusedError(str(error))
+        if not user.is_admin:
+            raise ConnectionRefusedError("Admin access required")
+
+        after = auth.get("after")
+        try:
+            after = int(after)
+        except (TypeError, ValueError):
+            after = None
+        if after is None:
+            orders = ServerSockets._open_orders().options(
+                *eager_options(OrderSchema))
+            app.socketio.emit('open:orders', dump(OrderSchema, orders),
+                              namespace='/orders/watch', to=sid)
+            return
+
+        missed = OrderModel.query.filter(OrderModel.id > after).order_by(
+            OrderModel.id).options(*eager_options(OrderSchema))
+        for order in dump(OrderSchema, missed):
+            app.socketio.emit('added:order', order,
+                              namespace='/orders/watch', to=sid)
+        still_open = ServerSockets._open_orders().filter(
+            OrderModel.id <= after).with_entities(OrderModel.id)
+        app.socketio.emit('synced:orders', {
+            "open": [order_id for (order_id,) in still_open],
+        }, namespace='/orders/watch', to=sid)
+
+    @staticmethod
+    def send_open_orders():
+        """
+        Resends the open orders to every client of the orders namespace
 
         Args:
             None
@@ -149,75 +543,268 @@ class ServerSockets():
             None
         """
 
-        ServerSockets.get_menuitems_by_category()
+        orders = ServerSockets._open_orders().options(
+            *eager_options(OrderSchema))
+        app.socketio.emit('open:orders', dump(OrderSchema, orders),
+                          namespace='/orders/watch')
 
     @staticmethod
-    def get_users():
-        users = UserModel.query.all()
-        user_schema = UserSchema(many=True)
-        if users is None:
-            app.socketio.emit('error', {
-                              "message": "Failed to get user list", "code": 404}, namespace='/users/watch')
-        else:
-            response = user_schema.dump(users)
-            app.socketio.emit('changed:users', response,
-                              namespace='/users/watch')
+    def get_order_changes(changes: List[dict]):
+        """
+        Sends each order placed as an 'added:order' event, the complete
+        flag of each order updated as an 'updated:order' event and each
+        order deleted as a 'removed:order' event, to every client of the
+        orders namespace
+
+        Args:
+            changes (list[dict]): The row changes read from notifications
+
+        Returns:
+            None
+        """
+
+        added, updated, removed = ServerSockets._merge_changes(changes)
+        orders = OrderModel.query.filter(OrderModel.id.in_(added)).order_by(
+            OrderModel.id).options(*eager_options(OrderSchema)).all() \
+            if added else []
+        flags = dict(app.db.session.query(
+            OrderModel.id, OrderModel.complete).filter(
+                OrderModel.id.in_(updated))) if updated else {}
+
+        # Orders deleted since the notification was sent
+        found = {order.id for order in orders} | set(flags)
+        removed += [key for key in added + updated if key not in found]
+
+        for order in dump(OrderSchema, orders):
+            app.socketio.emit('added:order', order, namespace='/orders/watch')
+        for order_id in updated:
+            if order_id in flags:
+                app.socketio.emit('updated:order', {
+                    "id": order_id, "complete": bool(flags[order_id]),
+                }, namespace='/orders/watch')
+        for order_id in removed:
+            app.socketio.emit('removed:order', {"id": order_id},
+                              namespace='/orders/watch')
 
     @staticmethod
-    def listen_for_users():
-        pubsub=pgpubsub.connect(**app.pubsub_conn_det)
-        channel = ServerSockets._set_up_change_notifier(
-            pubsub.conn, "users", set(ServerSockets.DbActions))
-        pubsub.listen(channel)
-        while True:
-            for event in pubsub.events(yield_timeouts=True):
-                if event is None:
-                    pass
-                else:
-                    with app.app_context():
-                        ServerSockets.get_users()
+    def watch(watch: Watch):
+        """
+        Registers a table to be watched for changes and the handler that
+        sends its rows to clients connecting to the watch's namespace.
+        Watches must be registered before start_sockets_threads is called.
+
+        Args:
+            watch (Watch): The table, namespace, schema and event name
+
+        Returns:
+            Watch: The registered watch
+        """
+
+        if watch.snapshot is None and (
+                watch.connect is None or watch.get_all is None):
+            watch = watch._replace(snapshot=Snapshot(
+                lambda: dump(watch.schema, watch.model.query.options(
+                    *eager_options(watch.schema)))))
+
+        @ServerSockets._scoped
+        def on_connect(*args):
+            if watch.connect is not None:
+                watch.connect(request.sid, args[0] if args else None)
+            else:
+                ServerSockets.send_snapshot(watch, request.sid)
+
+        for table in watch.all_tables:
+            for snapshot in watch.all_snapshots:
+                ServerSockets.subscribe(table, snapshot)
+
+        ServerSockets.watches[watch.namespace] = watch
+        app.socketio.on_event('connect', on_connect, namespace=watch.namespace)
+        return watch
 
     @staticmethod
-    @app.socketio.on('connect', namespace='/users/watch')
-    def on_user_connect():
-        ServerSockets.get_users()
+    def subscribe(table: str, cache):
+        """
+        Registers a cache to be invalidated whenever a table changes.
+        Subscriptions must be made before start_sockets_threads is called.
+
+        The cache's `listening` attribute is set while the listener is
+        running; a cache must not serve entries while it is False, as
+        nothing would invalidate them.
+
+        Args:
+            table (str): The table to watch for changes
+            cache: An object with a `listening` attribute and an
+                `invalidate(change=None)` method, called with each row
+                change or None if the change is unknown
+
+        Returns:
+            None
+        """
+
+        caches = ServerSockets.caches.setdefault(table, [])
+        if cache not in caches:
+            caches.append(cache)
 
     @staticmethod
-    def get_ingredients():
-        ingredients = IngredientModel.query.all()
-        ingredient_schema = IngredientSchema(many=True)
+    def send_snapshot(watch: Watch, sid: str):
+        """
+        Sends every row of a watched table to a single client, from the
+        watch's snapshot. The database is only queried if the snapshot
+        is stale, so a burst of clients connecting costs one query
 
-        if ingredients is None:
-            app.socketio.emit(
-                'error', {"message": "Failed to get list of ingredients", "code": 404}, namespace='/ingredients/watch'
-            )
-        else:
-            response = ingredient_schema.dump(ingredients)
-            app.socketio.emit(
-                'changed:ingredients', response, namespace='/ingredients/watch'
-            )
+        Args:
+            watch (Watch): The watch whose rows are sent
+            sid (str): The session id of the client
+
+        Returns:
+            None
+        """
+
+        app.socketio.emit(
+            f'changed:{watch.event}', watch.snapshot.data(),
+            namespace=watch.namespace, to=sid)
+
+    @staticmethod
+    def get_all(watch: Watch):
+        """
+        Sends every row of a watched table to all clients connected to
+        the watch's namespace
+
+        Args:
+            watch (Watch): The watch whose rows are sent
+
+        Returns:
+            None
+        """
+
+        if watch.get_all is not None:
+            return watch.get_all()
+        app.socketio.emit(
+            f'changed:{watch.event}', watch.snapshot.data(),
+            namespace=watch.namespace)
 
     @staticmethod
-    def listen_for_ingredients():
-        pubsub=pgpubsub.connect(**app.pubsub_conn_det)
-
-        channel = ServerSockets._set_up_change_notifier(
-            pubsub.conn, "ingredients", set(
-                ServerSockets.DbActions)
-        )
-        pubsub.listen(channel)
-        while True:
-            for event in pubsub.events(yield_timeouts=True):
-                if event is None:
-                    pass
-                else:
-                    with app.app_context():
-                        ServerSockets.get_ingredients()
+    def get_changes(watch: Watch, changes: List[dict]):
+        """
+        Sends the rows affected by a batch of changes to all clients
+        connected to the watch's namespace
+
+        Args:
+            watch (Watch): The watch the changes were received for
+            changes (list[dict]): The row changes read from notifications
+
+        Returns:
+            None
+        """
+
+        if watch.get_changes is not None:
+            watch.get_changes(changes)
+        else:
+            ServerSockets.emit_changes(
+                watch.model, watch.schema, watch.event, watch.namespace,
+                changes)
 
     @staticmethod
-    @app.socketio.on('connect', namespace='/ingredients/watch')
-    def on_shoppinglist_connect():
-        ServerSockets.get_ingredients()
+    def listen():
+        """
+        Listen for changes to every watched table on a single connection,
+        invalidate the caches subscribed to the table and hand the change
+        to the coalescer of each watch it concerns, which sends it on to
+        clients connected to the watch's namespace
+
+        Args:
+            None
+
+        Returns:
+            NoReturn
+        """
+
+        pubsub = pgpubsub.connect(**app.pubsub_conn_det)
+        watches = ServerSockets.watches.values()
+        tables = {table for watch in watches for table in watch.all_tables}
+        tables.update(ServerSockets.caches)
+
+        # Tables shared by several watches are only LISTENed to once. A
+        # table whose triggers could not be set up is still LISTENed to, as
+        # triggers from an earlier start may be in place, and is retried in
+        # the background
+        channels, pending = {}, set()
+        for table in sorted(tables):
+            if not ServerSockets._provision(pubsub.conn, table):
+                pending.add(table)
+            channel = ServerSockets._channel(table)
+            pubsub.listen(channel)
+            channels[channel] = table
+
+        refreshes = {}
+        for watch in watches:
+            refresh = ServerSockets._coalescer(
+                watch.event,
+                partial(ServerSockets.get_all, watch),
+                partial(ServerSockets.get_changes, watch))
+            for table in watch.all_tables:
+                refreshes.setdefault(table, []).append(refresh)
+
+        # Every process invalidates its caches, but with a message queue
+        # only the leader queries and sends the changed rows. A new leader
+        # resends whole tables, as changes may have been dropped while the
+        # previous one was failing
+        if app.config.get('SOCKET_MESSAGE_QUEUE'):
+            ServerSockets.leader = Leader(
+                app.pubsub_conn_det,
+                app.config.get('SOCKET_LEADER_LOCK_ID'),
+                app.config.get('SOCKET_LEADER_RETRY'),
+                app.logger)
+            coalescers = {refresh for table_refreshes in refreshes.values()
+                          for refresh in table_refreshes}
+            app.socket_threads.append(spawn(
+                ServerSockets.leader.run,
+                lambda: [refresh.add(None) for refresh in coalescers]))
+
+        # Caches can only be used while we are listening for changes to
+        # every table they are subscribed to
+        caches = {cache for table_caches in ServerSockets.caches.values()
+                  for cache in table_caches}
+        for cache in caches:
+            cache.invalidate()
+
+        def update_listening():
+            unwatched = {cache for table in pending
+                         for cache in ServerSockets.caches.get(table, ())}
+            for cache in caches:
+                cache.listening = cache not in unwatched
+
+        def on_provisioned(table):
+            # Changes made before the triggers existed were never notified
+            for cache in ServerSockets.caches.get(table, ()):
+                cache.invalidate()
+            for refresh in refreshes.get(table, ()):
+                refresh.add(None)
+            update_listening()
+
+        update_listening()
+        if pending:
+            app.socket_threads.append(spawn(
+                ServerSockets._retry_provisioning, pending, on_provisioned))
+
+        @ServerSockets._scoped
+        def dispatch(event):
+            table = channels.get(event.channel)
+            change = ServerSockets._read_change(event)
+            for cache in ServerSockets.caches.get(table, ()):
+                cache.invalidate(change)
+            if ServerSockets.is_leader():
+                for refresh in refreshes.get(table, ()):
+                    refresh.add(change)
+
+        try:
+            while True:
+                for event in pubsub.events(yield_timeouts=True):
+                    if event is not None:
+                        dispatch(event)
+        finally:
+            for cache in caches:
+                cache.listening = False
 
     @staticmethod
     @atexit.register
@@ -258,7 +845,44 @@ class ServerSockets():
         for sig in (SIGABRT, SIGINT, SIGTERM):
             signal(sig, ServerSockets.clean_up_threads)
 
-        # spawn all listen threads
-        app.socket_threads.append(spawn(ServerSockets.listen_for_users))
-        app.socket_threads.append(spawn(ServerSockets.listen_for_ingredients))
-        app.socket_threads.append(spawn(ServerSockets.listen_for_menu))
+        # spawn the listen thread shared by all watches
+        app.socket_threads.append(spawn(ServerSockets.listen))
+
+
+ServerSockets.watch(Watch(
+    table="menuitem_categories",
+    namespace='/menu/watch',
+    schema=MenuItemCategorySchema,
+    event='menuitems',
+    tables=("menuitems", "menuitems_ingredients", "ingredients"),
+    get_changes=ServerSockets.get_menu_changes,
+    snapshot=Routes.categories_snapshot,
+    snapshots=(Routes.menuitems_snapshot,)))
+
+ServerSockets.subscribe("users", Routes.principals)
+
+users_watch = ServerSockets.watch(Watch(
+    table="users",
+    namespace='/users/watch',
+    schema=UserSchema,
+    event='users'))
+
+# The snapshot dumps orders_placed, which changes with the orders table.
+# The orders are not a table of the watch, as their changes carry order
+# ids rather than the ids of the users to send
+ServerSockets.subscribe("orders", users_watch.snapshot)
+
+ServerSockets.watch(Watch(
+    table="orders",
+    namespace='/orders/watch',
+    schema=OrderSchema,
+    event='orders',
+    get_changes=ServerSockets.get_order_changes,
+    connect=ServerSockets.send_orders,
+    get_all=ServerSockets.send_open_orders))
+
+ServerSockets.watch(Watch(
+    table="ingredients",
+    namespace='/ingredients/watch',
+    schema=IngredientSchema,
+    event='ingredients'))
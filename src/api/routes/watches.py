@@ -0,0 +1,81 @@
+"""Declares the tables whose changes are pushed to socket namespaces."""
+# Python imports
+from typing import Any, Callable, List, NamedTuple, Optional, Tuple
+
+
+class Watch(NamedTuple):
+    """
+    A table watched for changes and the socket namespace they are sent to.
+
+    Clients connecting to the namespace are sent every row dumped with the
+    schema as a 'changed:<event>' event, served from the watch's snapshot
+    so connecting only queries the database when the snapshot is stale,
+    unless connect is set. After that each batch of row changes is sent to
+    every client as 'added:<event>', 'updated:<event>' and
+    'removed:<event>' events, or handled by get_changes if it is set.
+
+    Attributes:
+        table (str):
+            The table whose rows the schema dumps
+
+        namespace (str):
+            The socket namespace clients connect to
+
+        schema:
+            The marshmallow schema class used to dump the rows
+
+        event (str):
+            The entity name used in the event names
+
+        tables (tuple[str]):
+            Other tables whose changes affect the dump of this watch
+
+        get_changes (Callable):
+            Sends the changes of a batch to the namespace, in place of the
+            default per-row events
+
+        snapshot (Snapshot):
+            The cached dump of every row sent to connecting clients.
+            ServerSockets.watch creates one if it is not given
+
+        snapshots (tuple[Snapshot]):
+            Other cached dumps to invalidate whenever one of the tables
+            changes
+
+        connect (Callable):
+            Sends a connecting client its initial state, in place of the
+            snapshot. Called with the client's session id and the auth
+            data it connected with, if any
+
+        get_all (Callable):
+            Resends the state of the namespace to every client when
+            changes may have been lost, in place of the snapshot
+    """
+
+    table: str
+    namespace: str
+    schema: Any
+    event: str
+    tables: Tuple[str, ...] = ()
+    get_changes: Optional[Callable[[List[dict]], None]] = None
+    snapshot: Any = None
+    snapshots: Tuple[Any, ...] = ()
+    connect: Optional[Callable[[str, Any], None]] = None
+    get_all: Optional[Callable[[], None]] = None
+
+    @property
+    def model(self):
+        """The SQLAlchemy model dumped by the schema."""
+        return self.schema.opts.model
+
+    @property
+    def all_tables(self) -> Tuple[str, ...]:
+        """Every table whose changes are sent to the namespace."""
+        return (self.table,) + self.tables
+
+    @property
+    def all_snapshots(self) -> Tuple[Any, ...]:
+        """Every cached dump invalidated by changes to the tables."""
+        if self.snapshot is None:
+            return self.snapshots
+        return (self.snapshot,) + self.snapshots
@@ -1,5 +1,4 @@
-
-
+from functools import lru_cache
 from typing import List
 from urllib.parse import urlparse
 from eventlet.greenthread import GreenThread
@@ -9,7 +8,15 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_marshmallow import Marshmallow
 from flask_bcrypt import Bcrypt
 from flask_socketio import SocketIO
-import pgpubsub
+from api.db.pool import TimedQueuePool
+from api.routes.pubsub import PostgresManager
+
+# The extensions are created once per process and bound to the app by
+# FlaskApp. Models and schemas only need them unbound to be defined
+db = SQLAlchemy()
+ma = Marshmallow()
+bcrypt = Bcrypt()
+socketio = SocketIO(cors_allowed_origins="*")
 
 
 class FlaskApp(Flask):
@@ -21,12 +28,20 @@ class FlaskApp(Flask):
         # Configure the Flask app
         self.config.from_object(Config)
         self.config.from_object(app_config)
+        self.config["SQLALCHEMY_ENGINE_OPTIONS"] = dict(
+            self.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}),
+            poolclass=TimedQueuePool)
 
-        # Initialize the SQLAlchemy Database, Marshmallow, Bycrpt, SocketIO, pgpubsub
-        self.db = SQLAlchemy(self)
-        self.ma = Marshmallow(self)
-        self.bcrypt = Bcrypt(self)
-        self.socketio = SocketIO(self, cors_allowed_origins="*")
+        # Bind the SQLAlchemy Database, Marshmallow, Bycrpt and SocketIO.
+        # Marshmallow reads the database session, so it is bound after it
+        self.db = db
+        self.ma = ma
+        self.bcrypt = bcrypt
+        self.socketio = socketio
+        for extension in (db, ma, bcrypt):
+            extension.init_app(self)
+        # Lets the socket listeners use the database outside of a request
+        db.app = self
         # A list to store threads spawned by the server for clean up on exit
         self.socket_threads: List[GreenThread] = []
         # psycopg's connect doesn't work natively with the DB_URI string for some reason hence the parsing
@@ -37,6 +52,30 @@ class FlaskApp(Flask):
                                 "user": dburl.username,
                                 "port": dburl.port}
 
+        # Emits reach the clients of every process through Postgres
+        socket_options = {}
+        if self.config.get('SOCKET_MESSAGE_QUEUE'):
+            socket_options['client_manager'] = PostgresManager(
+                self.pubsub_conn_det,
+                channel=self.config.get('SOCKET_MESSAGE_CHANNEL'))
+        socketio.init_app(self, **socket_options)
+
     def db_create_all(self):
         with self.app_context():
             self.db.create_all()
+
+
+@lru_cache(maxsize=None)
+def create_app() -> FlaskApp:
+    """
+    Returns the app of this process, creating it on first use. Every
+    module shares it, so there is a single engine and connection pool
+
+    Args:
+        None
+
+    Returns:
+        FlaskApp: The app
+    """
+
+    return FlaskApp()
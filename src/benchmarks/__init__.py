@@ -0,0 +1 @@
+"""Used for creating the Benchmarks Module"""
@@ -0,0 +1,181 @@
+"""Generates a synthetic dataset for the benchmarks."""
+# Python imports
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+# User module imports
+from api.db.models import (
+    IngredientModel,
+    MenuItemCategoryModel,
+    MenuItemModel,
+    OrderItemModel,
+    OrderModel,
+    UserModel,
+    menuitems_ingredients)
+from api.db.passwords import Passwords
+
+
+class Scale(NamedTuple):
+    """The amount of rows of each table to generate."""
+
+    users: int
+    categories: int
+    menuitems: int
+    ingredients: int
+    orders: int
+    items_per_order: int
+    ingredients_per_menuitem: int = 4
+
+
+class Dataset():
+    """
+    Seeds the benchmark database with random but reproducible data.
+
+    Every user shares the password PASSWORD so the login routes can be
+    driven; it is hashed once at the configured cost.
+    """
+
+    SCALES = {
+        "small": Scale(users=100, categories=5, menuitems=50,
+                       ingredients=40, orders=1000, items_per_order=3),
+        "medium": Scale(users=1000, categories=10, menuitems=200,
+                        ingredients=100, orders=20000, items_per_order=3),
+        "large": Scale(users=10000, categories=20, menuitems=1000,
+                       ingredients=300, orders=200000, items_per_order=4),
+    }
+
+    PASSWORD = "benchmark"
+
+    # Rows per INSERT statement
+    BATCH_SIZE = 2000
+
+    @staticmethod
+    def _insert(connection, table, rows):
+        """
+        Inserts rows with multi-row INSERT statements
+
+        Args:
+            connection: A SQLAlchemy connection
+            table: The SQLAlchemy Table to insert into
+            rows (list[dict]): The rows to insert
+
+        Returns:
+            None
+        """
+
+        for start in range(0, len(rows), Dataset.BATCH_SIZE):
+            connection.execute(
+                table.insert().values(rows[start:start + Dataset.BATCH_SIZE]))
+
+    @staticmethod
+    def reset(app):
+        """
+        Empties every table of the benchmark database
+
+        Args:
+            app: The Flask app, connected to the benchmark database
+
+        Returns:
+            None
+        """
+
+        tables = ", ".join(
+            table.name for table in app.db.metadata.sorted_tables)
+        with app.db.engine.begin() as connection:
+            connection.execute(
+                f"TRUNCATE {tables} RESTART IDENTITY CASCADE")
+
+    @staticmethod
+    def seed(app, scale: Scale, seed: int = 0):
+        """
+        Inserts a dataset of the given scale into empty tables. Ids are
+        assigned from 1 upwards, so reset the database first
+
+        Args:
+            app: The Flask app, connected to the benchmark database
+            scale (Scale): The amount of rows to generate
+            seed (int): The seed of the random generator
+
+        Returns:
+            None
+        """
+
+        rand = random.Random(seed)
+        now = datetime.now()
+        password = Passwords.hash(Dataset.PASSWORD)
+
+        users = [{
+            "id": user_id,
+            "username": f"user{user_id}",
+            "email": f"user{user_id}@bench.local",
+            "password": password,
+            "firstname": "Bench",
+            "lastname": f"User {user_id}",
+            "address": f"{user_id} Benchmark Road",
+            "is_admin": user_id == 1,
+            "public_id": str(uuid.UUID(int=rand.getrandbits(128))),
+            "created_on": now - timedelta(days=rand.randint(0, 365)),
+        } for user_id in range(1, scale.users + 1)]
+
+        categories = [{"id": category_id, "name": f"Category {category_id}"}
+                      for category_id in range(1, scale.categories + 1)]
+
+        ingredients = [{
+            "id": ingredient_id,
+            "name": f"Ingredient {ingredient_id}",
+            "in_stock": rand.random() < 0.8,
+        } for ingredient_id in range(1, scale.ingredients + 1)]
+
+        menuitems, links = [], []
+        for menuitem_id in range(1, scale.menuitems + 1):
+            menuitems.append({
+                "id": menuitem_id,
+                "flavour": f"Flavour {menuitem_id}",
+                "category_id": rand.randint(1, scale.categories),
+                "price": round(rand.uniform(100, 5000), 2),
+                "description": f"A benchmark menu item #{menuitem_id}",
+                "image_url": f"https://example.com/{menuitem_id}.png",
+            })
+            for ingredient_id in rand.sample(
+                    range(1, scale.ingredients + 1),
+                    min(scale.ingredients_per_menuitem, scale.ingredients)):
+                links.append({"menuitem_id": menuitem_id,
+                              "ingredient_id": ingredient_id})
+
+        orders, items = [], []
+        for order_id in range(1, scale.orders + 1):
+            orders.append({
+                "id": order_id,
+                "user_id": rand.randint(1, scale.users),
+                "complete": rand.random() < 0.9,
+                "created_on": now - timedelta(
+                    minutes=rand.randint(0, 60 * 24 * 365)),
+            })
+            for _ in range(scale.items_per_order):
+                items.append({
+                    "order_id": order_id,
+                    "menuitem_id": rand.randint(1, scale.menuitems),
+                    "qty": rand.randint(1, 5),
+                })
+
+        with app.db.engine.begin() as connection:
+            for model, rows in (
+                    (UserModel, users),
+                    (MenuItemCategoryModel, categories),
+                    (IngredientModel, ingredients),
+                    (MenuItemModel, menuitems)):
+                Dataset._insert(connection, model.__table__, rows)
+            Dataset._insert(connection, menuitems_ingredients, links)
+            Dataset._insert(connection, OrderModel.__table__, orders)
+            Dataset._insert(connection, OrderItemModel.__table__, items)
+
+            # Explicit ids leave the sequences behind
+            for model in (UserModel, MenuItemCategoryModel, IngredientModel,
+                          MenuItemModel, OrderModel):
+                table = model.__tablename__
+                connection.execute(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"(SELECT coalesce(max(id), 1) FROM {table}))")
+            connection.execute("ANALYZE")
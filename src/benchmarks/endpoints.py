@@ -0,0 +1,166 @@
+"""The requests the HTTP benchmark sends to each route."""
+# Python imports
+from typing import Callable, NamedTuple
+
+# User module imports
+from api.db.models import MenuItemModel, UserModel, menuitems_ingredients
+
+
+class Endpoint(NamedTuple):
+    """
+    A route of the API and how to call it.
+
+    request(ctx, i) returns the keyword arguments of the i-th call to
+    client.open. setup(app, ctx, n), if given, creates whatever n calls
+    consume (e.g. the rows they delete) before any call is timed.
+    Endpoints that dump whole tables are called at most `limit` times.
+    """
+
+    name: str
+    request: Callable[[dict, int], dict]
+    setup: Callable = None
+    limit: int = None
+
+
+def get(path: str, auth: bool = False) -> Callable[[dict, int], dict]:
+    """Returns a request function for a GET of a fixed path."""
+    def request(ctx, i):
+        headers = {"X-Access-Token": ctx["token"]} if auth else {}
+        return {"method": "GET", "path": path.format(**ctx),
+                "headers": headers}
+    return request
+
+
+def post(path: str, body: Callable[[dict, int], dict],
+         auth: bool = False) -> Callable[[dict, int], dict]:
+    """Returns a request function for a POST of a JSON body."""
+    def request(ctx, i):
+        headers = {"X-Access-Token": ctx["token"]} if auth else {}
+        return {"method": "POST", "path": path, "json": body(ctx, i),
+                "headers": headers}
+    return request
+
+
+def pick(ctx: dict, key: str, i: int) -> int:
+    """Returns the id of an existing row, cycling through them with i."""
+    return i * 7919 % ctx[key] + 1
+
+
+def order(ctx: dict, i: int) -> dict:
+    """Returns a three item order."""
+    return {"complete": False, "items": [
+        {"menuitem": {"id": pick(ctx, "menuitems", i + n)}, "qty": n + 1}
+        for n in range(3)]}
+
+
+def setup_menuitems(app, ctx: dict, n: int):
+    """Creates the menu items /remove-item deletes."""
+    rows = [{"flavour": f"Removable {ctx['run']} {i}", "category_id": 1,
+             "price": 100, "description": "", "image_url": ""}
+            for i in range(n)]
+    with app.db.engine.begin() as connection:
+        ids = [row[0] for row in connection.execute(
+            MenuItemModel.__table__.insert().values(rows).returning(
+                MenuItemModel.id))]
+        connection.execute(menuitems_ingredients.insert().values(
+            [{"menuitem_id": menuitem_id, "ingredient_id": 1}
+             for menuitem_id in ids]))
+    ctx["removable_menuitems"] = ids
+
+
+def setup_users(app, ctx: dict, n: int):
+    """Creates the users /users/remove deletes."""
+    rows = [{"username": f"removable_{ctx['run']}_{i}",
+             "email": f"removable_{ctx['run']}_{i}@bench.local",
+             "password": "", "firstname": "Removable", "lastname": "User",
+             "public_id": f"removable-{ctx['run']}-{i}"}
+            for i in range(n)]
+    with app.db.engine.begin() as connection:
+        ctx["removable_users"] = [row[0] for row in connection.execute(
+            UserModel.__table__.insert().values(rows).returning(
+                UserModel.id))]
+
+
+ENDPOINTS = (
+    # Reads
+    Endpoint("users", get("/users"), limit=20),
+    Endpoint("users_page", get("/users?limit=50")),
+    Endpoint("users_stream", get("/users?stream"), limit=20),
+    Endpoint("orders", get("/orders"), limit=5),
+    Endpoint("orders_page", get("/orders?limit=50")),
+    Endpoint("orders_page_by_date", get("/orders?limit=50&sort=created_on")),
+    Endpoint("orders_stream", get("/orders?stream"), limit=5),
+    Endpoint("orders_export", get("/orders/export", auth=True), limit=5),
+    Endpoint("orders_export_ndjson", get(
+        "/orders/export?format=ndjson&start={year_ago}&end={today}",
+        auth=True), limit=5),
+    Endpoint("user_orders", lambda ctx, i: {
+        "method": "GET", "path": f"/orders/{pick(ctx, 'users', i)}"}),
+    Endpoint("menuitems", get("/menuitems")),
+    Endpoint("menuitems_page", get("/menuitems?limit=50")),
+    Endpoint("menuitems_search", lambda ctx, i: {
+        "method": "GET",
+        "path": f"/menuitems/search?q=flavour+{pick(ctx, 'menuitems', i)}"}),
+    Endpoint("menuitems_filter", lambda ctx, i: {
+        "method": "GET", "path": "/menuitems/search?category={}&with={}"
+        "&without={}".format(pick(ctx, "categories", i),
+                             pick(ctx, "ingredients", i),
+                             pick(ctx, "ingredients", i + 1))}),
+    Endpoint("categories", get("/categories")),
+    Endpoint("ingredients", get("/ingredients")),
+    Endpoint("weeks_ingredients", get("/weeks-ingredients")),
+    Endpoint("ingredient_demand",
+             get("/ingredients/demand?start={year_ago}&end={today}")),
+    Endpoint("principal_cache", get("/auth/cache", auth=True)),
+    Endpoint("socket_stats", get("/sockets/stats", auth=True)),
+    Endpoint("metrics", get("/metrics")),
+    Endpoint("pool_stats", get("/db/pool", auth=True)),
+
+    # Writes
+    Endpoint("login", post("/auth/login", lambda ctx, i: {
+        "username": f"user{pick(ctx, 'users', i)}",
+        "password": ctx["password"]}), limit=20),
+    Endpoint("signup", post("/auth/signup", lambda ctx, i: {
+        "username": f"signup_{ctx['run']}_{i}",
+        "email": f"signup_{ctx['run']}_{i}@bench.local",
+        "password": ctx["password"], "firstname": "Bench",
+        "lastname": "Signup", "address": "1 Benchmark Road"}), limit=20),
+    Endpoint("add_order", post("/orders/add", order, auth=True)),
+    Endpoint("add_order_batch", post("/orders/batch", lambda ctx, i: {
+        "orders": [order(ctx, i * 20 + n) for n in range(20)]}, auth=True)),
+    Endpoint("add_category", post("/categories/add", lambda ctx, i: {
+        "category": f"Category {ctx['run']} {i}"})),
+    Endpoint("add_menuitem", post("/menuitems/add", lambda ctx, i: {
+        "flavour": f"Flavour {ctx['run']} {i}", "price": 250,
+        "categoryID": pick(ctx, "categories", i), "description": "",
+        "imgURL": "", "ids": [pick(ctx, "ingredients", i + n)
+                              for n in range(3)]})),
+    Endpoint("menu_reload", post("/menuitems/batch", lambda ctx, i: {
+        "menuitems": [{
+            "flavour": f"Seasonal {ctx['run']} {n}", "price": 250 + i,
+            "categoryID": pick(ctx, "categories", n), "description": "",
+            "imgURL": "", "ids": [pick(ctx, "ingredients", i + n + m)
+                                  for m in range(3)]}
+            for n in range(500)]}, auth=True), limit=20),
+    Endpoint("update_menuitem", post("/update-menuitem", lambda ctx, i: {
+        "id": pick(ctx, "menuitems", i), "flavour": f"Flavour {i}",
+        "price": 250, "description": "", "imgURL": ""})),
+    Endpoint("remove_menuitem", post("/remove-item", lambda ctx, i: {
+        "id": ctx["removable_menuitems"][i]}), setup=setup_menuitems),
+    Endpoint("add_ingredients", post("/ingredients/add", lambda ctx, i: {
+        "new_items": [f"Ingredient {ctx['run']} {i} {n}"
+                      for n in range(5)]})),
+    Endpoint("set_stock", post("/ingredients/setstock", lambda ctx, i: {
+        "id": pick(ctx, "ingredients", i),
+        "stock": "yes" if i % 2 else "no"})),
+    Endpoint("set_stock_batch", post("/ingredients/setstock/batch",
+                                     lambda ctx, i: {"stock": [
+        {"id": pick(ctx, "ingredients", i * 50 + n),
+         "stock": "yes" if (i + n) % 2 else "no"}
+        for n in range(50)]}, auth=True)),
+    Endpoint("add_category_batch", post("/categories/batch", lambda ctx, i: {
+        "categories": [f"Category {ctx['run']} {i} {n}"
+                       for n in range(20)]}, auth=True)),
+    Endpoint("remove_user", post("/users/remove", lambda ctx, i: {
+        "id": ctx["removable_users"][i]}), setup=setup_users),
+)
@@ -0,0 +1,91 @@
+"""Measures /menuitems latency while logins are being verified.
+
+Logins run bcrypt at the configured cost. With hashing on the eventlet hub
+(--inline) every other request waits for it, with the thread pool they do
+not. Run against a development database from the src directory:
+
+    python -m benchmarks.login_contention
+    python -m benchmarks.login_contention --inline
+"""
+import eventlet
+eventlet.monkey_patch()
+
+# Python imports
+import argparse
+import uuid
+from time import perf_counter
+
+# User module imports
+from api.routes.routes import app
+from api.db.models import UserModel
+from benchmarks.stats import percentile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=4,
+                        help="concurrent login loops")
+    parser.add_argument("--requests", type=int, default=200,
+                        help="/menuitems requests to time")
+    parser.add_argument("--inline", action="store_true",
+                        help="hash on the hub instead of the thread pool")
+    args = parser.parse_args()
+
+    app.config['BCRYPT_USE_POOL'] = not args.inline
+
+    # A throwaway user to log in as
+    username = f"bench_{uuid.uuid4().hex[:8]}"
+    password = uuid.uuid4().hex
+    with app.app_context():
+        user = UserModel(username=username, email=f"{username}@bench.local",
+                         firstname="Bench", lastname="User",
+                         password=password)
+        app.db.session.add(user)
+        app.db.session.commit()
+        user_id = user.id
+
+    client = app.test_client()
+    latencies, logins = [], []
+    running = True
+
+    def login_loop():
+        while running:
+            start = perf_counter()
+            client.post("/auth/login",
+                        json={"username": username, "password": password})
+            logins.append(perf_counter() - start)
+
+    def menu_loop():
+        for _ in range(args.requests):
+            start = perf_counter()
+            client.get("/menuitems")
+            latencies.append((perf_counter() - start) * 1000)
+            eventlet.sleep(0)
+
+    try:
+        login_threads = [eventlet.spawn(login_loop)
+                         for _ in range(args.logins)]
+        eventlet.sleep(0)
+        started = perf_counter()
+        eventlet.spawn(menu_loop).wait()
+        elapsed = perf_counter() - started
+        running = False
+        for thread in login_threads:
+            thread.wait()
+    finally:
+        with app.app_context():
+            app.db.session.delete(UserModel.query.get(user_id))
+            app.db.session.commit()
+
+    mode = "inline" if args.inline else "thread pool"
+    print(f"bcrypt {mode}, {args.logins} concurrent logins")
+    print(f"logins completed: {len(logins)}")
+    print(f"/menuitems over {elapsed:.2f}s: "
+          f"p50 {percentile(latencies, 50):.1f}ms  "
+          f"p95 {percentile(latencies, 95):.1f}ms  "
+          f"p99 {percentile(latencies, 99):.1f}ms  "
+          f"max {max(latencies):.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Measures the cold start of the API, from import to the first response.
+
+Each run starts a fresh interpreter that imports the server's modules,
+then serves one request through the test client. Reports the median
+import time, first request time, the number of app instances and
+database engines the process ended up with, and its peak RSS. Run
+against a development database from the src directory:
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 20 --path /categories
+"""
+# Python imports
+import argparse
+import json
+import subprocess
+import sys
+from statistics import median
+
+
+def child(path):
+    """Starts the app in this interpreter and prints its measurements."""
+    from time import perf_counter
+    started = perf_counter()
+
+    import gc
+    from api.routes.sockets import app
+    from app import FlaskApp
+    from sqlalchemy.engine import Engine
+    from benchmarks.stats import peak_rss_mb
+    imported = perf_counter()
+
+    with app.app_context():
+        status = app.test_client().get(path).status_code
+    responded = perf_counter()
+
+    objects = gc.get_objects()
+    print(json.dumps({
+        "import": (imported - started) * 1000,
+        "request": (responded - imported) * 1000,
+        "status": status,
+        "apps": sum(isinstance(obj, FlaskApp) for obj in objects),
+        "engines": sum(isinstance(obj, Engine) for obj in objects),
+        "rss": peak_rss_mb(),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10,
+                        help="interpreters to start")
+    parser.add_argument("--path", default="/categories",
+                        help="the route of the first request")
+    parser.add_argument("--child", action="store_true",
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args.path)
+
+    runs = [json.loads(subprocess.check_output(
+        [sys.executable, "-m", "benchmarks.startup", "--child",
+         "--path", args.path]).decode().splitlines()[-1])
+        for _ in range(args.runs)]
+
+    last = runs[-1]
+    print(f"{args.runs} cold starts, first request GET {args.path} "
+          f"({last['status']})")
+    print(f"import {median(run['import'] for run in runs):.0f}ms  "
+          f"first request {median(run['request'] for run in runs):.0f}ms  "
+          f"total {median(run['import'] + run['request'] for run in runs):.0f}ms")
+    print(f"app instances {last['apps']}  engines {last['engines']}  "
+          f"peak RSS {median(run['rss'] for run in runs):.0f}MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,15 @@
+"""Summarises the measurements taken by the benchmarks."""
+# Python imports
+import resource
+
+
+def percentile(samples, pct):
+    """Returns the pct-th percentile of a list of samples."""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    """Returns the peak resident set size of the process in MB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
@@ -0,0 +1,194 @@
+"""Drives every route of the API against a synthetic dataset.
+
+Seeds the database named by BENCH_DATABASE_URI (it is emptied first, so
+never point it at real data), then calls each route through the Flask
+test client and reports its latency percentiles, throughput, peak RSS and
+the SQL statements it ran per request. Fails if a route runs more
+statements than its budget in budgets.json. Run from the src directory:
+
+    BENCH_DATABASE_URI=postgresql://localhost/bench python -m benchmarks.suite
+    python -m benchmarks.suite --scale large --requests 200
+    python -m benchmarks.suite --no-seed --only orders_page,login
+    python -m benchmarks.suite --update-budgets
+"""
+import eventlet
+eventlet.monkey_patch()
+
+# Wait on the database through the hub, as server.py does
+from psycogreen.eventlet import patch_psycopg
+patch_psycopg()
+
+import os
+import sys
+
+# The app reads its database from the environment when it is imported
+if not os.environ.get("BENCH_DATABASE_URI"):
+    sys.exit("BENCH_DATABASE_URI must name a database the benchmark may empty")
+os.environ["SQLALCHEMY_DATABASE_URI"] = os.environ["BENCH_DATABASE_URI"]
+
+# Python imports
+import argparse
+import json
+import uuid
+from datetime import date, timedelta
+from time import perf_counter
+
+# SQLAlchemy imports
+from sqlalchemy import event
+
+# User module imports
+from api.routes.sockets import app
+from benchmarks.dataset import Dataset
+from benchmarks.endpoints import ENDPOINTS
+from benchmarks.stats import peak_rss_mb, percentile
+
+BUDGETS = os.path.join(os.path.dirname(__file__), "budgets.json")
+
+
+def run_endpoint(app, client, endpoint, ctx, requests, warmup):
+    """
+    Calls an endpoint, timing each call and counting its SQL statements
+
+    Args:
+        app: The Flask app
+        client: A Flask test client of the app
+        endpoint (Endpoint): The endpoint to call
+        ctx (dict): The ids and credentials of the seeded dataset
+        requests (int): The calls to time
+        warmup (int): The calls to make before timing
+
+    Returns:
+        dict: The measurements of the endpoint
+    """
+
+    if endpoint.limit is not None:
+        requests = min(requests, endpoint.limit)
+    if endpoint.setup is not None:
+        endpoint.setup(app, ctx, requests + warmup)
+
+    statements = [0]
+
+    def count(conn, cursor, statement, parameters, context, many):
+        statements[0] += 1
+
+    latencies, counts, errors = [], [], 0
+    for i in range(warmup):
+        client.open(**endpoint.request(ctx, requests + i))
+
+    event.listen(app.db.engine, "before_cursor_execute", count)
+    try:
+        started = perf_counter()
+        for i in range(requests):
+            statements[0] = 0
+            start = perf_counter()
+            response = client.open(**endpoint.request(ctx, i))
+            # Streamed bodies are only generated once they are read
+            response.get_data()
+            latencies.append((perf_counter() - start) * 1000)
+            counts.append(statements[0])
+            errors += response.status_code >= 500
+        elapsed = perf_counter() - started
+    finally:
+        event.remove(app.db.engine, "before_cursor_execute", count)
+
+    return {
+        "requests": requests,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "throughput": requests / elapsed,
+        "rss": peak_rss_mb(),
+        "statements": max(counts),
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(Dataset.SCALES),
+                        default="small", help="preset dataset size")
+    for field in Dataset.SCALES["small"]._fields:
+        parser.add_argument("--" + field.replace("_", "-"), type=int,
+                            help=f"override the {field} of the scale")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the dataset generator")
+    parser.add_argument("--no-seed", dest="reseed", action="store_false",
+                        help="reuse the dataset of the previous run")
+    parser.add_argument("--requests", type=int, default=50,
+                        help="timed calls per endpoint")
+    parser.add_argument("--warmup", type=int, default=2,
+                        help="untimed calls per endpoint")
+    parser.add_argument("--only", help="comma separated endpoint names")
+    parser.add_argument("--update-budgets", action="store_true",
+                        help="record the statement counts as the budgets")
+    args = parser.parse_args()
+
+    overrides = {field: getattr(args, field)
+                 for field in Dataset.SCALES[args.scale]._fields
+                 if getattr(args, field) is not None}
+    scale = Dataset.SCALES[args.scale]._replace(**overrides)
+    # Budgets only hold for the preset sizes
+    budget_key = "custom" if overrides else args.scale
+
+    endpoints = ENDPOINTS
+    if args.only:
+        names = args.only.split(",")
+        endpoints = [e for e in ENDPOINTS if e.name in names]
+
+    with open(BUDGETS) as budgets_file:
+        budgets = json.load(budgets_file)
+
+    today = date.today()
+    ctx = dict(scale._asdict(), run=uuid.uuid4().hex[:8],
+               password=Dataset.PASSWORD, today=today.isoformat(),
+               year_ago=(today - timedelta(days=365)).isoformat())
+
+    with app.app_context():
+        app.db_create_all()
+        if args.reseed:
+            started = perf_counter()
+            Dataset.reset(app)
+            Dataset.seed(app, scale, args.seed)
+            print(f"Seeded {args.scale} {scale} "
+                  f"in {perf_counter() - started:.1f}s")
+
+        client = app.test_client()
+        # user1 is the admin of the dataset
+        ctx["token"] = client.post("/auth/login", json={
+            "username": "user1", "password": Dataset.PASSWORD
+        }).get_json()["token"]
+
+        results = {endpoint.name: run_endpoint(
+            app, client, endpoint, ctx, args.requests, args.warmup)
+            for endpoint in endpoints}
+
+    budget = budgets.get(budget_key, {})
+    failed = False
+    print(f"{'endpoint':22} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'req/s':>8} {'rss MB':>8} {'sql':>4} {'budget':>6}")
+    for name, result in results.items():
+        limit = budget.get(name)
+        over = limit is not None and result["statements"] > limit
+        failed = failed or over or result["errors"] > 0
+        status = "OVER" if over else ""
+        if result["errors"]:
+            status += f" {result['errors']} errors"
+        print(f"{name:22} {result['p50']:8.1f} {result['p95']:8.1f} "
+              f"{result['p99']:8.1f} {result['throughput']:8.1f} "
+              f"{result['rss']:8.0f} {result['statements']:4} "
+              f"{'-' if limit is None else limit:>6} {status}")
+
+    if args.update_budgets:
+        budget.update({name: result["statements"]
+                       for name, result in results.items()})
+        budgets[budget_key] = budget
+        with open(BUDGETS, "w") as budgets_file:
+            json.dump(budgets, budgets_file, indent=4, sort_keys=True)
+            budgets_file.write("\n")
+        print(f"Recorded the {budget_key} budgets in {BUDGETS}")
+    elif failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Measures /users/remove for a customer with a long order history.
+
+Each run creates a throwaway user with --orders orders of --items items,
+then times the request that deletes them, counting the statements it ran
+and the orders and items left behind. Deletes cascade in the database, so
+the count should not grow with the history. Run against a development
+database from the src directory:
+
+    python -m benchmarks.user_removal
+    python -m benchmarks.user_removal --orders 2000 --items 10 --runs 5
+"""
+import eventlet
+eventlet.monkey_patch()
+
+# SQLAlchemy imports
+from sqlalchemy import event, func
+
+# Python imports
+import argparse
+import uuid
+from statistics import median
+from time import perf_counter
+
+# User module imports
+from api.routes.routes import app
+from api.db.models import MenuItemModel, OrderItemModel, OrderModel
+from api.db.models import UserModel
+from benchmarks.dataset import Dataset
+
+
+def create_customer(orders: int, items: int, menuitems: list) -> int:
+    """Creates a user with orders of items and returns its id."""
+    username = f"bench_{uuid.uuid4().hex[:8]}"
+    with app.db.engine.begin() as connection:
+        user_id = connection.execute(UserModel.__table__.insert().values(
+            username=username, email=f"{username}@bench.local",
+            password="", firstname="Bench", lastname="Customer",
+            public_id=username).returning(UserModel.id)).scalar()
+        order_ids = [row[0] for row in connection.execute(
+            OrderModel.__table__.insert().values(
+                [{"user_id": user_id, "complete": True}
+                 for _ in range(orders)]).returning(OrderModel.id))]
+        Dataset._insert(connection, OrderItemModel.__table__, [
+            {"order_id": order_id, "qty": 1,
+             "menuitem_id": menuitems[(order_id + n) % len(menuitems)]}
+            for order_id in order_ids for n in range(items)])
+    return user_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=1000,
+                        help="orders of the deleted user")
+    parser.add_argument("--items", type=int, default=5,
+                        help="items of each order")
+    parser.add_argument("--runs", type=int, default=3,
+                        help="users to create and delete")
+    args = parser.parse_args()
+
+    with app.app_context():
+        menuitems = [menuitem_id for (menuitem_id,) in
+                     app.db.session.query(MenuItemModel.id)]
+    if not menuitems:
+        parser.error("the database has no menu items to order")
+
+    statements = [0]
+
+    def count(conn, cursor, statement, parameters, context, many):
+        statements[0] += 1
+
+    client = app.test_client()
+    timings, counts, left = [], [], 0
+    for _ in range(args.runs):
+        user_id = create_customer(args.orders, args.items, menuitems)
+        statements[0] = 0
+        event.listen(app.db.engine, "before_cursor_execute", count)
+        try:
+            start = perf_counter()
+            response = client.post("/users/remove", json={"id": user_id})
+            timings.append((perf_counter() - start) * 1000)
+        finally:
+            event.remove(app.db.engine, "before_cursor_execute", count)
+        counts.append(statements[0])
+        if response.get_json().get("message") != "success":
+            raise SystemExit(f"user {user_id} was not deleted")
+
+        with app.app_context():
+            left += app.db.session.query(func.count(OrderModel.id)).filter(
+                OrderModel.user_id == user_id).scalar()
+
+    print(f"/users/remove of a user with {args.orders} orders of "
+          f"{args.items} items ({args.orders * args.items} order items)")
+    print(f"median {median(timings):.1f}ms  max {max(timings):.1f}ms  "
+          f"statements {max(counts)}  orders left {left}")
+
+
+if __name__ == '__main__':
+    main()
@@ -19,15 +19,82 @@ class Config():
     SECRET_KEY = os.environ.get('SECRET_KEY')
     JWT_ACCESS_LIFESPAN = {'hours': 24}
     JWT_REFRESH_LIFESPAN = {'days': 30}
+    # The users behind verified tokens are cached for this many seconds
+    PRINCIPAL_CACHE_TTL = float(os.environ.get("PRINCIPAL_CACHE_TTL", 300))
+    PRINCIPAL_CACHE_SIZE = int(os.environ.get("PRINCIPAL_CACHE_SIZE", 4096))
 
     # SQL Alchemy config
     SQLALCHEMY_DATABASE_URI = os.environ.get("SQLALCHEMY_DATABASE_URI")
     SQLALCHEMY_ECHO = False
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Connection pool, per process: DB_POOL_SIZE connections are kept open
+    # and up to DB_MAX_OVERFLOW more are opened under load. Checkouts fail
+    # after waiting DB_POOL_TIMEOUT seconds, and statements are cancelled
+    # after DB_STATEMENT_TIMEOUT_MS (0 to disable)
+    DB_STATEMENT_TIMEOUT_MS = int(
+        os.environ.get("DB_STATEMENT_TIMEOUT_MS", 30000))
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 10)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": True,
+        "connect_args": {
+            "options": "-c statement_timeout={}".format(
+                DB_STATEMENT_TIMEOUT_MS)},
+    }
+
+    # List endpoint config
+    LIST_PAGE_MAX_LIMIT = int(os.environ.get("LIST_PAGE_MAX_LIMIT", 500))
+    LIST_STREAM_BATCH_SIZE = int(os.environ.get("LIST_STREAM_BATCH_SIZE", 500))
+
+    # The most orders accepted by /orders/batch in one request
+    ORDER_BATCH_MAX_SIZE = int(os.environ.get("ORDER_BATCH_MAX_SIZE", 500))
+
+    # The most menu items, ingredients or categories accepted by the
+    # catalog batch endpoints in one request
+    CATALOG_BATCH_MAX_SIZE = int(
+        os.environ.get("CATALOG_BATCH_MAX_SIZE", 1000))
+
+    # Socket config, bursts of change notifications arriving within the
+    # window (in seconds) are sent to clients as one batch, held no longer
+    # than the max delay
+    SOCKET_COALESCE_WINDOW = float(
+        os.environ.get("SOCKET_COALESCE_WINDOW", 0.1))
+    SOCKET_COALESCE_MAX_DELAY = float(
+        os.environ.get("SOCKET_COALESCE_MAX_DELAY", 1.0))
+    # Relay socket events between processes over Postgres NOTIFY on this
+    # channel, so several workers can serve the sockets. The process
+    # holding the advisory lock sends the change events, the others take
+    # over within SOCKET_LEADER_RETRY seconds if it dies
+    SOCKET_MESSAGE_QUEUE = os.environ.get(
+        "SOCKET_MESSAGE_QUEUE", "false").lower() == "true"
+    SOCKET_MESSAGE_CHANNEL = os.environ.get(
+        "SOCKET_MESSAGE_CHANNEL", "socketio")
+    SOCKET_LEADER_LOCK_ID = int(
+        os.environ.get("SOCKET_LEADER_LOCK_ID", 0x53424c53))
+    SOCKET_LEADER_RETRY = float(os.environ.get("SOCKET_LEADER_RETRY", 5.0))
+    # Change triggers that cannot be set up (e.g. the table stayed locked)
+    # are retried after SOCKET_PROVISION_RETRY seconds, doubling up to
+    # SOCKET_PROVISION_MAX_RETRY
+    SOCKET_PROVISION_RETRY = float(
+        os.environ.get("SOCKET_PROVISION_RETRY", 5.0))
+    SOCKET_PROVISION_MAX_RETRY = float(
+        os.environ.get("SOCKET_PROVISION_MAX_RETRY", 300.0))
 
     # Security config
     CSRF_ENABLED = True
     BCRYPT_LOG_ROUNDS = 15
+    # When set, the cost is calibrated so a hash takes about this long
+    BCRYPT_TARGET_MS = os.environ.get("BCRYPT_TARGET_MS")
+    BCRYPT_MIN_LOG_ROUNDS = 10
+    BCRYPT_MAX_LOG_ROUNDS = 15
+    # Each process calibrates its own cost, so hashes are only upgraded
+    # when they fall this many rounds below it, and never downgraded
+    BCRYPT_REHASH_MARGIN = int(os.environ.get("BCRYPT_REHASH_MARGIN", 1))
+    # The most hashes computed at once, off the eventlet hub
+    BCRYPT_USE_POOL = True
+    BCRYPT_POOL_SIZE = int(os.environ.get("BCRYPT_POOL_SIZE", 4))
     SESSION_TYPE = os.environ.get("SESSION_TYPE")
 
     def __init__(self, debug_mode=True):
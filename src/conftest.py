@@ -0,0 +1,72 @@
+"""Fixtures shared by the tests.
+
+Tests that need a database run against the one named by
+TEST_DATABASE_URI, which is emptied and seeded, so never point it at real
+data. Without it they are skipped. Run from the src directory:
+
+    TEST_DATABASE_URI=postgresql://localhost/test python -m pytest
+"""
+import os
+
+# The app reads its database from the environment when it is imported
+if os.environ.get("TEST_DATABASE_URI"):
+    os.environ["SQLALCHEMY_DATABASE_URI"] = os.environ["TEST_DATABASE_URI"]
+
+# Python imports
+from contextlib import contextmanager
+import pytest
+
+# SQLAlchemy imports
+from sqlalchemy import event
+
+# User module imports
+from api.routes.sockets import app as flask_app
+from benchmarks.dataset import Dataset, Scale
+
+
+@pytest.fixture(scope="session")
+def app():
+    """The app of the process."""
+    return flask_app
+
+
+@pytest.fixture
+def seed(app):
+    """
+    Returns a function that empties the test database and seeds it with
+    a dataset of the given Scale
+    """
+
+    if not os.environ.get("TEST_DATABASE_URI"):
+        pytest.skip("TEST_DATABASE_URI is not set")
+
+    with app.app_context():
+        app.db_create_all()
+
+    def seed(scale: Scale):
+        with app.app_context():
+            Dataset.reset(app)
+            Dataset.seed(app, scale)
+    return seed
+
+
+@pytest.fixture
+def statements(app):
+    """
+    Returns a context manager counting the SQL statements run inside it,
+    e.g. `with statements() as count: ...` then `count[0]`
+    """
+
+    @contextmanager
+    def statements():
+        count = [0]
+
+        def record(conn, cursor, statement, parameters, context, many):
+            count[0] += 1
+
+        event.listen(app.db.engine, "before_cursor_execute", record)
+        try:
+            yield count
+        finally:
+            event.remove(app.db.engine, "before_cursor_execute", record)
+    return statements
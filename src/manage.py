@@ -1,7 +1,20 @@
 from flask_script import Manager
 from flask_migrate import Migrate, MigrateCommand
 from api.routes.routes import app
+from api.db.audit import PlanAudit
+from api.db.loaders import eager_options
+from api.db.schemas import (
+    IngredientSchema,
+    MenuItemCategorySchema,
+    MenuItemSchema,
+    OrderItemSchema,
+    OrderSchema,
+    UserSchema)
+from api.db import serializers
+from api.routes.export import OrderExport
+from datetime import date
 import os
+import sys
 
 app.db_create_all()
 migrate = Migrate(app, app.db)
@@ -9,5 +22,69 @@ manager = Manager(app)
 
 manager.add_command('db', MigrateCommand)
 
+
+@manager.option('-r', '--max-seq-rows', dest='max_seq_rows', type=int,
+                default=1000,
+                help='Most rows a filtered sequential scan may read')
+@manager.option('--no-analyze', dest='analyze', action='store_false',
+                help='Do not refresh the planner statistics first')
+def audit_plans(max_seq_rows, analyze=True):
+    """EXPLAIN the hot queries and fail on large sequential scans."""
+    scans = PlanAudit.run(app, analyze)
+    failures = [scan for scan in scans if scan.rows > max_seq_rows]
+    for scan in scans:
+        status = 'FAIL' if scan in failures else 'ok'
+        print(f"{status:4} {scan.route}: seq scan on {scan.relation} "
+              f"read {scan.rows} rows")
+    for scan in failures:
+        print(f"\n{scan.route} ({scan.relation}):\n{scan.statement}")
+    if failures:
+        sys.exit(1)
+    print("No sequential scans above {} rows".format(max_seq_rows))
+
+
+@manager.option('-n', '--rows', dest='rows', type=int, default=1000,
+                help='Rows of each table to compare')
+def check_serializers(rows):
+    """Compare the compiled serializers with marshmallow on real rows."""
+    problems = []
+    for schema_cls in (UserSchema, OrderSchema, OrderItemSchema,
+                       MenuItemSchema, MenuItemCategorySchema,
+                       IngredientSchema):
+        model = schema_cls.opts.model
+        objs = model.query.options(*eager_options(schema_cls)).order_by(
+            *model.__mapper__.primary_key).limit(rows).all()
+        found = serializers.mismatches(schema_cls, objs)
+        print(f"{'FAIL' if found else 'ok':4} {schema_cls.__name__}: "
+              f"{len(objs)} rows")
+        problems += found
+    for problem in problems:
+        print(problem)
+    if problems:
+        sys.exit(1)
+
+
+@manager.option('-f', '--format', dest='fmt', choices=('csv', 'ndjson'),
+                default='csv', help='Export format')
+@manager.option('-s', '--start', dest='start', type=date.fromisoformat,
+                help='First day to export, YYYY-MM-DD')
+@manager.option('-e', '--end', dest='end', type=date.fromisoformat,
+                help='Last day to export, YYYY-MM-DD')
+@manager.option('-o', '--output', dest='output',
+                help='File to write to, stdout by default')
+@manager.option('-b', '--batch-size', dest='batch_size', type=int,
+                help='Rows read at a time')
+def export_orders(fmt='csv', start=None, end=None, output=None,
+                  batch_size=None):
+    """Stream the orders with their items and customer as CSV or NDJSON."""
+    out = open(output, 'wb') if output else sys.stdout.buffer
+    try:
+        for chunk in OrderExport.chunks(fmt, start, end, batch_size):
+            out.write(chunk)
+    finally:
+        if output:
+            out.close()
+
+
 if __name__ == '__main__':
     manager.run()
\ No newline at end of file
@@ -2,15 +2,20 @@
 
 import os
 from api.routes.sockets import ServerSockets, app
-from api.views.views import Views
 from eventlet import monkey_patch
+from psycogreen.eventlet import patch_psycopg
 
 from app import FlaskApp
 
 
 if __name__ == '__main__':
     monkey_patch()
+    # psycopg2 waits for the database through the hub, so a long query or
+    # a streamed fetch lets the other greenthreads run
+    patch_psycopg()
     if os.environ.get("IS_DEV"):
+        # Flask-Admin is only imported when the admin portal is served
+        from api.views.views import Views
         views = Views(app)
     app.db_create_all()
     ServerSockets.start_sockets_threads()
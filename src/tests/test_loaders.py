@@ -0,0 +1,66 @@
+"""The list routes and socket dumps run a fixed number of statements."""
+# Python imports
+import pytest
+
+# User module imports
+from api.routes.sockets import ServerSockets
+from benchmarks.dataset import Scale
+
+SMALL = Scale(users=5, categories=2, menuitems=5, ingredients=5, orders=30,
+              items_per_order=2)
+LARGE = Scale(users=40, categories=6, menuitems=30, ingredients=20,
+              orders=120, items_per_order=3)
+
+# The statements each dump runs, whatever the amount of rows: one for the
+# rows, joining their scalar relationships, and one SELECT ... IN per
+# level of nested collections
+ROUTES = {
+    "/menuitems": 2,
+    "/categories": 3,
+    "/orders": 3,
+    "/users": 1,
+    "/ingredients": 1,
+}
+
+WATCHES = {
+    "/menu/watch": 3,
+    "/users/watch": 1,
+    "/orders/watch": 3,
+    "/ingredients/watch": 1,
+}
+
+
+def count_route(app, statements, path):
+    client = app.test_client()
+    with statements() as count:
+        response = client.get(path)
+        response.get_data()
+    assert response.status_code == 200
+    return count[0]
+
+
+def count_watch(app, statements, namespace):
+    watch = ServerSockets.watches[namespace]
+    for snapshot in watch.all_snapshots:
+        snapshot.invalidate()
+    with app.app_context(), statements() as count:
+        ServerSockets.get_all(watch)
+    return count[0]
+
+
+@pytest.mark.parametrize("path", ROUTES)
+def test_route_statements(app, seed, statements, path):
+    counts = []
+    for scale in (SMALL, LARGE):
+        seed(scale)
+        counts.append(count_route(app, statements, path))
+    assert counts == [ROUTES[path]] * 2
+
+
+@pytest.mark.parametrize("namespace", WATCHES)
+def test_watch_statements(app, seed, statements, namespace):
+    counts = []
+    for scale in (SMALL, LARGE):
+        seed(scale)
+        counts.append(count_watch(app, statements, namespace))
+    assert counts == [WATCHES[namespace]] * 2
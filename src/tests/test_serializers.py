@@ -0,0 +1,159 @@
+"""The compiled serializers encode exactly the bytes of marshmallow and
+flask.jsonify."""
+# Python imports
+from datetime import date, datetime
+from decimal import Decimal
+from flask import jsonify
+import pytest
+
+# User module imports
+from api.db import serializers
+from api.db.models import (
+    IngredientModel,
+    MenuItemCategoryModel,
+    MenuItemModel,
+    OrderItemModel,
+    OrderModel,
+    UserModel)
+from api.db.schemas import (
+    IngredientSchema,
+    MenuItemCategorySchema,
+    MenuItemSchema,
+    OrderItemSchema,
+    OrderSchema,
+    UserSchema)
+
+# Strings the json module escapes differently from orjson
+AWKWARD = 'Café "sündae" \\ </script>   \x7f \x01 \U0001f368'
+
+
+def ingredients():
+    return [
+        IngredientModel(id=1, name="Vanilla", in_stock=True),
+        IngredientModel(id=2, name=AWKWARD, in_stock=None),
+        IngredientModel(id=3, name="", in_stock=False),
+    ]
+
+
+def categories():
+    return [
+        MenuItemCategoryModel(id=1, name="Sundaes"),
+        MenuItemCategoryModel(id=2, name=AWKWARD),
+        MenuItemCategoryModel(id=3, name="Empty"),
+    ]
+
+
+def menuitems():
+    sundaes, awkward, _ = categories()
+    vanilla, odd, _ = ingredients()
+    return [
+        MenuItemModel(id=1, flavour="Vanilla", price=250.0,
+                      description="Plain", image_url=None,
+                      category=sundaes, ingredients=[vanilla, odd]),
+        MenuItemModel(id=2, flavour=AWKWARD, price=Decimal("12.50"),
+                      description=None, image_url="", category=awkward,
+                      ingredients=[]),
+        MenuItemModel(id=3, flavour="Tiny", price=1e-07, description="",
+                      image_url="https://example.com/a.png", category=None),
+        MenuItemModel(id=4, flavour="Huge", price=12345678901234.5,
+                      description=AWKWARD, category=sundaes),
+        MenuItemModel(id=5, flavour="Free", price=0, category=sundaes),
+    ]
+
+
+def users():
+    return [
+        UserModel(id=1, username="admin", email="admin@example.com",
+                  _password="hash", firstname="Ada", lastname="Admin",
+                  address=None, is_admin=True, public_id="a-1",
+                  created_on=datetime(2021, 2, 3, 4, 5, 6, 789)),
+        UserModel(id=2, username=AWKWARD, email=None, _password=None,
+                  firstname="", lastname=AWKWARD, address=AWKWARD,
+                  is_admin=None, public_id=None, created_on=None),
+    ]
+
+
+def orderitems():
+    vanilla, awkward, tiny, _, _ = menuitems()
+    return [
+        OrderItemModel(id=1, qty=2, order_id=1, menuitem_id=1,
+                       menuitem=vanilla),
+        OrderItemModel(id=2, qty=1, order_id=1, menuitem_id=2,
+                       menuitem=awkward),
+        OrderItemModel(id=3, qty=10, order_id=2, menuitem_id=3,
+                       menuitem=tiny),
+        OrderItemModel(id=4, qty=1, order_id=2, menuitem_id=None,
+                       menuitem=None),
+    ]
+
+
+def orders():
+    admin, awkward = users()
+    first, second, tiny, missing = orderitems()
+    return [
+        OrderModel(id=1, created_on=datetime(2021, 1, 1), complete=True,
+                   user=admin, items=[first, second]),
+        OrderModel(id=2, created_on=datetime(2021, 12, 31, 23, 59, 59, 1),
+                   complete=None, user=awkward, items=[tiny, missing]),
+        OrderModel(id=3, created_on=None, complete=False, user=None,
+                   items=[]),
+    ]
+
+
+def category_tree():
+    sundaes, awkward, empty = categories()
+    items = menuitems()
+    sundaes.menuitems = [items[0], items[3], items[4]]
+    awkward.menuitems = [items[1]]
+    empty.menuitems = []
+    return [sundaes, awkward, empty]
+
+
+CASES = [
+    (IngredientSchema, ingredients),
+    (MenuItemCategorySchema, category_tree),
+    (MenuItemSchema, menuitems),
+    (UserSchema, users),
+    (OrderItemSchema, orderitems),
+    (OrderSchema, orders),
+]
+
+
+@pytest.mark.parametrize("schema_cls,build", CASES,
+                         ids=[schema_cls.__name__ for schema_cls, _ in CASES])
+def test_dump_matches_marshmallow(app, schema_cls, build):
+    rows = build()
+    assert serializers.dump(schema_cls, rows) == \
+        schema_cls(many=True).dump(rows)
+    assert serializers.dump(schema_cls, rows[0], many=False) == \
+        schema_cls().dump(rows[0])
+
+
+@pytest.mark.parametrize("schema_cls,build", CASES,
+                         ids=[schema_cls.__name__ for schema_cls, _ in CASES])
+def test_dumps_matches_jsonify(app, schema_cls, build):
+    rows = build()
+    with app.app_context():
+        expected = jsonify(schema_cls(many=True).dump(rows)).get_data()
+        assert serializers.dumps(
+            serializers.dump(schema_cls, rows)) + b"\n" == expected
+        assert serializers.jsonify(
+            serializers.dump(schema_cls, rows)).get_data() == expected
+
+
+@pytest.mark.parametrize("data", [
+    [], {}, None, 0, -1.5, 1e-05, [-1e-06], 0.00012, 1e-07, 1e16, 1e21,
+    2 ** 63, "", AWKWARD,
+    {"b": 1, "a": [None, True, 0.1]},
+    {"when": date(2021, 1, 2), "at": datetime(2021, 1, 2, 3, 4, 5)},
+    {"price": Decimal("1.10")},
+])
+def test_dumps_matches_jsonify_values(app, data):
+    with app.app_context():
+        try:
+            expected = jsonify(data).get_data()
+        except TypeError:
+            with pytest.raises(TypeError):
+                serializers.dumps(data)
+            return
+        assert serializers.dumps(data) + b"\n" == expected
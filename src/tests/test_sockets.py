@@ -0,0 +1,60 @@
+"""Only admins may connect to the order feed, whose orders carry customers."""
+# Python imports
+from datetime import datetime, timedelta
+import jwt
+import pytest
+
+# User module imports
+from api.db.models import UserModel
+from api.routes.sockets import ConnectionRefusedError, ServerSockets
+from benchmarks.dataset import Scale
+
+SCALE = Scale(users=3, categories=1, menuitems=2, ingredients=2, orders=5,
+              items_per_order=1)
+
+
+@pytest.fixture
+def token(app, seed, monkeypatch):
+    """Returns a function issuing a JWT for the user with an id."""
+    monkeypatch.setitem(app.config, "SECRET_KEY", "test")
+    seed(SCALE)
+
+    def token(user_id):
+        with app.app_context():
+            user = UserModel.query.get(user_id)
+            return jwt.encode({
+                'public_id': user.public_id,
+                'exp': datetime.utcnow() + timedelta(hours=1),
+                'admin': user.is_admin
+            }, "test", algorithm="HS256")
+    return token
+
+
+def connect(app, monkeypatch, auth):
+    sent = []
+    monkeypatch.setattr(app.socketio, "emit",
+                        lambda event, *args, **kwargs: sent.append(event))
+    with app.app_context():
+        ServerSockets.send_orders("sid", auth)
+    return sent
+
+
+def test_orders_watch_refuses_clients_without_token(app):
+    client = app.socketio.test_client(app, namespace='/orders/watch')
+    assert not client.is_connected('/orders/watch')
+
+
+@pytest.mark.parametrize("auth", [None, {}, {"token": "garbage"}])
+def test_orders_watch_refuses_invalid_auth(app, monkeypatch, auth):
+    with pytest.raises(ConnectionRefusedError):
+        connect(app, monkeypatch, auth)
+
+
+def test_orders_watch_refuses_customers(app, monkeypatch, token):
+    # user1 is the admin of the dataset
+    with pytest.raises(ConnectionRefusedError):
+        connect(app, monkeypatch, {"token": token(2)})
+
+
+def test_orders_watch_accepts_admins(app, monkeypatch, token):
+    assert connect(app, monkeypatch, {"token": token(1)}) == ['open:orders']